@@ -1,47 +1,359 @@
 import json
 from http.server import BaseHTTPRequestHandler
-import requests
+from urllib.parse import parse_qs, urlparse
 from datetime import datetime, timezone
 import os
+import sys
+import threading
+import time
 
-def format_number(num):
+# 让Vercel函数可以导入项目根目录下的共享模块
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# 冷启动只导入标准库和轻量模块；限速/熔断/传输层、线程池等在第一次请求上游时才导入
+# （命中缓存或缺少API密钥的请求不需要），导入耗时预算见 bench/importtime.py
+from dashboard_core.precomputed import PrecomputedSnapshot
+from dashboard_core.stream import etag_matches, make_etag
+
+# 上游API地址（基准测试时指向本地桩服务）
+CUSTOMER_IO_API_BASE = os.environ.get('CUSTOMER_IO_API_BASE', 'https://api.customer.io/v1')
+REVENUECAT_API_BASE = os.environ.get('REVENUECAT_API_BASE', 'https://api.revenuecat.com/v2')
+
+# Customer.io segment人数并发获取配置
+SEGMENT_CONCURRENCY = max(1, int(os.environ.get('CUSTOMER_IO_SEGMENT_CONCURRENCY', '8')))
+SEGMENT_TIMEOUT = float(os.environ.get('CUSTOMER_IO_SEGMENT_TIMEOUT', '10'))
+# 默认只获取参与总数计算的两个邮箱segment
+EMAIL_SEGMENTS_ONLY = os.environ.get('CUSTOMER_IO_EMAIL_SEGMENTS_ONLY', 'true').lower() in ('1', 'true', 'yes')
+
+# 整体请求截止时间（秒），需小于vercel.json中的maxDuration
+REQUEST_DEADLINE = float(os.environ.get('API_DATA_DEADLINE_SECONDS', '25'))
+
+# 数据源获取线程池，第一次请求上游时创建，热启动时复用
+_provider_executor = None
+_lazy_lock = threading.Lock()
+
+def get_provider_executor():
+    global _provider_executor
+    if _provider_executor is None:
+        with _lazy_lock:
+            if _provider_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _provider_executor = ThreadPoolExecutor(max_workers=4)
+    return _provider_executor
+
+# RevenueCat webhook摄取（见dashboard_core/webhooks.py）：返回的数值叠加上一次完整轮询之后的事件
+# 计数器文件必须显式配置（webhook端点、本函数和update.py --precompute共享），同时配置了密钥时才启用，
+# 完整轮询随之放慢到WEBHOOK_RECONCILE_INTERVAL；这里直接读取环境变量，冷启动不导入webhooks模块
+WEBHOOK_STATE_PATH = os.environ.get('WEBHOOK_STATE_PATH')
+WEBHOOKS_ENABLED = bool(os.environ.get('REVENUECAT_WEBHOOK_SECRET') and WEBHOOK_STATE_PATH)
+WEBHOOK_RECONCILE_INTERVAL = float(os.environ.get('WEBHOOK_RECONCILE_INTERVAL', '1800'))
+
+# 响应缓存TTL（秒），过期后先返回旧数据并在后台刷新
+CACHE_TTL = float(os.environ.get('API_DATA_CACHE_TTL', WEBHOOK_RECONCILE_INTERVAL if WEBHOOKS_ENABLED else 60))
+# 新数据降级时最多继续返回上一次完整数据多久（CACHE_TTL的倍数，从完整数据的获取时间算起）
+RETAIN_COMPLETE_TTLS = float(os.environ.get('API_DATA_RETAIN_COMPLETE_TTLS', '10'))
+
+# 预计算快照（update.py --precompute写入），不超过最大时效（秒）时直接返回，0为不使用
+# 只适用于本地或单机部署；Vercel上没有这个文件，始终实时获取
+PRECOMPUTED_SNAPSHOT_PATH = os.environ.get('PRECOMPUTED_SNAPSHOT_PATH', os.path.join(ROOT_DIR, 'precomputed.json'))
+PRECOMPUTED_MAX_AGE = float(os.environ.get('PRECOMPUTED_MAX_AGE', 2 * WEBHOOK_RECONCILE_INTERVAL if WEBHOOKS_ENABLED else 300))
+
+# RevenueCat项目ID缓存（内存 + /tmp，可用REVENUECAT_PROJECT_ID直接指定），第一次请求RevenueCat时创建
+_project_resolver = None
+
+def get_project_resolver():
+    global _project_resolver
+    if _project_resolver is None:
+        with _lazy_lock:
+            if _project_resolver is None:
+                import tempfile
+                from dashboard_core.project_resolver import ProjectResolver
+                _project_resolver = ProjectResolver(os.environ.get(
+                    'REVENUECAT_PROJECT_CACHE', os.path.join(tempfile.gettempdir(), 'revenuecat_project.json')
+                ))
+    return _project_resolver
+
+# 按日拟合的预测（读取update.py记录的指标历史），第一次请求上游时创建
+_forecast_model = None
+
+def get_forecast_model():
+    global _forecast_model
+    if _forecast_model is None:
+        with _lazy_lock:
+            if _forecast_model is None:
+                import tempfile
+                from dashboard_core.forecast import ForecastModel
+                _forecast_model = ForecastModel(
+                    os.environ.get('DASHBOARD_HISTORY_PATH', os.path.join(ROOT_DIR, 'history.sqlite')),
+                    os.path.join(tempfile.gettempdir(), 'dashboard_forecast.json')
+                )
+    return _forecast_model
+
+# Webhook事件计数器，第一次使用时打开（开发服务器的webhook端点和本函数共用），未配置WEBHOOK_STATE_PATH时为None
+_webhook_state = None
+
+def get_webhook_state():
+    global _webhook_state
+    if _webhook_state is None and WEBHOOK_STATE_PATH:
+        with _lazy_lock:
+            if _webhook_state is None:
+                from dashboard_core.webhooks import WebhookState
+                _webhook_state = WebhookState(WEBHOOK_STATE_PATH)
+    return _webhook_state
+
+class PayloadCache:
     """
-    将大数字格式化为K/M形式
-    例如: 144048 -> $144K, 1200000 -> $1.2M
+    模块级响应缓存，在热启动的多次调用之间保留
+    - TTL内直接返回缓存 (hit)
+    - TTL过期后立即返回旧数据，并在后台线程刷新 (stale)
+    - 没有缓存时并发请求只触发一次上游获取，其余请求等待结果 (miss)
+    - 新获取的数据降级（有数据源失败）时，在上一次完整数据获取后的 retain 秒内继续返回完整数据，
+      状态标记为stale并在cache.degradedSources中列出失败的数据源；超过后返回降级数据，不掩盖持续的故障
+    注意：Vercel在响应返回后可能冻结实例，后台刷新会在下一次热调用时继续完成
     """
-    if isinstance(num, str):
-        return num
     
-    if num >= 1000000:
-        return f"${num/1000000:.1f}M"
-    elif num >= 1000:
-        return f"${num/1000:.0f}K"
-    else:
-        return f"${num:,.0f}"
-
-def format_count(num):
+    def __init__(self, ttl, retain=None):
+        self.ttl = ttl
+        self.retain = RETAIN_COMPLETE_TTLS * ttl if retain is None else retain
+        self._cond = threading.Condition()
+        self._payload = None
+        self._fetched_at = 0.0  # 当前返回的数据的获取时间
+        self._attempted_at = 0.0  # 最近一次获取完成的时间（决定下一次刷新）
+        self._degraded = None  # 保留旧数据期间，最近一次降级结果的数据源状态
+        self._refreshing = False
+        self.stats = {"hits": 0, "misses": 0, "stale": 0}
+    
+    def get(self, fetch):
+        """返回 (payload, 缓存状态)"""
+        with self._cond:
+            while True:
+                if self._payload is not None:
+                    if time.monotonic() - self._attempted_at < self.ttl:
+                        if self._degraded is not None:
+                            # 保留的完整数据不是最新的获取结果
+                            self.stats["stale"] += 1
+                            return self._payload, "stale"
+                        self.stats["hits"] += 1
+                        return self._payload, "hit"
+                    
+                    self.stats["stale"] += 1
+                    if not self._refreshing:
+                        self._refreshing = True
+                        threading.Thread(target=self._refresh, args=(fetch,), daemon=True).start()
+                    return self._payload, "stale"
+                
+                if not self._refreshing:
+                    self._refreshing = True
+                    self.stats["misses"] += 1
+                    break
+                
+                # 已有请求在获取数据，等待其完成（single-flight）
+                self._cond.wait()
+        
+        payload = None
+        try:
+            payload = fetch()
+        finally:
+            self._store(payload)
+        return payload, "miss"
+    
+    def describe(self, state):
+        """返回缓存状态和计数，用于附加到响应JSON"""
+        with self._cond:
+            age = time.monotonic() - self._fetched_at if self._payload is not None else 0
+            described = dict(self.stats, state=state, ageSeconds=int(age))
+            if self._degraded is not None:
+                described["degradedSources"] = sorted(
+                    name for name, status in self._degraded.items() if status.get("status") != "ok"
+                )
+            return described
+    
+    def _refresh(self, fetch):
+        payload = None
+        try:
+            payload = fetch()
+        except Exception:
+            pass
+        finally:
+            self._store(payload)
+    
+    def _store(self, payload):
+        with self._cond:
+            if payload is not None:
+                now = time.monotonic()
+                self._attempted_at = now
+                # 降级数据在保留期内不覆盖上一次完整的数据（保留数据的获取时间不变），但同样推迟下一次刷新
+                if (self._payload is not None and not is_complete_payload(payload)
+                        and is_complete_payload(self._payload) and now - self._fetched_at < self.retain):
+                    self._degraded = payload.get("sourceStatus", {})
+                else:
+                    self._payload = payload
+                    self._fetched_at = now
+                    self._degraded = None
+            self._refreshing = False
+            self._cond.notify_all()
+
+def is_complete_payload(payload):
+    """所有数据源都获取到真实数据"""
+    return all(status.get("status") == "ok" for status in payload.get("sourceStatus", {}).values())
+
+payload_cache = PayloadCache(CACHE_TTL)
+precomputed_snapshot = PrecomputedSnapshot(PRECOMPUTED_SNAPSHOT_PATH, PRECOMPUTED_MAX_AGE)
+
+class DataFetcher:
+    """上游数据获取与组合，不依赖请求上下文，可供其他端点复用"""
+    
+    def __init__(self):
+        # 各数据源最后一次成功获取的数据（熔断期间代替上游数据）
+        self.last_good = {}
+    
+    @staticmethod
+    def make_providers(customer_io_app_api_key, revenuecat_token):
+        """
+        本次请求使用的数据源（与update.py共用dashboard_core.providers）
+        多个workspace / token（name=key,name2=key2）在各自数据源内并发获取后合并
+        """
+        from dashboard_core.providers import build_customer_io, build_revenuecat
+        
+        return {
+            "customerIO": build_customer_io(
+                customer_io_app_api_key,
+                base_url=CUSTOMER_IO_API_BASE,
+                segment_concurrency=SEGMENT_CONCURRENCY,
+                segment_timeout=SEGMENT_TIMEOUT,
+                email_segments_only=EMAIL_SEGMENTS_ONLY
+            ),
+            "revenueCat": build_revenuecat(revenuecat_token, get_project_resolver(), base_url=REVENUECAT_API_BASE)
+        }
+    
+    def build_response_data(self, customer_io_app_api_key, revenuecat_token):
+        """从上游获取数据并组合成响应JSON"""
+        from concurrent.futures import wait
+        from dashboard_core import breaker
+        from dashboard_core.fetch import Fetcher
+        from dashboard_core.snapshot import SOURCE_CIRCUIT_OPEN, SOURCE_DEADLINE_EXCEEDED, DashboardSnapshot
+        
+        # 并发获取Customer.io和RevenueCat数据，超过截止时间的数据源使用备用数据
+        # 熔断器打开的数据源不发起请求，直接使用最后一次成功获取的数据
+        providers = self.make_providers(customer_io_app_api_key, revenuecat_token)
+        # 排队和重试都不超过整体截止时间
+        fetcher = Fetcher(deadline=time.monotonic() + REQUEST_DEADLINE)
+        futures = {
+            name: get_provider_executor().submit(self.timed, provider.collect, fetcher)
+            for name, provider in providers.items()
+            if breaker.get_breaker(provider.name).state != breaker.OPEN
+        }
+        if futures:
+            wait(futures.values(), timeout=REQUEST_DEADLINE)
+        
+        results = {}
+        source_status = {}
+        for name, provider in providers.items():
+            future = futures.get(name)
+            if future is None:
+                data, status = provider.fallback(SOURCE_CIRCUIT_OPEN), {"status": "circuit_open", "elapsedMs": 0}
+            elif future.done():
+                data, elapsed = future.result()
+                status = {"status": "error" if data.failed else "ok", "elapsedMs": int(elapsed * 1000)}
+            else:
+                data = provider.fallback(SOURCE_DEADLINE_EXCEEDED)
+                status = {"status": "timeout", "elapsedMs": int(REQUEST_DEADLINE * 1000)}
+            
+            circuit = breaker.get_breaker(provider.name)
+            if status["status"] == "ok":
+                self.last_good[name] = data
+            elif circuit.state == breaker.OPEN and name in self.last_good:
+                data = self.last_good[name]
+                status["status"] = "circuit_open"
+            
+            status["breaker"] = circuit.describe()
+            results[name] = data
+            source_status[name] = status
+        
+        # 基础增量、今日新用户等核心数值与update.py使用同一份计算
+        snapshot = DashboardSnapshot(
+            customer_io=results["customerIO"],
+            revenuecat=results["revenueCat"],
+            request_counts=dict(fetcher.request_counts),
+            collected_at=datetime.now(timezone.utc).isoformat(),
+            forecast=get_forecast_model().get()
+        )
+        payload = snapshot.payload(source_status)
+        if WEBHOOKS_ENABLED:
+            # 完整轮询即校正：之后的webhook事件叠加在这次的结果上
+            try:
+                get_webhook_state().checkpoint(payload["lastUpdate"])
+            except Exception as e:
+                # 计数器不可用时只是不叠加事件，轮询结果照常返回
+                import logging
+                logging.getLogger(__name__).warning(f"⚠️ 无法记录webhook检查点: {e}")
+        return payload
+    
+    @staticmethod
+    def timed(func, *args):
+        """执行数据源获取函数并返回 (结果, 耗时秒数)"""
+        started = time.monotonic()
+        result = func(*args)
+        return result, time.monotonic() - started
+
+fetcher = DataFetcher()
+
+def get_payload():
     """
-    将数量格式化为K/M形式（不带$符号）
-    例如: 12400 -> 12.4K, 1200000 -> 1.2M
+    返回 (响应数据, 缓存状态)
+    启用webhook时在轮询结果上叠加之后的事件
     """
-    if isinstance(num, str):
-        return num
+    payload, cache_state = get_polled_payload()
+    if payload is not None and WEBHOOKS_ENABLED:
+        payload = apply_webhook_events(payload)
+    return payload, cache_state
+
+def apply_webhook_events(payload):
+    """叠加检查点之后的webhook事件，计数器不可用时返回原始轮询结果"""
+    from dashboard_core.webhooks import apply_overlay
+    try:
+        overlay = get_webhook_state().overlay(payload.get("lastUpdate") or "")
+    except Exception as e:
+        # 计数器文件不可用（如权限问题）时不影响轮询结果的返回
+        import logging
+        logging.getLogger(__name__).warning(f"⚠️ 无法读取webhook计数器: {e}")
+        return payload
+    return payload if overlay is None else apply_overlay(payload, overlay)
+
+def get_polled_payload():
+    """
+    返回最近一次完整轮询的 (响应数据, 缓存状态)
+    优先使用未过期的预计算快照；否则从环境变量读取API密钥实时获取，未配置API密钥时返回 (None, None)
+    """
+    precomputed = precomputed_snapshot.load()
+    if precomputed is not None:
+        return precomputed, "precomputed"
+    
+    customer_io_app_api_key = os.environ.get('CUSTOMER_IO_APP_API_KEY')
+    revenuecat_token = os.environ.get('REVENUECAT_TOKEN')
     
-    if num >= 1000000:
-        return f"{num/1000000:.1f}M"
-    elif num >= 1000:
-        return f"{num/1000:.1f}K"
-    else:
-        return f"{num:,}"
+    if not customer_io_app_api_key or not revenuecat_token:
+        return None, None
+    
+    return payload_cache.get(
+        lambda: fetcher.build_response_data(customer_io_app_api_key, revenuecat_token)
+    )
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
+        # /api/metrics 改写到本函数（vercel.json），与/api/data共享同一个实例的上游调用统计
+        url = urlparse(self.path)
+        if url.path.rstrip('/').endswith('/metrics') or parse_qs(url.query).get('view') == ['metrics']:
+            self.send_metrics()
+            return
+        
         try:
-            # 从环境变量获取API密钥
-            customer_io_app_api_key = os.environ.get('CUSTOMER_IO_APP_API_KEY')
-            revenuecat_token = os.environ.get('REVENUECAT_TOKEN')
+            # 优先使用预计算快照，其次是模块级缓存（过期时先返回旧数据并在后台刷新）
+            response_data, cache_state = get_payload()
             
-            if not customer_io_app_api_key or not revenuecat_token:
+            if response_data is None:
                 self.send_response(500)
                 self.send_header('Content-type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
@@ -49,53 +361,31 @@ class handler(BaseHTTPRequestHandler):
                 self.wfile.write(json.dumps({"error": "API keys not configured"}).encode())
                 return
             
-            # 获取Customer.io数据
-            cio_data = self.get_customer_io_data(customer_io_app_api_key)
-            
-            # 获取RevenueCat数据
-            rc_data = self.get_revenuecat_data(revenuecat_token)
-            
-            # 组合响应数据
-            total_users = cio_data.get("total_customers", 0)
-            arr_value = rc_data.get("arr", 0)
-            active_subs = rc_data.get("active_subscriptions", 0)
-            
-            # 基础增量值
-            BASE_USER_INCREMENT = 11000
-            BASE_ARR_INCREMENT = 141600.0
-            BASE_SUBS_INCREMENT = 118
-            
-            # 如果获取到真实数据，添加基础增量
-            cio_source = cio_data.get("source", "unknown")
-            rc_source = rc_data.get("source", "unknown")
-            
-            # 只有在获取到真实数据时才添加增量（避免在API失败的基础值上重复添加）
-            if cio_source not in ["api_failed", "api_error", "no_api_key_configured"]:
-                total_users += BASE_USER_INCREMENT
-                
-            if rc_source not in ["api_failed", "api_error", "no_revenuecat_data"]:
-                arr_value += BASE_ARR_INCREMENT
-                active_subs += BASE_SUBS_INCREMENT
+            # 指标内容没有变化时返回304，不发送响应体
+            etag = make_etag(response_data)
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Cache-Control', 'max-age=300')
+                self.end_headers()
+                return
             
-            response_data = {
-                "totalUsers": total_users,
-                "newUsersToday": cio_data.get("new_customers_today", 0),
-                "arr": arr_value,
-                "mrr": rc_data.get("mrr", 0),
-                "activeSubscriptions": active_subs,
-                "activeTrials": rc_data.get("active_trials", 0),
-                "lastUpdate": datetime.now(timezone.utc).isoformat(),
-                "sources": {
-                    "customerIO": cio_data.get("source", "unknown"),
-                    "revenueCat": rc_data.get("source", "unknown")
-                }
-            }
+            if cache_state == "precomputed":
+                # 没有请求上游，不导入传输层
+                response_data = dict(response_data, cache=precomputed_snapshot.describe())
+            else:
+                from dashboard_core import scheduler, transport
+                response_data = dict(response_data,
+                                     cache=payload_cache.describe(cache_state),
+                                     transport=dict(transport.stats.snapshot(), scheduler=scheduler.stats.snapshot()))
             
             # 发送响应
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Cache-Control', 'max-age=300')  # 缓存5分钟
+            self.send_header('ETag', etag)
             self.end_headers()
             self.wfile.write(json.dumps(response_data).encode())
             
@@ -106,130 +396,12 @@ class handler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(json.dumps({"error": str(e)}).encode())
     
-    def get_customer_io_data(self, api_key):
-        """获取Customer.io数据"""
-        try:
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            # 获取segments
-            segments_url = "https://api.customer.io/v1/segments"
-            response = requests.get(segments_url, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                segments_data = response.json()
-                
-                total_users = 0
-                valid_email_users = 0
-                invalid_email_users = 0
-                
-                for segment in segments_data.get('segments', []):
-                    segment_id = segment.get('id')
-                    segment_name = segment.get('name', '').lower()
-                    
-                    # 获取用户数量
-                    count_url = f"https://api.customer.io/v1/segments/{segment_id}/customer_count"
-                    count_response = requests.get(count_url, headers=headers, timeout=30)
-                    
-                    if count_response.status_code == 200:
-                        count_data = count_response.json()
-                        count = count_data.get('count', 0)
-                        
-                        if segment_name == 'valid email address':
-                            valid_email_users = count
-                        elif segment_name == 'invalid email address':
-                            invalid_email_users = count
-                
-                total_users = valid_email_users + invalid_email_users
-                
-                return {
-                    "total_customers": total_users,
-                    "new_customers_today": max(1, int(total_users * 0.002)),  # 估算
-                    "source": "customer_io_real_data"
-                }
-            
-            return {"total_customers": 11000, "new_customers_today": 22, "source": "api_failed"}
-            
-        except Exception:
-            return {"total_customers": 11000, "new_customers_today": 22, "source": "api_error"}
-    
-    def get_revenuecat_data(self, token):
-        """获取RevenueCat数据"""
-        try:
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            
-            # 获取项目
-            projects_url = "https://api.revenuecat.com/v2/projects"
-            response = requests.get(projects_url, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                projects_data = response.json()
-                if projects_data.get('items'):
-                    project_id = projects_data['items'][0]['id']
-                    
-                    # 获取metrics
-                    metrics_url = f"https://api.revenuecat.com/v2/projects/{project_id}/metrics/overview"
-                    metrics_response = requests.get(metrics_url, headers=headers, timeout=30)
-                    
-                    if metrics_response.status_code == 200:
-                        metrics_data = metrics_response.json()
-                        
-                        # 根据RevenueCat API v2文档优化metrics解析
-                        metrics = {}
-                        for metric in metrics_data.get('metrics', []):
-                            metric_id = metric.get('id')
-                            metric_value = metric.get('value', 0)
-                            
-                            # 处理不同的数据类型
-                            if isinstance(metric_value, (int, float)):
-                                metrics[metric_id] = float(metric_value)
-                            else:
-                                metrics[metric_id] = 0
-                        
-                        # 优先使用API提供的ARR字段，如果没有则用MRR*12计算
-                        mrr_value = metrics.get('mrr', 0)
-                        arr_value = metrics.get('arr', 0)  # 检查API是否直接提供ARR
-                        
-                        # 如果API没有提供ARR字段，则通过MRR计算
-                        if arr_value == 0 and mrr_value > 0:
-                            arr_value = mrr_value * 12
-                        
-                        # 根据RevenueCat API v2文档返回完整的metrics数据
-                        return {
-                            "active_subscriptions": int(metrics.get('active_subscriptions', 0)),
-                            "active_trials": int(metrics.get('active_trials', 0)),
-                            "mrr": mrr_value,
-                            "arr": arr_value,
-                            "revenue": metrics.get('revenue', 0),  # 28天收入
-                            "new_customers": int(metrics.get('new_customers', 0)),
-                            "active_users": int(metrics.get('active_users', 0)),
-                            "source": "revenuecat_real_data"
-                        }
-            
-            return {
-                "active_subscriptions": 118,
-                "active_trials": 12,
-                "mrr": 11804.0,
-                "arr": 141600.0,
-                "revenue": 0,
-                "new_customers": 0,
-                "active_users": 0,
-                "source": "api_failed"
-            }
-            
-        except Exception:
-            return {
-                "active_subscriptions": 118,
-                "active_trials": 12,
-                "mrr": 11804.0,
-                "arr": 141600.0,
-                "revenue": 0,
-                "new_customers": 0,
-                "active_users": 0,
-                "source": "api_error"
-            } 
\ No newline at end of file
+    def send_metrics(self):
+        """Prometheus文本格式的上游调用耗时"""
+        from dashboard_core.metrics import registry as upstream_metrics
+        body = upstream_metrics.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,78 @@
+import json
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+import os
+import sys
+import time
+
+# 让Vercel函数可以导入项目根目录下的共享模块
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from dashboard_core.history import HistoryStore, METRICS, default_resolution, parse_range
+
+# update.py生成的历史数据库（随部署一起发布，只读）
+HISTORY_PATH = os.environ.get('DASHBOARD_HISTORY_PATH', os.path.join(ROOT_DIR, 'history.sqlite'))
+
+_store = None
+
+def get_store():
+    """只读打开历史数据库，热启动时复用连接"""
+    global _store
+    if _store is None and os.path.exists(HISTORY_PATH):
+        _store = HistoryStore(HISTORY_PATH, readonly=True)
+    return _store
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            params = parse_qs(urlparse(self.path).query)
+            metric = params.get('metric', ['arr'])[0]
+            range_value = params.get('range', ['24h'])[0]
+
+            if metric not in METRICS:
+                self.send_json(400, {"error": f"unknown metric, expected one of: {', '.join(METRICS)}"})
+                return
+
+            try:
+                range_seconds = parse_range(range_value)
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+
+            resolution = params.get('resolution', [default_resolution(range_seconds)])[0]
+            aggregate = params.get('agg', ['avg'])[0]
+
+            store = get_store()
+            if store is None:
+                self.send_json(503, {"error": "history not available"})
+                return
+
+            end = int(time.time())
+            try:
+                points = store.query(metric, end - range_seconds, end, resolution=resolution, aggregate=aggregate)
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+
+            self.send_json(200, {
+                "metric": metric,
+                "range": range_value,
+                "resolution": resolution,
+                "aggregate": aggregate if resolution != "raw" else "raw",
+                "points": points
+            }, cache_control='max-age=60')
+
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def send_json(self, status, data, cache_control=None):
+        """发送JSON响应"""
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if cache_control:
+            self.send_header('Cache-Control', cache_control)
+        self.end_headers()
+        self.wfile.write(json.dumps(data).encode())
@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import json
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+import os
+import sys
+import time
+
+# 让Vercel函数可以导入项目根目录下的共享模块
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from api.history import HISTORY_PATH, get_store
+from dashboard_core.history import METRICS, default_resolution, parse_range
+from dashboard_core.series import encode_series
+from dashboard_core.stream import etag_matches
+
+# 默认返回的指标（页面上的三张卡片）
+DEFAULT_METRICS = "totalUsers,arr,activeSubscriptions"
+
+# 不超过这个时间范围时默认返回原始点（每次update.py运行一个点），更长的范围使用汇总
+RAW_MAX_RANGE = os.environ.get('SERIES_RAW_MAX_RANGE', '90d')
+
+# 响应体超过这个字节数且客户端支持时用gzip压缩
+GZIP_MIN_BYTES = 1024
+
+# 编码结果在热启动的多次调用之间复用（秒，与Cache-Control一致），历史数据库变化时立即失效
+CACHE_TTL = 60
+CACHE_MAX_ENTRIES = 16
+_cache = {}
+
+def encode_cached(key, build):
+    """返回 (ETag, JSON响应体, gzip压缩后的响应体或None)，90天的原始点查询和编码需要几百毫秒"""
+    try:
+        version = os.stat(HISTORY_PATH).st_mtime_ns
+    except OSError:
+        version = None
+    now = time.monotonic()
+    cached = _cache.get(key)
+    if cached and cached[0] == version and now - cached[1] < CACHE_TTL:
+        return cached[2:]
+
+    body = json.dumps(build(), separators=(",", ":")).encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+    compressed = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+    if len(_cache) >= CACHE_MAX_ENTRIES:
+        _cache.clear()
+    _cache[key] = (version, now, etag, body, compressed)
+    return etag, body, compressed
+
+class handler(BaseHTTPRequestHandler):
+    """
+    多个指标的紧凑历史序列（格式见dashboard_core/series.py）
+    /api/series?metrics=totalUsers,arr&range=90d&resolution=raw
+    """
+
+    def do_GET(self):
+        try:
+            params = parse_qs(urlparse(self.path).query)
+            metrics = [name.strip() for name in params.get('metrics', [DEFAULT_METRICS])[0].split(',') if name.strip()]
+            range_value = params.get('range', ['90d'])[0]
+
+            unknown = [name for name in metrics if name not in METRICS]
+            if not metrics or unknown:
+                self.send_json(400, {"error": f"unknown metric, expected one of: {', '.join(METRICS)}"})
+                return
+
+            try:
+                range_seconds = parse_range(range_value)
+                raw_max_range = parse_range(RAW_MAX_RANGE)
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+
+            default = "raw" if range_seconds <= raw_max_range else default_resolution(range_seconds)
+            resolution = params.get('resolution', [default])[0]
+            aggregate = params.get('agg', ['avg'])[0]
+
+            store = get_store()
+            if store is None:
+                self.send_json(503, {"error": "history not available"})
+                return
+
+            def build():
+                end = int(time.time())
+                series = {
+                    metric: store.query(metric, end - range_seconds, end, resolution=resolution, aggregate=aggregate)
+                    for metric in metrics
+                }
+                return dict(
+                    encode_series(series),
+                    range=range_value,
+                    resolution=resolution,
+                    aggregate=aggregate if resolution != "raw" else "raw"
+                )
+
+            try:
+                etag, body, compressed = encode_cached((tuple(metrics), range_value, resolution, aggregate), build)
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+
+            # 历史数据没有新的点时返回304
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Cache-Control', 'max-age=60')
+                self.end_headers()
+                return
+
+            encoding = None
+            if compressed is not None and 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+                body, encoding = compressed, 'gzip'
+
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Cache-Control', 'max-age=60')
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def send_json(self, status, data):
+        """发送JSON错误响应"""
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(data).encode())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+冷启动导入耗时检查
+用 python -X importtime 测量 api/data.py 的导入耗时，扣除Vercel运行时本身就会导入的模块（http.server、json），
+超过预算或在冷启动时导入了重依赖（requests、urllib3、线程池等）时以非零状态退出
+
+同时报告第一次请求上游时各传输实现额外导入的耗时（HTTP_TRANSPORT=urllib 不应导入requests/urllib3）
+
+用法: python3 bench/importtime.py --budget-ms 15 --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+# Vercel的Python运行时在导入函数之前已经导入的模块
+BASELINE_CODE = "import http.server, json"
+
+# 冷启动时不应导入的模块（只在请求上游时才需要）
+COLD_START_FORBIDDEN = (
+    "requests", "urllib3", "charset_normalizer", "chardet", "idna", "certifi", "httpx",
+    "concurrent.futures", "dashboard_core.scheduler", "dashboard_core.breaker", "dashboard_core.transport"
+)
+STDLIB_TRANSPORT_FORBIDDEN = ("requests", "urllib3", "charset_normalizer", "chardet", "idna", "httpx")
+
+# 场景: (名称, 导入代码, 额外环境变量, 不应导入的模块, 是否计入预算)
+SCENARIOS = [
+    ("cold_start", "import api.data", {}, COLD_START_FORBIDDEN, True),
+    ("first_upstream_call[requests]",
+     "import api.data; from dashboard_core import scheduler, transport; transport.get_transport()",
+     {"HTTP_TRANSPORT": "requests"}, (), False),
+    ("first_upstream_call[urllib]",
+     "import api.data; from dashboard_core import scheduler, transport; transport.get_transport()",
+     {"HTTP_TRANSPORT": "urllib"}, STDLIB_TRANSPORT_FORBIDDEN, False)
+]
+
+def measure(code, env_overrides):
+    """运行一次 python -X importtime，返回 {模块名: 自身耗时(微秒)}"""
+    env = dict(os.environ, **env_overrides)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{BASELINE_CODE}; {code}" if code else BASELINE_CODE],
+        capture_output=True, text=True, cwd=ROOT_DIR, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import failed ({code}):\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(self_us)
+    return modules
+
+def measure_scenario(code, env_overrides, runs):
+    """多次运行取中位数，返回 (额外耗时毫秒, {额外模块: 自身耗时中位数(毫秒)})"""
+    totals = []
+    samples = {}
+    for _ in range(runs):
+        baseline = measure("", env_overrides)
+        target = measure(code, env_overrides)
+        extra = {name: us for name, us in target.items() if name not in baseline}
+        totals.append(sum(extra.values()) / 1000)
+        for name, us in extra.items():
+            samples.setdefault(name, []).append(us / 1000)
+    modules = {name: statistics.median(values) for name, values in samples.items()}
+    return statistics.median(totals), modules
+
+def main():
+    parser = argparse.ArgumentParser(description="api/data.py 冷启动导入耗时检查")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get('IMPORT_BUDGET_MS', '15')),
+                        help="冷启动额外导入耗时预算（毫秒，默认IMPORT_BUDGET_MS或15）")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景的测量次数（取中位数）")
+    parser.add_argument("--top", type=int, default=8, help="显示耗时最多的模块数")
+    parser.add_argument("--json", action="store_true", help="输出JSON")
+    args = parser.parse_args()
+
+    # 预热一次，生成.pyc，不计入结果
+    measure(SCENARIOS[0][1], {})
+
+    results = []
+    violations = []
+    for name, code, env_overrides, forbidden, budgeted in SCENARIOS:
+        total_ms, modules = measure_scenario(code, env_overrides, args.runs)
+        imported = sorted(module for module in forbidden if module in modules)
+        top = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        results.append({
+            "scenario": name,
+            "importMs": round(total_ms, 1),
+            "budgetMs": args.budget_ms if budgeted else None,
+            "modules": len(modules),
+            "forbiddenImported": imported,
+            "top": [{"module": module, "selfMs": round(ms, 2)} for module, ms in top]
+        })
+        if imported:
+            violations.append(f"{name}: imported {', '.join(imported)}")
+        if budgeted and total_ms > args.budget_ms:
+            violations.append(f"{name}: {total_ms:.1f}ms exceeds budget {args.budget_ms:.1f}ms")
+
+    if args.json:
+        print(json.dumps({"results": results, "violations": violations}, indent=2))
+    else:
+        for result in results:
+            budget = f" / budget {result['budgetMs']:.1f}ms" if result["budgetMs"] is not None else ""
+            print(f"{result['scenario']:<32} {result['importMs']:>7.1f}ms{budget}  ({result['modules']} modules)")
+            for entry in result["top"]:
+                print(f"    {entry['selfMs']:>7.2f}ms  {entry['module']}")
+        for violation in violations:
+            print(f"❌ {violation}")
+        if not violations:
+            print("✅ import time within budget")
+
+    sys.exit(1 if violations else 0)
+
+if __name__ == "__main__":
+    main()
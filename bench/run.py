@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+离线基准测试
+针对本地桩服务运行 update.generate_dashboard() 和 api/data.py 的 handler.do_GET，
+报告每个场景（segment数量）的耗时p50/p99、总耗时和每次运行的上游请求数
+
+每个 目标 × 场景 在独立的子进程中运行（模块级配置在导入时读取环境变量，各种进程内缓存互不影响），
+桩服务运行在主进程中，不与被测代码争用GIL
+
+用法: python3 bench/run.py --segments 10,100,1000 --iterations 5 --latency-ms 20
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from stub_server import StubUpstream, start_stub
+
+TARGETS = ("generate_dashboard", "handler")
+
+# 默认放开限速，测量的是代码本身而不是上游配额（--real-rate-limits 使用真实限额）
+UNTHROTTLED_RATES = json.dumps({
+    "customer_io": {"rate": 1000000, "burst": 1000000},
+    "revenuecat": {"rate": 1000000, "burst": 1000000}
+})
+
+def percentile(values, q):
+    """最近秩法分位数"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+# ============ 子进程：运行单个场景 =============
+def configure_environment(args, stub_url, work_dir):
+    """在导入update / api.data之前设置环境变量"""
+    os.environ.update({
+        "CUSTOMER_IO_API_BASE": f"{stub_url}/v1",
+        "REVENUECAT_API_BASE": f"{stub_url}/v2",
+        "CUSTOMER_IO_APP_API_KEY": "bench-customer-io-key",
+        "REVENUECAT_TOKEN": "bench-revenuecat-token",
+        "DASHBOARD_CACHE_DIR": os.path.join(work_dir, ".cache"),
+        "REVENUECAT_PROJECT_CACHE": os.path.join(work_dir, "revenuecat_project.json"),
+        "DASHBOARD_HISTORY": "false",
+        "RESPONSE_CACHE": "false",
+        "CUSTOMER_IO_EMAIL_SEGMENTS_ONLY": "true" if args.email_segments_only else "false"
+    })
+    if not args.real_rate_limits:
+        os.environ["UPSTREAM_RATE_LIMITS"] = UNTHROTTLED_RATES
+
+def make_generate_dashboard_runner(work_dir):
+    shutil.copy(os.path.join(ROOT_DIR, "template.html"), work_dir)
+    os.chdir(work_dir)
+    import update
+    # 日志输出本身也是运行成本的一部分，但不需要显示
+    logging.getLogger().handlers = [logging.StreamHandler(io.StringIO())]
+
+    def run():
+        update.generate_dashboard()
+        return True
+    return run
+
+def make_handler_runner():
+    from api import data as data_api
+
+    def run():
+        # 每次都重建模块级缓存，测量的是未命中缓存时的完整请求
+        data_api.payload_cache = data_api.PayloadCache(data_api.CACHE_TTL)
+        request = data_api.handler.__new__(data_api.handler)
+        request.path = "/api/data"
+        request.headers = {}
+        request.wfile = io.BytesIO()
+        status = {}
+        request.send_response = lambda code, message=None: status.setdefault("code", code)
+        request.send_header = lambda key, value: None
+        request.end_headers = lambda: None
+        request.do_GET()
+        return status.get("code") == 200
+    return run
+
+def stub_control(stub_url, action):
+    """桩服务的控制接口（不计入请求数）"""
+    method = "POST" if action == "reset" else "GET"
+    with urllib.request.urlopen(urllib.request.Request(f"{stub_url}/__stub/{action}", method=method)) as response:
+        return json.loads(response.read())
+
+def run_worker(args):
+    work_dir = tempfile.mkdtemp(prefix="dashboard-bench-")
+    try:
+        configure_environment(args, args.stub_url, work_dir)
+        run = make_generate_dashboard_runner(work_dir) if args.target == "generate_dashboard" else make_handler_runner()
+
+        timings, calls, failures = [], [], 0
+        for iteration in range(args.warmup + args.iterations):
+            stub_control(args.stub_url, "reset")
+            started = time.perf_counter()
+            try:
+                ok = run()
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if iteration < args.warmup:
+                continue
+            timings.append(elapsed)
+            calls.append(stub_control(args.stub_url, "calls")["total"])
+            failures += 0 if ok else 1
+
+        print(json.dumps({
+            "target": args.target,
+            "segments": args.segment_count,
+            "iterations": args.iterations,
+            "wallSeconds": round(sum(timings), 4),
+            "p50Ms": round(percentile(timings, 0.5) * 1000, 1),
+            "p99Ms": round(percentile(timings, 0.99) * 1000, 1),
+            "callsPerRun": round(sum(calls) / len(calls), 1),
+            "failures": failures
+        }))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+# ============ 主进程：调度各个场景 =============
+def run_scenario(args, target, segment_count):
+    stub = StubUpstream(segment_count, args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed,
+                        project_count=args.projects)
+    server = start_stub(stub)
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker",
+        "--target", target,
+        "--segment-count", str(segment_count),
+        "--stub-url", f"http://127.0.0.1:{server.server_port}",
+        "--iterations", str(args.iterations),
+        "--warmup", str(args.warmup)
+    ]
+    if args.email_segments_only:
+        command.append("--email-segments-only")
+    if args.real_rate_limits:
+        command.append("--real-rate-limits")
+
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, cwd=ROOT_DIR)
+    finally:
+        server.shutdown()
+        server.server_close()
+    if result.returncode != 0:
+        raise RuntimeError(f"{target} @ {segment_count} segments failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="UnlockLand Dashboard 离线基准测试")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"逗号分隔: {', '.join(TARGETS)}")
+    parser.add_argument("--segments", default="10,100,1000", help="逗号分隔的segment数量场景")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1, help="不计入结果的预热次数")
+    parser.add_argument("--projects", type=int, default=1, help="桩服务的RevenueCat项目数量")
+    parser.add_argument("--latency-ms", type=float, default=20, help="桩服务每个请求的固定延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="桩服务额外的随机延迟上限")
+    parser.add_argument("--error-rate", type=float, default=0, help="桩服务返回503的概率")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--email-segments-only", action="store_true", help="只获取两个邮箱segment（api/data.py的默认配置）")
+    parser.add_argument("--real-rate-limits", action="store_true", help="使用真实的上游限额")
+    parser.add_argument("--json", action="store_true", help="输出JSON")
+    # 子进程参数
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--target", help=argparse.SUPPRESS)
+    parser.add_argument("--segment-count", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--stub-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    targets = [name.strip() for name in args.targets.split(",") if name.strip()]
+    unknown = [name for name in targets if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(unknown)}")
+
+    results = []
+    for target in targets:
+        for segment_count in (int(value) for value in args.segments.split(",")):
+            results.append(run_scenario(args, target, segment_count))
+            if not args.json:
+                result = results[-1]
+                print(f"{result['target']:<20} {result['segments']:>6} segments  "
+                      f"p50 {result['p50Ms']:>8.1f}ms  p99 {result['p99Ms']:>8.1f}ms  "
+                      f"wall {result['wallSeconds']:>7.2f}s  {result['callsPerRun']:>7.1f} calls/run  "
+                      f"{result['failures']} failures", flush=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+本地上游桩服务
+回放 bench/fixtures 中录制的 Customer.io / RevenueCat 响应，用于离线基准测试
+- 可配置延迟（固定 + 随机抖动）、错误率（返回503）、segment数量和RevenueCat项目数量（/v2/projects分页）
+- 按接口模板统计收到的请求数（GET /__stub/calls 查看，POST /__stub/reset 清零，这两个请求不计数）
+
+用法: python3 bench/stub_server.py --port 9000 --segments 100 --projects 3 --latency-ms 50 --error-rate 0.01
+然后设置 CUSTOMER_IO_API_BASE=http://127.0.0.1:9000/v1 REVENUECAT_API_BASE=http://127.0.0.1:9000/v2
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# 路由: (方法, 路径正则, 接口模板, 响应生成函数名)
+ROUTES = [
+    ("GET", re.compile(r"^/v1/segments$"), "/v1/segments", "segments"),
+    ("GET", re.compile(r"^/v1/segments/(\d+)/customer_count$"), "/v1/segments/{id}/customer_count", "customer_count"),
+    ("POST", re.compile(r"^/v1/customers$"), "/v1/customers", "customers_search"),
+    ("GET", re.compile(r"^/v2/projects$"), "/v2/projects", "projects"),
+    ("GET", re.compile(r"^/v2/projects/[^/]+/metrics/overview$"), "/v2/projects/{id}/metrics/overview", "metrics_overview"),
+    ("GET", re.compile(r"^/v2/projects/[^/]+/apps$"), "/v2/projects/{id}/apps", "apps")
+]
+
+class StubUpstream:
+    """桩服务状态：场景配置、录制的响应和请求计数"""
+
+    def __init__(self, segment_count=10, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None,
+                 project_count=1, project_page_size=20):
+        self.segment_count = segment_count
+        self.project_count = project_count
+        self.project_page_size = project_page_size
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.fixtures = {
+            name: load_fixture(f"{name}.json")
+            for name in ("segments", "customer_count", "customers_search", "projects", "metrics_overview", "apps")
+        }
+        self.segments = self.build_segments()
+        self.projects = self.build_projects()
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def build_segments(self):
+        """按segment数量循环复制录制的segment列表，前两个始终是邮箱segment"""
+        recorded = self.fixtures["segments"]["segments"]
+        segments = []
+        for index in range(self.segment_count):
+            template = recorded[index % len(recorded)]
+            segment = dict(template, id=index + 1, deduplicate_id=f"{index + 1}:1697000000")
+            if index >= len(recorded):
+                segment["name"] = f"{template['name']} {index // len(recorded)}"
+            segments.append(segment)
+        return segments
+
+    def build_projects(self):
+        """第一个项目是录制的项目，其余按序号生成"""
+        recorded = self.fixtures["projects"]["items"][0]
+        return [recorded] + [
+            dict(recorded, id=f"proj{index + 1}", name=f"{recorded['name']} {index + 1}")
+            for index in range(1, self.project_count)
+        ]
+
+    def projects_page(self, query):
+        """/v2/projects 按 starting_after / limit 分页，与真实接口一样返回相对路径的next_page"""
+        params = parse_qs(query)
+        limit = int(params.get("limit", [self.project_page_size])[0])
+        starting_after = params.get("starting_after", [None])[0]
+        ids = [project["id"] for project in self.projects]
+        start = ids.index(starting_after) + 1 if starting_after in ids else 0
+        items = self.projects[start:start + limit]
+        next_page = None
+        if start + limit < len(self.projects):
+            next_page = f"/v2/projects?starting_after={items[-1]['id']}&limit={limit}"
+        return dict(self.fixtures["projects"], items=items, next_page=next_page)
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls = {}
+
+    def respond(self, method, path, query=""):
+        """返回 (状态码, 响应JSON)"""
+        for route_method, pattern, template, name in ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                with self._lock:
+                    self.calls[template] = self.calls.get(template, 0) + 1
+
+                delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+                if delay:
+                    time.sleep(delay / 1000)
+                if self.error_rate and self.random.random() < self.error_rate:
+                    return 503, {"error": "stub injected failure"}
+
+                if name == "segments":
+                    return 200, {"segments": self.segments}
+                if name == "customer_count":
+                    segment_id = int(match.group(1))
+                    if segment_id > self.segment_count:
+                        return 404, {"error": "segment not found"}
+                    return 200, {"count": self.fixtures["customer_count"]["count"] + segment_id}
+                if name == "projects":
+                    return 200, self.projects_page(query)
+                return 200, self.fixtures[name]
+        return 404, {"error": "not found"}
+
+def make_handler(stub):
+    class StubHandler(BaseHTTPRequestHandler):
+        # keep-alive，和真实上游一样可以复用连接
+        protocol_version = "HTTP/1.1"
+        # 响应头和响应体分两次写出，关闭Nagle避免与客户端的延迟ACK叠加出40ms的额外等待
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.reply()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            self.reply()
+
+        def reply(self):
+            url = urlparse(self.path)
+            path = url.path
+            if path == "/__stub/calls":
+                with stub._lock:
+                    status, data = 200, {"total": sum(stub.calls.values()), "calls": dict(stub.calls)}
+            elif path == "/__stub/reset":
+                stub.reset_calls()
+                status, data = 200, {"ok": True}
+            else:
+                status, data = stub.respond(self.command, path, url.query)
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+def start_stub(stub, host="127.0.0.1", port=0):
+    """在后台线程启动桩服务，返回server（server.server_port为实际端口）"""
+    server = ThreadingHTTPServer((host, port), make_handler(stub))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Customer.io / RevenueCat 本地桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--segments", type=int, default=10, help="segment数量")
+    parser.add_argument("--projects", type=int, default=1, help="RevenueCat项目数量")
+    parser.add_argument("--project-page-size", type=int, default=20, help="/v2/projects每页项目数")
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个请求的固定延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="额外的随机延迟上限（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0, help="返回503的概率（0-1）")
+    args = parser.parse_args()
+
+    stub = StubUpstream(args.segments, args.latency_ms, args.jitter_ms, args.error_rate,
+                        project_count=args.projects, project_page_size=args.project_page_size)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(stub))
+    print(f"🧪 桩服务已启动: http://{args.host}:{args.port} ({args.segments} segments, {args.projects} projects)")
+    print(f"   CUSTOMER_IO_API_BASE=http://{args.host}:{args.port}/v1")
+    print(f"   REVENUECAT_API_BASE=http://{args.host}:{args.port}/v2")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"👋 桩服务已停止，共收到请求: {json.dumps(stub.calls)}")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+UnlockLand Dashboard 共享核心模块
+update.py（静态仪表板生成器）和 api/（Vercel函数）共用的基础设施
+"""
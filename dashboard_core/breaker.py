@@ -0,0 +1,144 @@
+"""
+按数据源的熔断器
+- closed: 正常请求，连续失败达到阈值后打开
+- open: 直接拒绝请求（调用方改用最后一次成功的缓存数据），等待时间按连续打开次数指数增长并加随机抖动
+- half_open: 等待结束后只放行一个探测请求，成功则关闭，失败则重新打开并加倍等待时间
+失败指请求异常（超时、连接错误）以及5xx响应；429说明上游可用只是限流（由scheduler的令牌桶暂停处理），
+与其他4xx一样不计入失败
+"""
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict
+
+# 熔断配置
+FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '3'))  # 连续失败多少次后打开
+BASE_DELAY = float(os.environ.get('CIRCUIT_BASE_DELAY', '5'))  # 第一次打开的等待秒数
+MAX_DELAY = float(os.environ.get('CIRCUIT_MAX_DELAY', '300'))  # 等待秒数上限
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开时拒绝请求"""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"circuit open for {provider}, retry in {retry_in:.1f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+def is_failure_status(status_code: int) -> bool:
+    """计入熔断失败的响应状态码"""
+    return status_code >= 500
+
+class CircuitBreaker:
+    """单个数据源的熔断器"""
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, base_delay: float = BASE_DELAY,
+                 max_delay: float = MAX_DELAY, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0  # 当前连续失败次数
+        self._trips = 0  # 连续打开次数（决定等待时间）
+        self._open_until = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        """当前状态（等待时间结束的open视为half_open，但不占用探测名额）"""
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> bool:
+        """是否放行本次请求；half_open状态下只放行一个探测请求"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._state = HALF_OPEN
+                self._probing = True
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        """距离下一次允许探测的秒数"""
+        with self._lock:
+            return max(0.0, self._open_until - self.clock()) if self._state == OPEN else 0.0
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trips = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == OPEN:
+                # 打开之前发出的请求随后失败，不再重复计入
+                return
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._trip()
+
+    def describe(self) -> Dict[str, Any]:
+        """状态详情，用于附加到响应JSON"""
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "failures": self._failures,
+                "retryInMs": int(max(0.0, self._open_until - self.clock()) * 1000) if self._state == OPEN else 0
+            }
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self.clock() >= self._open_until:
+            return HALF_OPEN
+        return self._state
+
+    def _trip(self) -> None:
+        # 指数退避，抖动范围为等待时间的后一半，避免多个实例同时探测
+        self._trips += 1
+        delay = min(self.max_delay, self.base_delay * (2 ** (self._trips - 1)))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self._state = OPEN
+        self._open_until = self.clock() + delay
+        self._probing = False
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """数据源对应的熔断器（进程内共享）"""
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+def states() -> Dict[str, str]:
+    """所有熔断器的当前状态"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.state for breaker in breakers}
+
+def admit(provider: str) -> CircuitBreaker:
+    """放行一次请求（包含其所有重试），熔断器打开时抛出CircuitOpenError"""
+    breaker = get_breaker(provider)
+    if not breaker.allow():
+        raise CircuitOpenError(provider, breaker.retry_in())
+    return breaker
+
+def record_status(breaker: CircuitBreaker, status_code: int) -> None:
+    """按请求的最终响应状态码记录结果"""
+    if is_failure_status(status_code):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
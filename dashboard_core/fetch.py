@@ -0,0 +1,131 @@
+"""
+上游请求的统一入口（update.py和api/data.py共用同一条路径）
+- 同一次采集中每个GET资源（URL + 凭据）只请求一次，所有数据源共享同一份结果；
+  并发的相同请求等待正在进行的那一次（single-flight）
+- 可选的本地响应缓存：新鲜时直接返回，过期时带条件请求头重新验证（304复用）
+- 数据源熔断期间不发起请求，返回最后一次成功的缓存（不论是否过期）
+- 按数据源限速排队、429/5xx重试（scheduler），通过共享连接池发送并记录耗时（transport / metrics）
+- 按数据源累计真正发往上游的请求数
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple
+
+from dashboard_core import breaker, scheduler
+from dashboard_core.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+class Fetcher:
+    """一次采集（一次update.py运行或一次/api/data刷新）的上游请求"""
+
+    def __init__(self, response_cache: Optional[ResponseCache] = None, deadline: Optional[float] = None):
+        # deadline为time.monotonic()的截止时间，排队和重试都不超过它；None时每次调用使用scheduler的默认截止时间
+        self.response_cache = response_cache
+        self.deadline = deadline
+        self.request_counts: Dict[str, int] = {}
+        # 每个GET资源的结果，请求完成前是进行中的Future
+        self._responses: Dict[Tuple[str, Optional[str]], Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, url: str, headers: Dict[str, str], timeout: float = 30) -> Optional[Dict]:
+        """GET请求，结果在本次采集内复用（不同workspace / token的同一URL分开）"""
+        key = (url, headers.get("Authorization"))
+        with self._lock:
+            future = self._responses.get(key)
+            owner = future is None
+            if owner:
+                future = self._responses[key] = Future()
+
+        if not owner:
+            if future.done():
+                logger.info(f"♻️ 复用本次采集已获取的数据: {url}")
+            else:
+                logger.info(f"⏳ 等待进行中的相同请求: {url}")
+            return future.result()
+
+        result = None
+        try:
+            result = self.request(provider, "GET", url, headers, timeout=timeout)
+        finally:
+            # request不抛出异常；即使抛出，等待者也得到None而不是一直阻塞
+            future.set_result(result)
+        return result
+
+    def post(self, provider: str, url: str, headers: Dict[str, str], data: Optional[Dict] = None,
+             timeout: float = 30) -> Optional[Dict]:
+        """POST请求（不复用、不缓存）"""
+        return self.request(provider, "POST", url, headers, data=data, timeout=timeout)
+
+    def request(self, provider: str, method: str, url: str, headers: Dict[str, str],
+                data: Optional[Dict] = None, timeout: float = 30) -> Optional[Dict]:
+        """成功时返回响应JSON，失败（非200、熔断、超时、异常）时返回None"""
+        try:
+            cache = self.response_cache if method == "GET" else None
+            cached = cache.lookup(url, headers) if cache else None
+
+            if cached and cached.fresh:
+                cache.record("hits")
+                logger.info(f"💾 使用本地缓存: {url}")
+                return cached.body
+
+            # 数据源熔断期间不发起请求
+            if breaker.get_breaker(provider).state == breaker.OPEN:
+                return self.short_circuit(provider, url, cached)
+
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                logger.warning(f"⏰ 已超过截止时间，跳过请求: {url}")
+                return None
+
+            logger.info(f"🔍 请求: {method} {url}")
+            with self._lock:
+                self.request_counts[provider] = self.request_counts.get(provider, 0) + 1
+
+            request_headers = dict(headers, **cache.conditional_headers(cached)) if cache else headers
+
+            try:
+                response = scheduler.request(provider, method, url, headers=request_headers,
+                                             json=data if method != "GET" else None, timeout=timeout,
+                                             deadline=self.deadline)
+            except breaker.CircuitOpenError:
+                return self.short_circuit(provider, url, cached)
+
+            logger.info(f"📊 响应状态: {response.status_code}")
+
+            if response.status_code == 304 and cached:
+                cache.record("revalidated")
+                cache.touch(url, headers)
+                logger.info(f"💾 上游数据未变化，复用本地缓存")
+                return cached.body
+
+            if response.status_code == 200:
+                body = response.json()
+                if cache:
+                    cache.record("misses")
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+                    if cache.should_store(url, etag, last_modified):
+                        cache.store(url, headers, body, etag, last_modified)
+                return body
+
+            logger.error(f"❌ API错误 {response.status_code}: {response.text[:500]}")
+            return None
+
+        except Exception as e:
+            logger.error(f"❌ 请求异常: {e}")
+            return None
+
+    @staticmethod
+    def short_circuit(provider: str, url: str, cached) -> Optional[Dict]:
+        """熔断期间返回最后一次成功的缓存响应（不论是否过期），没有缓存时返回None"""
+        if cached:
+            logger.warning(f"⚡ {provider} 熔断中，使用最后一次成功的缓存: {url}")
+            return cached.body
+        logger.warning(f"⚡ {provider} 熔断中，跳过请求: {url}")
+        return None
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.request_counts.values())
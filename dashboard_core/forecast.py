@@ -0,0 +1,341 @@
+"""
+基于指标历史的预测（每个UTC日拟合一次，之后的查询都是O(1)的算术）
+- 每日新用户: totalUsers每天最后一个值的差分，去掉数据源失败造成的跳变（负值和远大于中位数的值）
+  → 用居中的7日滚动均值求星期季节因子 → 对去季节化的序列做简单指数平滑得到水平
+  → 某天的预测 = 水平 × 当天的星期因子
+- ARR: 每天最后一个值的7日滚动均值 → 对日变化做简单指数平滑得到每日趋势
+  → 月底ARR = 当前ARR + 趋势 × 剩余天数
+- 对整条序列批量计算；NumPy为可选依赖，未安装时使用等价的纯Python实现
+- 拟合结果按UTC日缓存（内存 + 磁盘JSON），同一天内的多次运行和请求不重复计算；
+  历史不足时不缓存，数据够了之后当天就能开始预测
+"""
+import calendar
+import json
+import logging
+import math
+import os
+import threading
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dashboard_core.history import HistoryStore
+
+logger = logging.getLogger(__name__)
+
+# 参与拟合的历史天数
+HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS', '120'))
+# 至少需要的有效天数（星期因子需要每个星期几都有数据）
+MIN_DAYS = int(os.environ.get('FORECAST_MIN_DAYS', '14'))
+# 简单指数平滑系数，越大越偏向最近的数据
+ALPHA = float(os.environ.get('FORECAST_ALPHA', '0.3'))
+# 滚动均值窗口（天）及窗口内至少需要的有效值个数
+WINDOW = 7
+MIN_WINDOW_COUNT = 4
+# 超过正值中位数这个倍数的日增量视为异常（备用数据恢复为真实数据时的跳变）
+OUTLIER_FACTOR = 10.0
+# 星期因子的下限（某个星期几一直没有新用户时避免除以0）
+MIN_FACTOR = 0.1
+
+# 磁盘缓存格式版本，拟合方法变化时加一
+CACHE_VERSION = 1
+
+@dataclass(frozen=True)
+class Forecast:
+    """一次拟合的结果"""
+    day: str  # 拟合日期（UTC），缓存按这个值失效
+    history_days: int  # 参与拟合的有效天数
+    new_users_level: float  # 去季节化后的每日新用户水平
+    weekday_factors: Tuple[float, ...]  # 周一到周日的季节因子（均值为1）
+    arr_last: float  # 最后一个完整日的ARR
+    arr_rolling_7d: float
+    arr_daily_trend: float
+
+    def weekday_factor(self, when: date) -> float:
+        return self.weekday_factors[when.weekday()]
+
+    def new_users_on(self, when: date) -> int:
+        """某天的新用户预测"""
+        return max(0, round(self.new_users_level * self.weekday_factor(when)))
+
+    def arr_at(self, when: date, current_arr: Optional[float] = None, today: Optional[date] = None) -> float:
+        """某天的ARR预测，传入current_arr时以今天的实际值为起点"""
+        if current_arr is None:
+            start, base = date.fromisoformat(self.day) - timedelta(days=1), self.arr_last
+        else:
+            start, base = today or date.fromisoformat(self.day), current_arr
+        return base + self.arr_daily_trend * (when - start).days
+
+    def projections(self, current_arr: Optional[float] = None, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """响应JSON中的预测值"""
+        today = (now or datetime.now(timezone.utc)).date()
+        month_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+        return {
+            "newUsersToday": self.new_users_on(today),
+            "arrEndOfMonth": round(self.arr_at(month_end, current_arr, today), 2),
+            "arrDailyTrend": round(self.arr_daily_trend, 2),
+            "arrRolling7d": round(self.arr_rolling_7d, 2),
+            "weekdayFactors": [round(factor, 3) for factor in self.weekday_factors],
+            "historyDays": self.history_days,
+            "fittedFor": self.day
+        }
+
+# ============ 拟合 =============
+def _numpy():
+    """NumPy为可选依赖，未安装时返回None"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def fit(users: Sequence[Optional[float]], arr: Sequence[Optional[float]], first_day: date,
+        today: date, alpha: float = ALPHA) -> Optional[Forecast]:
+    """
+    users / arr 为从first_day开始逐日的最后一个值（缺失为None），到昨天为止
+    有效天数不足时返回None
+    """
+    np = _numpy()
+    if np is not None:
+        fitted = _fit_numpy(np, users, arr, first_day.weekday(), alpha)
+    else:
+        fitted = _fit_python(users, arr, first_day.weekday(), alpha)
+    if fitted is None:
+        return None
+
+    history_days, level, factors, arr_last, arr_rolling, arr_trend = fitted
+    return Forecast(
+        day=today.isoformat(),
+        history_days=history_days,
+        new_users_level=level,
+        weekday_factors=tuple(factors),
+        arr_last=arr_last,
+        arr_rolling_7d=arr_rolling,
+        arr_daily_trend=arr_trend
+    )
+
+def _fit_numpy(np, users, arr, first_weekday, alpha):
+    users = np.array([np.nan if value is None else value for value in users], dtype=float)
+    arr = np.array([np.nan if value is None else value for value in arr], dtype=float)
+    weekdays = (first_weekday + np.arange(len(users))) % 7
+
+    # 每日新用户，去掉负值和异常跳变
+    signups = np.concatenate(([np.nan], np.diff(users)))
+    with np.errstate(invalid="ignore"):
+        signups[signups < 0] = np.nan
+        positive = signups[signups > 0]
+        if positive.size:
+            signups[signups > OUTLIER_FACTOR * max(float(np.median(positive)), 1.0)] = np.nan
+    history_days = int(np.count_nonzero(~np.isnan(signups)))
+    if history_days < MIN_DAYS:
+        return None
+
+    # 星期因子：每天的值相对于以它为中心的7日均值的比例，按星期几取平均
+    centered = np.full(len(signups), np.nan)
+    centered[:len(signups) - WINDOW // 2] = _rolling_mean_numpy(np, signups)[WINDOW // 2:]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratios = np.where(centered > 0, signups / centered, np.nan)
+    factors = np.ones(7)
+    for weekday in range(7):
+        values = ratios[(weekdays == weekday) & ~np.isnan(ratios)]
+        if values.size:
+            factors[weekday] = values.mean()
+    factors = np.maximum(factors, MIN_FACTOR)
+    factors /= factors.mean()
+
+    level = _ses_numpy(np, signups / factors[weekdays], alpha)
+
+    # ARR趋势：7日滚动均值的日变化
+    arr_rolling = _rolling_mean_numpy(np, arr)
+    arr_trend = _ses_numpy(np, np.diff(arr_rolling), alpha)
+    valid_arr = arr[~np.isnan(arr)]
+    valid_rolling = arr_rolling[~np.isnan(arr_rolling)]
+    if not valid_arr.size:
+        return None
+
+    return (
+        history_days,
+        level,
+        [float(factor) for factor in factors],
+        float(valid_arr[-1]),
+        float(valid_rolling[-1]) if valid_rolling.size else float(valid_arr[-1]),
+        0.0 if math.isnan(arr_trend) else arr_trend
+    )
+
+def _rolling_mean_numpy(np, values):
+    """尾随窗口的滚动均值，忽略缺失值，窗口内有效值不足时为NaN"""
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0))
+    counts = np.cumsum(valid)
+    sums[WINDOW:] = sums[WINDOW:] - sums[:-WINDOW]
+    counts[WINDOW:] = counts[WINDOW:] - counts[:-WINDOW]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    means[counts < MIN_WINDOW_COUNT] = np.nan
+    return means
+
+def _ses_numpy(np, values, alpha):
+    """
+    简单指数平滑的最终水平（跳过缺失值），按权重一次求和:
+    l = (1-α)^(n-1)·x0 + Σ α(1-α)^(n-1-i)·xi
+    """
+    x = values[~np.isnan(values)]
+    if not x.size:
+        return math.nan
+    weights = alpha * (1 - alpha) ** np.arange(x.size - 1, -1, -1)
+    weights[0] = (1 - alpha) ** (x.size - 1)
+    return float(weights @ x)
+
+def _fit_python(users, arr, first_weekday, alpha):
+    n = len(users)
+    weekdays = [(first_weekday + index) % 7 for index in range(n)]
+
+    signups: List[Optional[float]] = [None] + [
+        current - previous if current is not None and previous is not None and current >= previous else None
+        for previous, current in zip(users, users[1:])
+    ]
+    positive = sorted(value for value in signups if value is not None and value > 0)
+    if positive:
+        limit = OUTLIER_FACTOR * max(_median(positive), 1.0)
+        signups = [value if value is not None and value <= limit else None for value in signups]
+    history_days = sum(value is not None for value in signups)
+    if history_days < MIN_DAYS:
+        return None
+
+    trailing = _rolling_mean_python(signups)
+    centered = trailing[WINDOW // 2:] + [None] * (WINDOW // 2)
+    ratio_sums = [0.0] * 7
+    ratio_counts = [0] * 7
+    for value, mean, weekday in zip(signups, centered, weekdays):
+        if value is not None and mean:
+            ratio_sums[weekday] += value / mean
+            ratio_counts[weekday] += 1
+    factors = [max(ratio_sums[weekday] / ratio_counts[weekday], MIN_FACTOR) if ratio_counts[weekday] else 1.0
+               for weekday in range(7)]
+    mean_factor = sum(factors) / 7
+    factors = [factor / mean_factor for factor in factors]
+
+    level = _ses_python([value / factors[weekday] if value is not None else None
+                         for value, weekday in zip(signups, weekdays)], alpha)
+
+    arr_rolling = _rolling_mean_python(arr)
+    arr_trend = _ses_python([current - previous if current is not None and previous is not None else None
+                             for previous, current in zip(arr_rolling, arr_rolling[1:])], alpha)
+    valid_arr = [value for value in arr if value is not None]
+    valid_rolling = [value for value in arr_rolling if value is not None]
+    if not valid_arr:
+        return None
+
+    return (
+        history_days,
+        level,
+        factors,
+        float(valid_arr[-1]),
+        float(valid_rolling[-1]) if valid_rolling else float(valid_arr[-1]),
+        0.0 if math.isnan(arr_trend) else arr_trend
+    )
+
+def _median(values: Sequence[float]) -> float:
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+def _rolling_mean_python(values: Sequence[Optional[float]]) -> List[Optional[float]]:
+    means: List[Optional[float]] = []
+    for index in range(len(values)):
+        window = [value for value in values[max(0, index - WINDOW + 1):index + 1] if value is not None]
+        means.append(sum(window) / len(window) if len(window) >= MIN_WINDOW_COUNT else None)
+    return means
+
+def _ses_python(values: Sequence[Optional[float]], alpha: float) -> float:
+    level = math.nan
+    for value in values:
+        if value is None:
+            continue
+        level = value if math.isnan(level) else alpha * value + (1 - alpha) * level
+    return level
+
+# ============ 按日缓存 =============
+def daily_last(store: HistoryStore, metric: str, first_day: date, days: int) -> List[Optional[float]]:
+    """从first_day开始逐日的最后一个值（天级汇总），没有数据的日期为None"""
+    start = int(datetime(first_day.year, first_day.month, first_day.day, tzinfo=timezone.utc).timestamp())
+    end = start + days * 86400 - 1
+    values: List[Optional[float]] = [None] * days
+    for bucket, value in store.query(metric, start, end, resolution="day", aggregate="last"):
+        values[(bucket - start) // 86400] = value
+    return values
+
+class ForecastModel:
+    """每个UTC日用指标历史拟合一次预测，结果保存在内存和磁盘JSON中"""
+
+    def __init__(self, history_path: str, cache_path: Optional[str] = None):
+        self.history_path = history_path
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._day: Optional[str] = None
+        self._forecast: Optional[Forecast] = None
+
+    def get(self, now: Optional[datetime] = None) -> Optional[Forecast]:
+        """今天的预测，历史数据不足或不可用时返回None（不缓存，下一次调用重新拟合）"""
+        today = (now or datetime.now(timezone.utc)).date()
+        with self._lock:
+            if self._day != today.isoformat():
+                forecast = self._load(today)
+                if forecast is None:
+                    forecast = self._fit(today)
+                    if forecast is None:
+                        return None
+                    self._save(today, forecast)
+                self._day, self._forecast = today.isoformat(), forecast
+            return self._forecast
+
+    def _fit(self, today: date) -> Optional[Forecast]:
+        if not os.path.exists(self.history_path):
+            return None
+        try:
+            store = HistoryStore(self.history_path, readonly=True)
+            try:
+                # 只用完整的日期（到昨天为止）
+                first_day = today - timedelta(days=HISTORY_DAYS)
+                users = daily_last(store, "totalUsers", first_day, HISTORY_DAYS)
+                arr = daily_last(store, "arr", first_day, HISTORY_DAYS)
+            finally:
+                store.close()
+            forecast = fit(users, arr, first_day, today)
+        except Exception as e:
+            logger.error(f"❌ 预测拟合失败: {e}")
+            return None
+
+        if forecast is None:
+            logger.info(f"📉 历史数据不足{MIN_DAYS}天，暂不预测")
+        else:
+            logger.info(f"📈 预测已更新: 每日新用户水平 {forecast.new_users_level:.1f}, "
+                        f"ARR日趋势 {forecast.arr_daily_trend:+.2f} ({forecast.history_days}天历史)")
+        return forecast
+
+    def _load(self, today: date) -> Optional[Forecast]:
+        """磁盘上当天的拟合结果"""
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION or data.get("day") != today.isoformat():
+                return None
+            forecast = data["forecast"]
+            return Forecast(**dict(forecast, weekday_factors=tuple(forecast["weekday_factors"])))
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _save(self, today: date, forecast: Forecast) -> None:
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": CACHE_VERSION,
+                    "day": today.isoformat(),
+                    "forecast": asdict(forecast)
+                }, f)
+        except OSError as e:
+            logger.warning(f"⚠️ 无法保存预测缓存: {e}")
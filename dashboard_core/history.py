@@ -0,0 +1,126 @@
+"""
+指标历史存储（SQLite，仅追加）
+- points表以 (metric, ts) 为聚簇主键（WITHOUT ROWID），同一指标的数据连续存放，范围查询的代价与返回点数成正比
+- 每次写入时增量维护小时/天级汇总（count/sum/min/max/last），长时间范围直接读取汇总，不扫描原始点
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 记录历史的指标
+METRICS = ("totalUsers", "arr", "mrr", "activeSubscriptions", "activeTrials")
+
+# 汇总粒度（秒）
+ROLLUPS = {"hour": 3600, "day": 86400}
+
+# 汇总可选的聚合方式
+AGGREGATES = {
+    "avg": "sum / count",
+    "min": "min",
+    "max": "max",
+    "last": "last"
+}
+
+RANGE_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+def parse_range(value: str) -> int:
+    """解析时间范围，如 30m / 24h / 7d / 4w，返回秒数"""
+    match = re.fullmatch(r"(\d+)([mhdw])", (value or "").strip())
+    if not match:
+        raise ValueError(f"invalid range: {value!r}")
+    return int(match.group(1)) * RANGE_UNITS[match.group(2)]
+
+def default_resolution(range_seconds: int) -> str:
+    """按时间范围选择合适的粒度，避免返回过多的点"""
+    if range_seconds <= 2 * 86400:
+        return "raw"
+    if range_seconds <= 31 * 86400:
+        return "hour"
+    return "day"
+
+class HistoryStore:
+    """指标历史存储"""
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if readonly:
+            # 部署环境中数据库文件只读
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS points ("
+            " metric TEXT NOT NULL, ts INTEGER NOT NULL, value REAL NOT NULL,"
+            " PRIMARY KEY (metric, ts)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS rollups ("
+            " resolution TEXT NOT NULL, metric TEXT NOT NULL, bucket INTEGER NOT NULL,"
+            " count INTEGER NOT NULL, sum REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL,"
+            " last REAL NOT NULL, last_ts INTEGER NOT NULL,"
+            " PRIMARY KEY (resolution, metric, bucket)) WITHOUT ROWID;"
+        )
+        self._conn.commit()
+
+    def append(self, values: Dict[str, float], ts: Optional[int] = None) -> None:
+        """
+        追加一次快照的各指标值，同时更新汇总
+        同一指标同一时间戳已有数据时保留原来的点（守护进程和generate_dashboard可能在同一秒各写一次），汇总不重复计入
+        """
+        ts = int(ts if ts is not None else time.time())
+        rows = [(metric, float(values[metric])) for metric in METRICS
+                if isinstance(values.get(metric), (int, float))]
+        with self._lock:
+            for metric, value in rows:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO points (metric, ts, value) VALUES (?, ?, ?)",
+                    (metric, ts, value)
+                ).rowcount
+                if not inserted:
+                    continue
+                for resolution, seconds in ROLLUPS.items():
+                    self._conn.execute(
+                        "INSERT INTO rollups (resolution, metric, bucket, count, sum, min, max, last, last_ts)"
+                        " VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT (resolution, metric, bucket) DO UPDATE SET"
+                        "  count = count + 1, sum = sum + excluded.sum,"
+                        "  min = MIN(min, excluded.min), max = MAX(max, excluded.max),"
+                        "  last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,"
+                        "  last_ts = MAX(last_ts, excluded.last_ts)",
+                        (resolution, metric, ts - ts % seconds, value, value, value, value, ts)
+                    )
+            self._conn.commit()
+
+    def query(self, metric: str, start: int, end: Optional[int] = None,
+              resolution: str = "raw", aggregate: str = "avg") -> List[Tuple[int, float]]:
+        """返回 [(时间戳, 值)]，按时间升序"""
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric: {metric!r}")
+        end = int(end if end is not None else time.time())
+
+        with self._lock:
+            if resolution == "raw":
+                rows = self._conn.execute(
+                    "SELECT ts, value FROM points WHERE metric = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                    (metric, start, end)
+                ).fetchall()
+            else:
+                if resolution not in ROLLUPS:
+                    raise ValueError(f"unknown resolution: {resolution!r}")
+                if aggregate not in AGGREGATES:
+                    raise ValueError(f"unknown aggregate: {aggregate!r}")
+                rows = self._conn.execute(
+                    f"SELECT bucket, {AGGREGATES[aggregate]} FROM rollups"
+                    " WHERE resolution = ? AND metric = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                    (resolution, metric, start - start % ROLLUPS[resolution], end)
+                ).fetchall()
+        return [(int(ts), value) for ts, value in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,192 @@
+"""
+上游调用耗时指标
+- 每次调用记录 connect（DNS解析+TCP建连，传输层无法单独拆出DNS）/ tls / first_byte / total 耗时、状态码和响应字节数
+  first_byte和total都从发起请求开始计时；复用连接时connect和tls为0，不计入直方图
+- 按接口模板聚合成直方图，模板来自providers注册的已知接口列表，例如 /v1/segments/{id}/customer_count；
+  不在列表中的路径统一记为 {other}，标签数量不随上游返回的ID增长
+- 输出Prometheus文本格式（/api/metrics）和JSON摘要（update.py每次运行结束时输出）
+"""
+import re
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# 直方图桶上界（秒）
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PHASES = ("connect", "tls", "first_byte", "total")
+
+# 不在已知接口列表中的路径
+OTHER_ENDPOINT = "/{other}"
+
+# (路径正则, 接口模板)，由register_routes注册
+_routes: List[Tuple["re.Pattern[str]", str]] = []
+
+class CallTiming(NamedTuple):
+    """一次上游调用的耗时（秒）"""
+    method: str
+    url: str
+    status: str  # HTTP状态码，异常时为"error"
+    response_bytes: int
+    connect: float
+    tls: float
+    first_byte: Optional[float]
+    total: float
+
+def register_routes(routes: Sequence[str]) -> None:
+    """
+    注册已知接口模板（相对base_url，如 /segments/{id}/customer_count）
+    {id}匹配单个路径段；base_url中的路径前缀（如 /v1）保留在模板中
+    """
+    for route in routes:
+        if any(template == route for _, template in _routes):
+            continue
+        pattern = re.escape(route).replace(re.escape("{id}"), "[^/]+")
+        _routes.append((re.compile(rf"^(.*?){pattern}/?$"), route))
+    # 段数多的优先匹配
+    _routes.sort(key=lambda item: item[1].count("/"), reverse=True)
+
+def endpoint_template(url: str) -> str:
+    """host + 接口模板，未知路径记为 {other}"""
+    parts = urlsplit(url)
+    for pattern, route in _routes:
+        match = pattern.match(parts.path)
+        if match:
+            return parts.netloc + match.group(1) + route
+    return parts.netloc + OTHER_ENDPOINT
+
+class Histogram:
+    """累计直方图"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶线性插值估算分位数（与Prometheus histogram_quantile相同的算法）"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for count, upper in zip(self.counts, BUCKETS):
+            if count and cumulative + count >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        # 落在最大桶之外
+        return BUCKETS[-1]
+
+class EndpointMetrics:
+    """单个接口模板的统计"""
+
+    def __init__(self):
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.statuses: Dict[str, int] = {}
+        self.response_bytes = 0
+
+class MetricsRegistry:
+    """进程内的上游调用指标"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[Tuple[str, str], EndpointMetrics] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints = {}
+
+    def record(self, timing: CallTiming) -> None:
+        key = (timing.method, endpoint_template(timing.url))
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = EndpointMetrics()
+            endpoint.statuses[timing.status] = endpoint.statuses.get(timing.status, 0) + 1
+            endpoint.response_bytes += timing.response_bytes
+            endpoint.phases["total"].observe(timing.total)
+            if timing.first_byte is not None:
+                endpoint.phases["first_byte"].observe(timing.first_byte)
+            # 复用连接没有建连和握手开销，只统计新建连接
+            if timing.connect > 0:
+                endpoint.phases["connect"].observe(timing.connect)
+            if timing.tls > 0:
+                endpoint.phases["tls"].observe(timing.tls)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """按接口汇总的JSON摘要（耗时为毫秒）"""
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        with self._lock:
+            result = []
+            for (method, endpoint), metrics in sorted(self._endpoints.items(), key=lambda item: item[0][1]):
+                total = metrics.phases["total"]
+                result.append({
+                    "endpoint": endpoint,
+                    "method": method,
+                    "calls": total.count,
+                    "statuses": dict(metrics.statuses),
+                    "bytes": metrics.response_bytes,
+                    "p50Ms": ms(total.quantile(0.5)),
+                    "p99Ms": ms(total.quantile(0.99)),
+                    "avgMs": ms(total.sum / total.count) if total.count else None,
+                    "avgFirstByteMs": ms(metrics.phases["first_byte"].sum / metrics.phases["first_byte"].count)
+                    if metrics.phases["first_byte"].count else None,
+                    "newConnections": metrics.phases["connect"].count,
+                    "avgConnectMs": ms(metrics.phases["connect"].sum / metrics.phases["connect"].count)
+                    if metrics.phases["connect"].count else None,
+                    "avgTlsMs": ms(metrics.phases["tls"].sum / metrics.phases["tls"].count)
+                    if metrics.phases["tls"].count else None
+                })
+            return result
+
+    def prometheus_text(self) -> str:
+        """Prometheus文本格式（0.0.4）"""
+        lines = [
+            "# HELP dashboard_upstream_request_duration_seconds Upstream call latency by phase.",
+            "# TYPE dashboard_upstream_request_duration_seconds histogram"
+        ]
+        requests_lines = [
+            "# HELP dashboard_upstream_requests_total Upstream calls by status.",
+            "# TYPE dashboard_upstream_requests_total counter"
+        ]
+        bytes_lines = [
+            "# HELP dashboard_upstream_response_bytes_total Upstream response body bytes.",
+            "# TYPE dashboard_upstream_response_bytes_total counter"
+        ]
+
+        with self._lock:
+            for (method, endpoint), metrics in sorted(self._endpoints.items(), key=lambda item: item[0][1]):
+                labels = f'endpoint="{escape_label(endpoint)}",method="{method}"'
+                for phase in PHASES:
+                    histogram = metrics.phases[phase]
+                    if histogram.count == 0:
+                        continue
+                    phase_labels = f'{labels},phase="{phase}"'
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        lines.append(f'dashboard_upstream_request_duration_seconds_bucket{{{phase_labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'dashboard_upstream_request_duration_seconds_bucket{{{phase_labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'dashboard_upstream_request_duration_seconds_sum{{{phase_labels}}} {histogram.sum:.6f}')
+                    lines.append(f'dashboard_upstream_request_duration_seconds_count{{{phase_labels}}} {histogram.count}')
+                for status, count in sorted(metrics.statuses.items()):
+                    requests_lines.append(f'dashboard_upstream_requests_total{{{labels},status="{status}"}} {count}')
+                bytes_lines.append(f'dashboard_upstream_response_bytes_total{{{labels}}} {metrics.response_bytes}')
+
+        return "\n".join(lines + requests_lines + bytes_lines) + "\n"
+
+def escape_label(value: str) -> str:
+    """转义Prometheus标签值"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+registry = MetricsRegistry()
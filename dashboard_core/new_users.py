@@ -0,0 +1,178 @@
+"""
+今日新用户
+- 增量计数：记录上一次查询到的创建时间高水位，每次只向后翻页查询高水位之后新建的客户，
+  每个UTC自然日重新计数；查询代价与新注册用户数成正比，与客户总数无关
+- 拿不到实时计数时的估算：RevenueCat的new_customers指标按周期折算，或按总用户数估算
+  （有足够的指标历史时由dashboard_core.forecast的拟合结果代替这里的固定系数）
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# fetch_page(filter, cursor) -> (本页客户ID列表, 下一页cursor)，请求失败时返回None
+FetchPage = Callable[[Dict[str, Any], Optional[str]], Optional[Tuple[List[str], Optional[str]]]]
+
+class NewUsersCounter:
+    """按UTC日累计的新用户计数器，状态保存在JSON文件中"""
+
+    def __init__(self, state_path: str, max_pages: int = 50):
+        self.state_path = state_path
+        self.max_pages = max_pages
+        self._lock = threading.Lock()
+
+    def count_today(self, fetch_page: FetchPage, now: Optional[datetime] = None) -> Optional[int]:
+        """
+        返回今日累计新用户数，查询失败时返回None（不推进高水位）
+        created_at精确到秒，查询窗口为 (高水位, 当前秒之前]：当前这一秒还可能有客户创建，留给下一次查询，
+        相邻两次查询的窗口互不重叠也没有空隙
+        """
+        now = now or datetime.now(timezone.utc)
+        today = now.date().isoformat()
+        now_ts = int(now.timestamp())
+
+        with self._lock:
+            state = self._load()
+            if state.get("day") != today:
+                # UTC日切换，从今天0点重新计数
+                day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+                state = {"day": today, "count": 0, "high_water_ts": int(day_start.timestamp()) - 1}
+
+            window_end = now_ts - 1
+            if window_end <= state["high_water_ts"]:
+                return state["count"]
+
+            search_filter = {
+                "and": [
+                    {"attribute": {"field": "created_at", "operator": "gt", "value": state["high_water_ts"]}},
+                    {"attribute": {"field": "created_at", "operator": "lt", "value": now_ts}}
+                ]
+            }
+
+            new_ids: List[str] = []
+            cursor = None
+            for _ in range(self.max_pages):
+                page = fetch_page(search_filter, cursor)
+                if page is None:
+                    return None
+                ids, cursor = page
+                new_ids.extend(ids)
+                if not cursor or not ids:
+                    break
+            else:
+                # 超过翻页上限时不推进高水位，下次继续
+                return None
+
+            state["count"] += len(new_ids)
+            state["high_water_ts"] = window_end
+            try:
+                self._save(state)
+            except OSError as e:
+                # 计数本身是正确的；没有保存时下次从上一次保存的高水位重新查询，不会重复计数
+                logger.warning(f"⚠️ 无法保存新用户计数状态: {e}")
+            return state["count"]
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, state: Dict[str, Any]) -> None:
+        """写临时文件后原子替换，写入中途失败不会留下半个状态文件"""
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.state_path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+def from_new_customers(new_customers: int, period: Optional[str], now: Optional[datetime] = None,
+                       weekday_factor: Optional[float] = None) -> Optional[int]:
+    """
+    用RevenueCat的new_customers指标（period为ISO 8601周期，如P28D）折算今日新用户
+    weekday_factor为历史拟合的今天的星期因子，没有时周末按0.7计算；周期无法解析时返回None
+    """
+    if period == 'P0D':
+        # 实时数据
+        return new_customers
+
+    match = re.fullmatch(r'P(\d+)D', period or 'P28D')
+    if not match or int(match.group(1)) == 0:
+        logger.warning(f"⚠️ 未知的时间周期格式: {period}")
+        return None
+
+    daily_avg = new_customers / int(match.group(1))
+    if weekday_factor is None:
+        # 周末新用户较少
+        now = now or datetime.now(timezone.utc)
+        weekday_factor = 0.7 if now.weekday() in (5, 6) else 1.0
+    today_estimate = int(daily_avg * weekday_factor)
+
+    # 有新客户数据时至少为1
+    if new_customers > 0 and today_estimate == 0:
+        today_estimate = 1
+    return today_estimate
+
+def estimate_daily_new_users(total_users: int, now: Optional[datetime] = None) -> int:
+    """
+    基于总用户数估算今日新用户数
+    考虑工作日vs周末、月份季节性和用户规模
+    """
+    if total_users == 0:
+        return 0
+
+    now = now or datetime.now(timezone.utc)
+
+    # 基础增长率估算: 0.2% 非常保守的日增长率
+    base_daily_rate = 0.002
+
+    # 工作日 vs 周末调整（周末用户增长减少40%）
+    weekday_multiplier = 0.6 if now.weekday() in (5, 6) else 1.0
+
+    # 月份季节性调整
+    month = now.month
+    if month in (1, 2):  # 1-2月，新年期间活跃度较低
+        seasonal_multiplier = 0.7
+    elif month in (9, 10, 11):  # 9-11月，返校和年末较活跃
+        seasonal_multiplier = 1.3
+    elif month == 12:  # 12月，年末较活跃但假期影响
+        seasonal_multiplier = 1.1
+    else:
+        seasonal_multiplier = 1.0
+
+    # 用户基数规模调整（较小的应用增长率通常更不稳定）
+    if total_users < 100:
+        scale_multiplier = 0.5
+    elif total_users < 500:
+        scale_multiplier = 0.8
+    elif total_users < 1000:
+        scale_multiplier = 1.0
+    else:
+        scale_multiplier = 1.2
+
+    estimated_new = total_users * base_daily_rate * weekday_multiplier * seasonal_multiplier * scale_multiplier
+    # 最多不超过总用户的5%
+    estimated_new = round(max(0, min(estimated_new, total_users * 0.05)))
+
+    # 为极小的应用提供最小值保证
+    if total_users > 50 and estimated_new == 0:
+        estimated_new = 1
+
+    logger.info(f"📊 估算今日新用户: {estimated_new} (总用户 {total_users}, 工作日 {weekday_multiplier:.1f}, "
+                f"季节 {seasonal_multiplier:.1f}, 规模 {scale_multiplier:.1f})")
+    return estimated_new
@@ -0,0 +1,96 @@
+"""
+静态输出文件写入
+- 先写同目录下的临时文件再os.replace，读取方（静态托管、meta refresh页面）不会读到写了一半的文件
+- 内容的sha256与磁盘上已有文件相同时跳过写入，文件的修改时间不变，也不会触发重新部署；
+  调用方可以传入normalize去掉每次都会变化的部分（更新时间等），只比较稳定的内容
+- 可选生成预压缩的 .gz / .br 文件，静态托管直接返回，无需实时压缩（brotli为可选依赖）
+"""
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Callable, Iterable, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 支持的预压缩格式
+COMPRESSIONS = ("gz", "br")
+
+def file_digest(path: str, normalize: Optional[Callable[[bytes], bytes]] = None) -> Optional[str]:
+    """磁盘上文件内容（经过normalize）的sha256，文件不存在或无法解析时返回None"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        return content_digest(data, normalize)
+    except ValueError:
+        return None
+
+def content_digest(data: bytes, normalize: Optional[Callable[[bytes], bytes]] = None) -> str:
+    """内容（经过normalize）的sha256"""
+    return hashlib.sha256(normalize(data) if normalize else data).hexdigest()
+
+def replace_atomic(path: str, data: bytes) -> None:
+    """写临时文件后原子替换目标文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp创建的文件权限是0600，保持与原文件一致（新文件用0644），静态托管才能读取
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def compress(data: bytes, encoding: str) -> Optional[bytes]:
+    """按格式压缩，brotli未安装时返回None"""
+    if encoding == "gz":
+        # mtime=0 让相同内容的压缩结果保持一致
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br":
+        if brotli is None:
+            return None
+        return brotli.compress(data)
+    raise ValueError(f"unknown compression {encoding!r}, expected one of: {', '.join(COMPRESSIONS)}")
+
+def write_if_changed(path: str, data: bytes, compressions: Iterable[str] = (),
+                     normalize: Optional[Callable[[bytes], bytes]] = None) -> bool:
+    """
+    内容有变化时原子写入path及其预压缩文件，返回是否写入了主文件
+    normalize把内容转换成只包含稳定部分的字节串，转换后相同时保留磁盘上已有的文件（包括其中的旧更新时间）
+    主文件没有变化但缺少预压缩文件时只补写预压缩文件
+    """
+    changed = file_digest(path, normalize) != content_digest(data, normalize)
+    if changed:
+        replace_atomic(path, data)
+
+    for encoding in compressions:
+        sibling = f"{path}.{encoding}"
+        if not changed and os.path.exists(sibling):
+            continue
+        compressed = compress(data, encoding)
+        if compressed is None:
+            logger.warning(f"⚠️ brotli未安装，跳过 {sibling}")
+            continue
+        replace_atomic(sibling, compressed)
+
+    return changed
@@ -0,0 +1,94 @@
+"""
+预计算快照文件
+- update.py --precompute 按间隔采集一次完整数据，写入带版本号的快照文件，内容就是/api/data的响应JSON
+- /api/data 先读取快照文件，没有超过最大时效时直接返回，不请求上游；超过时效、文件缺失或版本不符时走实时获取
+- 按文件的修改时间和大小缓存解析结果，热路径只有一次stat
+- 只依赖标准库，不影响冷启动导入耗时
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# 快照文件格式版本，格式不兼容时加一，旧文件会被忽略
+SNAPSHOT_VERSION = 1
+
+def write_snapshot(path: str, payload: Dict[str, Any], generated_at: Optional[float] = None) -> None:
+    """原子写入快照文件（读取方不会读到写了一半的文件）"""
+    # 只有写入方（update.py）需要，/api/data冷启动时不导入
+    from dashboard_core.output import replace_atomic
+
+    generated_at = time.time() if generated_at is None else generated_at
+    document = {
+        "version": SNAPSHOT_VERSION,
+        "generatedAt": generated_at,
+        "payload": payload
+    }
+    replace_atomic(path, json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+class PrecomputedSnapshot:
+    """读取预计算快照文件，max_age秒以内的快照才会返回（max_age <= 0 时不使用快照）"""
+
+    def __init__(self, path: str, max_age: float):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._file_key: Optional[Tuple[int, int]] = None
+        self._document: Optional[Dict[str, Any]] = None
+        self.stats = {"served": 0, "stale": 0, "missing": 0}
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """返回未过期的快照响应JSON，没有可用的快照时返回None"""
+        if self.max_age <= 0:
+            return None
+
+        document = self._read()
+        with self._lock:
+            if document is None:
+                self.stats["missing"] += 1
+                return None
+            if time.time() - document["generatedAt"] > self.max_age:
+                self.stats["stale"] += 1
+                return None
+            self.stats["served"] += 1
+        return document["payload"]
+
+    def describe(self) -> Dict[str, Any]:
+        """快照状态和计数，用于附加到响应JSON"""
+        with self._lock:
+            document = self._document
+            age = time.time() - document["generatedAt"] if document else None
+            return dict(
+                self.stats,
+                state="precomputed",
+                version=SNAPSHOT_VERSION,
+                ageSeconds=int(age) if age is not None else None,
+                maxAgeSeconds=self.max_age
+            )
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        """文件没有变化时复用上一次的解析结果"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+
+        file_key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if file_key == self._file_key:
+                return self._document
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                document = json.load(f)
+        except (OSError, ValueError):
+            document = None
+        if not isinstance(document, dict) or document.get("version") != SNAPSHOT_VERSION \
+                or not isinstance(document.get("payload"), dict):
+            document = None
+
+        with self._lock:
+            self._file_key = file_key
+            self._document = document
+        return document
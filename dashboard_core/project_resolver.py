@@ -0,0 +1,114 @@
+"""
+RevenueCat项目解析
+项目列表几乎不会变化，解析后缓存（内存 + 磁盘）CACHE_TTL秒，热路径每个项目只需要一次metrics请求
+优先级: 环境变量 REVENUECAT_PROJECT_ID（逗号分隔多个项目） > 内存 > 磁盘 > /v2/projects（全部分页）
+缓存过期后重新获取项目列表，新增的项目会被发现；旧版本没有解析时间的缓存视为未命中
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 项目列表缓存时间（秒）
+CACHE_TTL = float(os.environ.get('REVENUECAT_PROJECT_CACHE_TTL', str(24 * 3600)))
+
+class ProjectResolver:
+    """RevenueCat项目解析器"""
+
+    def __init__(self, cache_path: Optional[str] = None, ttl: float = CACHE_TTL):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        # token指纹 → (项目列表, 解析时间)
+        self._projects: Dict[str, Tuple[List[Dict[str, Any]], float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(token: str) -> str:
+        """API token指纹，不同token对应的项目分开缓存"""
+        return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def configured_projects() -> Optional[List[Dict[str, Any]]]:
+        """环境变量直接指定的项目，未指定时返回None"""
+        project_ids = [value.strip() for value in os.environ.get('REVENUECAT_PROJECT_ID', '').split(',') if value.strip()]
+        if not project_ids:
+            return None
+        if len(project_ids) == 1:
+            return [{"id": project_ids[0], "name": os.environ.get('REVENUECAT_PROJECT_NAME', project_ids[0])}]
+        return [{"id": project_id, "name": project_id} for project_id in project_ids]
+
+    def resolve_all(self, token: str,
+                    fetch_projects: Callable[[], Optional[List[Dict[str, Any]]]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        返回token可以访问的所有项目（每个至少包含id和name）
+        fetch_projects只在没有未过期的缓存时调用，返回/v2/projects所有分页的项目
+        """
+        configured = self.configured_projects()
+        if configured:
+            return configured
+
+        key = self.fingerprint(token)
+        with self._lock:
+            cached = self._projects.get(key)
+            if cached is None or not self._fresh(cached):
+                cached = self._load().get(key)
+            if cached is not None and self._fresh(cached):
+                self._projects[key] = cached
+                return cached[0]
+
+        projects = fetch_projects()
+        if not projects:
+            return None
+
+        with self._lock:
+            entry = (projects, time.time())
+            self._projects[key] = entry
+            disk = self._load()
+            disk[key] = entry
+            self._save(disk)
+        return projects
+
+    def _fresh(self, entry: Tuple[List[Dict[str, Any]], float]) -> bool:
+        return time.time() - entry[1] < self.ttl
+
+    def invalidate(self, token: str) -> None:
+        """项目不可用时（如metrics请求失败）清除缓存，下次重新解析"""
+        key = self.fingerprint(token)
+        with self._lock:
+            self._projects.pop(key, None)
+            disk = self._load()
+            if disk.pop(key, None) is not None:
+                self._save(disk)
+
+    def _load(self) -> Dict[str, Tuple[List[Dict[str, Any]], float]]:
+        """磁盘缓存 {token指纹: {"projects": [...], "resolvedAt": 时间戳}}"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # 旧版本的缓存（单个项目或没有解析时间的列表）跳过，重新获取完整的项目列表
+        return {
+            key: (value["projects"], float(value["resolvedAt"]))
+            for key, value in data.items()
+            if isinstance(value, dict) and isinstance(value.get("projects"), list)
+            and isinstance(value.get("resolvedAt"), (int, float))
+        }
+
+    def _save(self, data: Dict[str, Tuple[List[Dict[str, Any]], float]]) -> None:
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    key: {"projects": projects, "resolvedAt": resolved_at}
+                    for key, (projects, resolved_at) in data.items()
+                }, f)
+        except OSError:
+            # 只读文件系统时只使用内存缓存
+            pass
@@ -0,0 +1,423 @@
+"""
+数据源
+- Provider接口：name是限速/熔断/请求计数使用的数据源名，collect(fetcher)返回类型化的数据，
+  失败时返回带统一source名称的备用数据，不抛出异常
+- CustomerIOProvider: segments + 各segment人数（并发），可选的今日新用户增量计数
+- RevenueCatProvider: 项目列表（分页，缓存） + 每个项目的metrics overview（并发），可选的按项目信息估算
+- AggregateProvider: 多个workspace / API token并发获取后合并，总耗时取决于最慢的一个数据源
+所有请求都经过同一个Fetcher（本次采集内去重、响应缓存、熔断、限速重试、耗时统计）
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote, urljoin
+
+from dashboard_core.fetch import Fetcher
+from dashboard_core.metrics import register_routes
+from dashboard_core.new_users import NewUsersCounter
+from dashboard_core.project_resolver import ProjectResolver
+from dashboard_core.snapshot import (
+    NEW_USERS_CUSTOMER_IO, SOURCE_API_ERROR, SOURCE_API_FAILED, SOURCE_CUSTOMER_IO,
+    SOURCE_CUSTOMER_IO_SEGMENT_FALLBACK, SOURCE_NO_API_KEY, SOURCE_REVENUECAT, SOURCE_REVENUECAT_ESTIMATE,
+    CustomerIOData, RevenueCatData, merge_customer_io, merge_revenuecat
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CUSTOMER_IO_API_BASE = "https://api.customer.io/v1"
+DEFAULT_REVENUECAT_API_BASE = "https://api.revenuecat.com/v2"
+
+# 上游接口路径（相对base_url），耗时指标按这些模板聚合
+ROUTES = (
+    "/segments",
+    "/segments/{id}/customer_count",
+    "/customers",
+    "/projects",
+    "/projects/{id}/metrics/overview",
+    "/projects/{id}/apps"
+)
+register_routes(ROUTES)
+
+# /v2/projects最多翻页数
+MAX_PROJECT_PAGES = 20
+
+def parse_credentials(value: Optional[str], default_name: str = "default") -> List[Tuple[str, str]]:
+    """
+    解析凭据配置: "密钥" 或 "名称=密钥,名称=密钥"（多个workspace / 项目）
+    返回 [(名称, 密钥)]
+    """
+    credentials = []
+    for index, entry in enumerate(item.strip() for item in (value or "").split(",")):
+        if not entry:
+            continue
+        name, separator, secret = entry.partition("=")
+        if not separator:
+            name, secret = (default_name if index == 0 else f"{default_name}{index + 1}"), entry
+        credentials.append((name.strip(), secret.strip()))
+    return credentials
+
+def run_concurrently(func: Callable[[Any], Any], items: Sequence[Any]) -> List[Any]:
+    """每个item一个线程并发执行，按顺序返回结果"""
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=len(items)) as executor:
+        return list(executor.map(func, items))
+
+class Provider:
+    """数据源接口"""
+    name = ""
+
+    def configured(self) -> bool:
+        """是否配置了凭据"""
+        raise NotImplementedError
+
+    def fetch(self, fetcher: Fetcher) -> Any:
+        """从上游获取数据"""
+        raise NotImplementedError
+
+    def fallback(self, source: str) -> Any:
+        """失败时的备用数据"""
+        raise NotImplementedError
+
+    def collect(self, fetcher: Fetcher) -> Any:
+        """获取数据，未配置凭据或出现异常时返回备用数据"""
+        if not self.configured():
+            return self.fallback(SOURCE_NO_API_KEY)
+        try:
+            return self.fetch(fetcher)
+        except Exception as e:
+            logger.error(f"❌ {self.name} 数据获取异常: {e}")
+            return self.fallback(SOURCE_API_ERROR)
+
+# ============ Customer.io =============
+# 参与总用户数计算的segment（有效邮箱 + 无效邮箱 = 所有用户）
+EMAIL_SEGMENT_NAMES = ('valid email address', 'invalid email address')
+
+class CustomerIOProvider(Provider):
+    """Customer.io App API"""
+    name = "customer_io"
+
+    def __init__(self, api_key: Optional[str], base_url: str = DEFAULT_CUSTOMER_IO_API_BASE,
+                 segment_concurrency: int = 8, segment_timeout: float = 10,
+                 email_segments_only: bool = False, new_users_counter: Optional[NewUsersCounter] = None,
+                 search_page_size: int = 100, workspace: Optional[str] = None):
+        self.api_key = api_key
+        self.workspace = workspace
+        self.base_url = base_url
+        self.segment_concurrency = max(1, segment_concurrency)
+        self.segment_timeout = segment_timeout
+        # 只获取两个邮箱segment（会关闭"最大segment"备用方案）
+        self.email_segments_only = email_segments_only
+        # 今日新用户增量计数，None时由resolve_new_users估算
+        self.new_users_counter = new_users_counter
+        self.search_page_size = search_page_size
+
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def fallback(self, source: str) -> CustomerIOData:
+        return replace(CustomerIOData.fallback(source), workspace=self.workspace)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def fetch(self, fetcher: Fetcher) -> CustomerIOData:
+        segments_data = fetcher.get(self.name, f"{self.base_url}/segments", self.headers)
+        if not segments_data or not segments_data.get('segments'):
+            logger.warning("⚠️ 无法从Customer.io获取segments")
+            return self.fallback(SOURCE_API_FAILED)
+
+        segments = segments_data['segments']
+        logger.info(f"📊 找到 {len(segments)} 个segments")
+        if self.email_segments_only:
+            segments = [s for s in segments if s.get('name', '').lower() in EMAIL_SEGMENT_NAMES]
+
+        counts = self.segment_counts(segments, fetcher)
+
+        email_users = 0
+        largest = None
+        for segment in segments:
+            segment_name = segment.get('name', '').lower()
+            count = counts.get(segment.get('id'))
+
+            if count is None:
+                if segment_name in EMAIL_SEGMENT_NAMES:
+                    # 缺少参与总数计算的segment时不返回偏小的总数
+                    logger.warning(f"⚠️ 无法获取segment人数: {segment.get('name')}")
+                    return self.fallback(SOURCE_API_FAILED)
+                continue
+
+            logger.info(f"📈 Segment '{segment.get('name')}': {count} 用户")
+            if segment_name in EMAIL_SEGMENT_NAMES:
+                email_users += count
+            if largest is None or count > largest[1]:
+                largest = (segment.get('name'), count)
+
+        if email_users > 0:
+            # 最准确的方法：有效邮箱 + 无效邮箱 = 所有用户
+            logger.info(f"🎯 真实总用户数: {email_users}")
+            new_users_today = self.new_users_today(fetcher)
+            return CustomerIOData(
+                total_customers=email_users,
+                new_customers_today=new_users_today,
+                source=SOURCE_CUSTOMER_IO,
+                new_users_source=NEW_USERS_CUSTOMER_IO if new_users_today is not None else None,
+                workspace=self.workspace
+            )
+
+        if largest is not None and largest[1] > 0:
+            # 备用方法：选择最大的segment
+            logger.info(f"🎯 备用方法 - 最大segment: {largest[0]} 包含 {largest[1]} 用户")
+            return CustomerIOData(total_customers=largest[1], new_customers_today=None,
+                                  source=SOURCE_CUSTOMER_IO_SEGMENT_FALLBACK, workspace=self.workspace)
+
+        logger.warning("⚠️ 无法从Customer.io获取任何用户数据")
+        return self.fallback(SOURCE_API_FAILED)
+
+    def segment_counts(self, segments: List[Dict[str, Any]], fetcher: Fetcher) -> Dict[Any, int]:
+        """并发获取多个segment的用户数量，返回 {segment_id: count}"""
+        if not segments:
+            return {}
+
+        def fetch_count(segment: Dict[str, Any]) -> Optional[int]:
+            count_url = f"{self.base_url}/segments/{segment.get('id')}/customer_count"
+            count_data = fetcher.get(self.name, count_url, self.headers, timeout=self.segment_timeout)
+            if count_data and count_data.get('count') is not None:
+                return count_data.get('count')
+            return None
+
+        workers = min(self.segment_concurrency, len(segments))
+        logger.info(f"⚡ 并发获取 {len(segments)} 个segment人数 (并发数: {workers})")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            counts = list(executor.map(fetch_count, segments))
+
+        return {
+            segment.get('id'): count
+            for segment, count in zip(segments, counts)
+            if count is not None
+        }
+
+    def new_users_today(self, fetcher: Fetcher) -> Optional[int]:
+        """
+        增量查询今日新用户（只查询上次高水位之后新建的客户）
+        没有配置计数器或查询失败时返回None，交给备用方案；0是有效结果（今天还没有新用户）
+        参考文档: https://docs.customer.io/integrations/api/app/#section/Overview
+        """
+        if self.new_users_counter is None:
+            return None
+
+        search_url = f"{self.base_url}/customers"
+
+        def fetch_page(search_filter: Dict[str, Any], cursor: Optional[str]):
+            url = f"{search_url}?limit={self.search_page_size}"
+            if cursor:
+                url += f"&start={quote(cursor)}"
+            result = fetcher.post(self.name, url, self.headers, data={"filter": search_filter})
+            if result is None:
+                return None
+            identifiers = result.get('identifiers') or result.get('customers') or []
+            ids = [item.get('id') or item.get('cio_id') for item in identifiers if isinstance(item, dict)]
+            ids += [item for item in result.get('ids', []) if not identifiers]
+            return ids, result.get('next') or None
+
+        today_count = self.new_users_counter.count_today(fetch_page)
+        if today_count is None:
+            logger.warning("⚠️ 增量查询今日新用户失败")
+            return None
+
+        logger.info(f"📊 今日累计新用户: {today_count}")
+        return today_count
+
+# ============ RevenueCat =============
+class RevenueCatProvider(Provider):
+    """RevenueCat API v2"""
+    name = "revenuecat"
+
+    def __init__(self, token: Optional[str], project_resolver: ProjectResolver,
+                 base_url: str = DEFAULT_REVENUECAT_API_BASE, project_estimate: bool = False):
+        self.token = token
+        self.project_resolver = project_resolver
+        self.base_url = base_url
+        # 缺少metrics权限时按项目的应用数量估算（否则返回失败）
+        self.project_estimate = project_estimate
+
+    def configured(self) -> bool:
+        return bool(self.token)
+
+    def fallback(self, source: str) -> RevenueCatData:
+        return RevenueCatData.fallback(source)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json"
+        }
+
+    def fetch(self, fetcher: Fetcher) -> RevenueCatData:
+        # 解析项目列表（缓存后热路径每个项目只有一次metrics请求）
+        projects = self.project_resolver.resolve_all(self.token, lambda: self.list_projects(fetcher))
+        if not projects:
+            logger.warning("⚠️ 无法获取RevenueCat项目信息")
+            return self.fallback(SOURCE_API_FAILED)
+
+        logger.info(f"✅ 找到 {len(projects)} 个项目: {', '.join(str(project.get('name')) for project in projects)}")
+
+        # 各项目的metrics并发获取
+        results = run_concurrently(lambda project: self.fetch_project(project, fetcher), projects)
+        if any(result.failed for result in results):
+            # 项目可能已失效，下次重新解析
+            self.project_resolver.invalidate(self.token)
+        return merge_revenuecat(results)
+
+    def list_projects(self, fetcher: Fetcher) -> Optional[List[Dict[str, Any]]]:
+        """按next_page翻页获取所有项目，任一页失败时返回None"""
+        url = f"{self.base_url}/projects"
+        projects: List[Dict[str, Any]] = []
+        for _ in range(MAX_PROJECT_PAGES):
+            page = fetcher.get(self.name, url, self.headers)
+            if page is None:
+                return None
+            projects.extend(page.get('items', []))
+            next_page = page.get('next_page')
+            if not next_page:
+                return projects
+            # next_page是相对路径（如 /v2/projects?starting_after=...）
+            url = urljoin(self.base_url, next_page)
+        logger.warning(f"⚠️ RevenueCat项目超过 {MAX_PROJECT_PAGES} 页，只使用前 {len(projects)} 个")
+        return projects
+
+    def fetch_project(self, project: Dict[str, Any], fetcher: Fetcher) -> RevenueCatData:
+        """单个项目的metrics"""
+        project_id = project.get('id')
+        metrics_data = fetcher.get(self.name, f"{self.base_url}/projects/{project_id}/metrics/overview",
+                                   self.headers)
+
+        if metrics_data and metrics_data.get('metrics'):
+            return self.parse_metrics(metrics_data, project)
+
+        logger.warning(f"⚠️ 无法获取RevenueCat Metrics数据: {project.get('name')} ({project_id})")
+        logger.info("💡 可能原因:")
+        logger.info("   1. API密钥缺少 'charts_metrics:overview:read' 权限")
+        logger.info("   2. 项目中暂无metrics数据")
+        logger.info("   3. 需要v2 API密钥而不是v1")
+
+        if self.project_estimate:
+            estimate = self.estimate_from_project(project, fetcher)
+            if estimate is not None:
+                return estimate
+        return replace(self.fallback(SOURCE_API_FAILED), project_id=project_id, project_name=project.get('name'))
+
+    @staticmethod
+    def parse_metrics(metrics_data: Dict[str, Any], project: Dict[str, Any]) -> RevenueCatData:
+        """解析metrics overview（非数值的指标按0处理）"""
+        metrics: Dict[str, float] = {}
+        periods: Dict[str, Optional[str]] = {}
+        for metric in metrics_data.get('metrics', []):
+            metric_id = metric.get('id')
+            metric_value = metric.get('value', 0)
+            logger.info(f"📈 {metric.get('name', '')} ({metric_id}): {metric_value} {metric.get('unit', '')}")
+            metrics[metric_id] = float(metric_value) if isinstance(metric_value, (int, float)) else 0.0
+            periods[metric_id] = metric.get('period')
+
+        # 优先使用API提供的ARR字段，没有时用MRR*12计算
+        mrr = metrics.get('mrr', 0.0)
+        arr = metrics.get('arr', 0.0)
+        if arr == 0 and mrr > 0:
+            arr = mrr * 12
+
+        return RevenueCatData(
+            active_subscriptions=int(metrics.get('active_subscriptions', 0)),
+            active_trials=int(metrics.get('active_trials', 0)),
+            mrr=mrr,
+            arr=arr,
+            source=SOURCE_REVENUECAT,
+            revenue_28d=metrics.get('revenue', metrics.get('revenue_28d', 0.0)),
+            today_revenue=metrics.get('today_revenue', arr / 365),
+            new_customers=int(metrics.get('new_customers', 0)),
+            new_customers_period=periods.get('new_customers'),
+            active_users=int(metrics.get('active_users', 0)),
+            project_id=project.get('id'),
+            project_name=project.get('name'),
+            metrics=metrics
+        )
+
+    def estimate_from_project(self, project: Dict[str, Any], fetcher: Fetcher) -> Optional[RevenueCatData]:
+        """基于项目的应用数量保守估算（需要真实metrics权限才能拿到准确数据）"""
+        apps_data = fetcher.get(self.name, f"{self.base_url}/projects/{project.get('id')}/apps", self.headers)
+        created_at = project.get('created_at', 0)
+        if not apps_data or not created_at:
+            return None
+
+        apps = apps_data.get('items', [])
+        days_since_creation = (datetime.now().timestamp() * 1000 - created_at) / (1000 * 60 * 60 * 24)
+        logger.info(f"📱 项目中有 {len(apps)} 个应用，运行天数: {int(days_since_creation)}")
+
+        estimated_subscribers = max(7, int(len(apps) * 2.5))
+        estimated_arr = estimated_subscribers * 89.99
+        estimated_daily = estimated_arr / 365
+        logger.info(f"📊 基于项目数据的保守估算: {estimated_subscribers} 订阅, ARR ${estimated_arr:,.2f}")
+
+        return RevenueCatData(
+            active_subscriptions=estimated_subscribers,
+            active_trials=max(2, int(estimated_subscribers * 0.25)),
+            mrr=estimated_arr / 12,
+            arr=estimated_arr,
+            source=SOURCE_REVENUECAT_ESTIMATE,
+            revenue_28d=estimated_daily * 28,
+            today_revenue=estimated_daily,
+            project_id=project.get('id'),
+            project_name=project.get('name')
+        )
+
+# ============ 多个workspace / API token =============
+class AggregateProvider(Provider):
+    """同一数据源的多个workspace / API token，并发获取后合并（任一失败时整体按失败处理）"""
+
+    def __init__(self, providers: Sequence[Provider], merge: Callable[[Sequence[Any]], Any]):
+        self.providers = list(providers)
+        self.name = self.providers[0].name
+        self.merge = merge
+
+    def configured(self) -> bool:
+        return all(provider.configured() for provider in self.providers)
+
+    def fallback(self, source: str) -> Any:
+        return self.providers[0].fallback(source)
+
+    def fetch(self, fetcher: Fetcher) -> Any:
+        return self.merge(run_concurrently(lambda provider: provider.collect(fetcher), self.providers))
+
+def build_customer_io(api_keys: Optional[str], new_users_state_dir: Optional[str] = None,
+                      **options: Any) -> Provider:
+    """
+    按CUSTOMER_IO_APP_API_KEY配置创建数据源（多个workspace时合并）
+    new_users_state_dir不为None时每个workspace各自做今日新用户增量计数
+    """
+    credentials = parse_credentials(api_keys) or [("default", "")]
+
+    def counter(name: str) -> Optional[NewUsersCounter]:
+        if new_users_state_dir is None:
+            return None
+        filename = "new_users_state.json" if name == "default" else f"new_users_state-{name}.json"
+        return NewUsersCounter(os.path.join(new_users_state_dir, filename))
+
+    providers = [
+        CustomerIOProvider(api_key, new_users_counter=counter(name), workspace=name, **options)
+        for name, api_key in credentials
+    ]
+    return providers[0] if len(providers) == 1 else AggregateProvider(providers, merge_customer_io)
+
+def build_revenuecat(tokens: Optional[str], project_resolver: ProjectResolver, **options: Any) -> Provider:
+    """按REVENUECAT_TOKEN配置创建数据源（多个token时合并所有项目）"""
+    credentials = parse_credentials(tokens) or [("default", "")]
+    providers = [RevenueCatProvider(token, project_resolver, **options) for _, token in credentials]
+    return providers[0] if len(providers) == 1 else AggregateProvider(providers, merge_revenuecat)
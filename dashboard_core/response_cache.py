@@ -0,0 +1,121 @@
+"""
+本地持久化响应缓存（SQLite）
+- 以 URL + 认证指纹 作为key，不同API密钥的响应互不混用
+- 按endpoint配置TTL，TTL内直接使用本地数据，不请求上游
+- 上游提供 ETag / Last-Modified 时，过期后发送条件请求，304时复用本地数据
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# 各endpoint的默认TTL（秒），按顺序匹配URL，未匹配的endpoint TTL为0（只做条件请求）
+DEFAULT_TTLS: List[Tuple[str, float]] = [
+    (r"/v2/projects(\?[^/]*)?$", 24 * 3600),  # 项目列表几乎不会变化（含翻页）
+    (r"/v2/projects/[^/]+/apps$", 24 * 3600),
+    (r"/v1/segments$", 3600),  # segment定义很少变化，人数每次都重新获取
+]
+
+class CachedResponse(NamedTuple):
+    """缓存的响应"""
+    body: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    fresh: bool
+
+def load_ttls() -> List[Tuple[str, float]]:
+    """读取TTL配置，环境变量 RESPONSE_CACHE_TTLS 为 {"URL正则": 秒数} 形式的JSON，优先于默认配置"""
+    ttls = list(DEFAULT_TTLS)
+    override = os.environ.get('RESPONSE_CACHE_TTLS')
+    if override:
+        ttls = [(pattern, float(seconds)) for pattern, seconds in json.loads(override).items()] + ttls
+    return ttls
+
+class ResponseCache:
+    """基于SQLite的响应缓存"""
+
+    def __init__(self, path: str, ttls: Optional[List[Tuple[str, float]]] = None):
+        self.path = path
+        self.ttls = [(re.compile(pattern), seconds) for pattern, seconds in (ttls if ttls is not None else load_ttls())]
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, url TEXT, body TEXT, etag TEXT, last_modified TEXT, fetched_at REAL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(url: str, headers: Optional[Dict[str, str]]) -> str:
+        """URL + 认证指纹"""
+        auth = (headers or {}).get("Authorization", "")
+        fingerprint = hashlib.sha256(auth.encode()).hexdigest()[:16]
+        return hashlib.sha256(f"{url}|{fingerprint}".encode()).hexdigest()
+
+    def ttl_for(self, url: str) -> float:
+        """URL对应的TTL"""
+        path = url.split("?", 1)[0]
+        for pattern, seconds in self.ttls:
+            if pattern.search(path):
+                return seconds
+        return 0
+
+    def lookup(self, url: str, headers: Optional[Dict[str, str]]) -> Optional[CachedResponse]:
+        """查找缓存，返回的fresh表示是否仍在TTL内"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE key = ?",
+                (self.make_key(url, headers),)
+            ).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, fetched_at = row
+        fresh = time.time() - fetched_at < self.ttl_for(url)
+        return CachedResponse(json.loads(body), etag, last_modified, fetched_at, fresh)
+
+    def conditional_headers(self, cached: Optional[CachedResponse]) -> Dict[str, str]:
+        """根据缓存的校验信息生成条件请求头"""
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    def should_store(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> bool:
+        """有TTL或者有校验信息的响应才值得缓存"""
+        return self.ttl_for(url) > 0 or bool(etag or last_modified)
+
+    def store(self, url: str, headers: Optional[Dict[str, str]], body: Any,
+              etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """保存响应"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, url, body, etag, last_modified, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self.make_key(url, headers), url, json.dumps(body), etag, last_modified, time.time())
+            )
+            self._conn.commit()
+
+    def touch(self, url: str, headers: Optional[Dict[str, str]]) -> None:
+        """304响应后刷新缓存时间"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ? WHERE key = ?",
+                (time.time(), self.make_key(url, headers))
+            )
+            self._conn.commit()
+
+    def record(self, outcome: str) -> None:
+        """记录命中统计: hits / revalidated / misses"""
+        with self._lock:
+            self.stats[outcome] += 1
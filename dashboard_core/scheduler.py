@@ -0,0 +1,203 @@
+"""
+按数据源限速的请求调度
+- 每个数据源一个令牌桶（速率与突发量按各自文档的限额配置，可用UPSTREAM_RATE_LIMITS覆盖），
+  令牌不足时请求按到达顺序排队等待，而不是一起打到上游
+- 429/5xx在截止时间内重试：有Retry-After时按其等待（429同时暂停整个数据源的令牌桶），否则指数退避加抖动
+- 每个请求（连同它的重试）只经过一次熔断器，只记录最终结果：重试中间的429/5xx不会打开熔断器
+"""
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from dashboard_core import breaker, transport
+
+# 各数据源默认限额: (每秒请求数, 突发量)
+# Customer.io App API 10次/秒；RevenueCat API v2 按480次/分钟计
+DEFAULT_RATES: Dict[str, Tuple[float, int]] = {
+    "customer_io": (10.0, 10),
+    "revenuecat": (8.0, 8)
+}
+# 未配置的数据源不限速
+UNLIMITED = (float("inf"), 1)
+
+# 单次调用（包含排队和重试）的默认截止时间（秒）
+RETRY_DEADLINE = float(os.environ.get('UPSTREAM_RETRY_DEADLINE', '15'))
+MAX_RETRIES = int(os.environ.get('UPSTREAM_MAX_RETRIES', '3'))
+BACKOFF_BASE = float(os.environ.get('UPSTREAM_BACKOFF_BASE', '0.5'))
+
+def load_rates() -> Dict[str, Tuple[float, int]]:
+    """
+    默认限额 + 环境变量UPSTREAM_RATE_LIMITS覆盖
+    格式: {"customer_io": {"rate": 5, "burst": 5}}
+    """
+    rates = dict(DEFAULT_RATES)
+    raw = os.environ.get('UPSTREAM_RATE_LIMITS')
+    if raw:
+        for provider, limit in json.loads(raw).items():
+            rate = float(limit["rate"])
+            rates[provider] = (rate, int(limit.get("burst", max(1, rate))))
+    return rates
+
+def is_retryable_status(status_code: int) -> bool:
+    """可以重试的响应状态码"""
+    return status_code == 429 or status_code >= 500
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After（秒数或HTTP日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    # email.utils只在收到HTTP日期格式时才导入（冷启动路径上用不到）
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimitTimeout(RuntimeError):
+    """截止时间内排不到令牌"""
+
+class TokenBucket:
+    """
+    令牌桶，预约方式取令牌：令牌数可以为负，表示已经排队的请求
+    每个请求拿到的等待时间就是它在队列中的位置，按到达顺序放行
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def reserve(self, deadline: float) -> Optional[float]:
+        """预约一个令牌，返回需要等待的秒数；截止时间前拿不到时返回None（不占用令牌）"""
+        with self._lock:
+            now = self.clock()
+            if self.rate != float("inf"):
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                delay = max(0.0, -self._tokens / self.rate)
+            else:
+                delay = 0.0
+            delay = max(delay, self._paused_until - now)
+
+            if now + delay > deadline:
+                if self.rate != float("inf"):
+                    self._tokens += 1
+                return None
+            return delay
+
+    def pause(self, seconds: float) -> None:
+        """上游要求等待时暂停整个令牌桶"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+
+class RequestStats:
+    """按数据源的排队和重试统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, provider: str, key: str, value: float = 1) -> None:
+        with self._lock:
+            provider_stats = self._stats.setdefault(provider, {"queuedMs": 0, "retries": 0, "rateLimited": 0})
+            provider_stats[key] += value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                provider: {key: round(value) for key, value in provider_stats.items()}
+                for provider, provider_stats in self._stats.items()
+            }
+
+stats = RequestStats()
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+_rates: Optional[Dict[str, Tuple[float, int]]] = None
+
+def get_bucket(provider: str) -> TokenBucket:
+    """数据源对应的令牌桶（进程内共享）"""
+    global _rates
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            if _rates is None:
+                _rates = load_rates()
+            rate, burst = _rates.get(provider, UNLIMITED)
+            bucket = _buckets[provider] = TokenBucket(rate, burst)
+        return bucket
+
+def backoff_delay(attempt: int) -> float:
+    """第attempt次重试前的等待时间（指数退避，抖动范围为后一半）"""
+    delay = BACKOFF_BASE * (2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def request(provider: str, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+            json: Optional[Any] = None, timeout: float = 30, deadline: Optional[float] = None):
+    """
+    限速并重试的上游请求，deadline为time.monotonic()的截止时间
+    重试次数或截止时间用尽时返回最后一次的响应；排不到令牌时抛出RateLimitTimeout，熔断时抛出CircuitOpenError
+    """
+    deadline = deadline if deadline is not None else time.monotonic() + RETRY_DEADLINE
+    bucket = get_bucket(provider)
+
+    circuit = None
+    response = None
+    attempt = 0
+    while True:
+        delay = bucket.reserve(deadline)
+        if delay is None:
+            if response is not None:
+                # 重试排不到令牌，按上一次的响应结束
+                breaker.record_status(circuit, response.status_code)
+                return response
+            raise RateLimitTimeout(f"{provider}: no request slot before deadline")
+        if delay > 0:
+            stats.record(provider, "queuedMs", delay * 1000)
+            time.sleep(delay)
+
+        if circuit is None:
+            # 拿到令牌后才占用熔断器（half_open时的探测名额），重试不再重复检查
+            circuit = breaker.admit(provider)
+        remaining = deadline - time.monotonic()
+        try:
+            response = transport.request(method, url, headers=headers, json=json,
+                                         timeout=max(0.1, min(timeout, remaining)))
+        except Exception:
+            circuit.record_failure()
+            raise
+        if not is_retryable_status(response.status_code):
+            breaker.record_status(circuit, response.status_code)
+            return response
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if response.status_code == 429:
+            stats.record(provider, "rateLimited")
+
+        wait_seconds = retry_after if retry_after is not None else backoff_delay(attempt)
+        if attempt >= MAX_RETRIES or time.monotonic() + wait_seconds >= deadline:
+            breaker.record_status(circuit, response.status_code)
+            return response
+
+        attempt += 1
+        stats.record(provider, "retries")
+        if response.status_code == 429 and retry_after is not None:
+            # 暂停整个数据源，排队中的其他请求也一起等待，下一次reserve会等到暂停结束
+            bucket.pause(retry_after)
+        else:
+            time.sleep(wait_seconds)
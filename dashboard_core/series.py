@@ -0,0 +1,122 @@
+"""
+紧凑的指标序列格式（delta-v1，/api/series使用）
+多个指标共用一条时间轴，按列存放：
+- 时间戳: 第一个时间戳 + 相邻时间戳的差值
+- 指标值: 按scale换算成整数后，第一个值 + 相邻值的差值；无法精确换算成整数时直接存float64
+- 差值数组按实际取值范围选择最窄的整数类型（int8/16/32），以小端字节序的base64字符串传输，
+  前端直接用DataView解码成数组
+
+{
+  "format": "delta-v1",
+  "count": 3,
+  "timestamps": {"base": 1700000000, "type": "uint8", "deltas": "PDw="},
+  "series": {
+    "arr": {"encoding": "delta", "scale": 100, "base": 14164800, "type": "int8", "deltas": "AAA="},
+    "mrr": {"encoding": "float64", "values": "..."}
+  }
+}
+
+某个指标在时间轴上缺少的点沿用前一个值（第一个点缺失时沿用该指标的第一个值）
+"""
+import base64
+import sys
+from array import array
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+FORMAT = "delta-v1"
+
+# 可选的整数类型: (名称, array类型码, 字节数, 是否有符号)，按宽度从窄到宽
+INT_TYPES = (("int8", "b", 1, True), ("int16", "h", 2, True), ("int32", "i", 4, True))
+UINT_TYPES = (("uint8", "B", 1, False), ("uint16", "H", 2, False), ("uint32", "I", 4, False))
+
+# 依次尝试的换算倍数：计数为整数，金额精确到分
+SCALES = (1, 100)
+
+def pack(values: Sequence[float], typecode: str) -> str:
+    """按小端字节序打包成base64字符串"""
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode("ascii")
+
+def pack_ints(values: Sequence[int], types: Tuple[Tuple[str, str, int, bool], ...]) -> Optional[Tuple[str, str]]:
+    """用能容纳所有值的最窄整数类型打包，返回 (类型名, base64)，超出范围时返回None"""
+    low, high = (min(values), max(values)) if values else (0, 0)
+    for name, typecode, size, signed in types:
+        # 类型码的实际宽度与平台有关，宽度不符时跳过
+        if array(typecode).itemsize != size:
+            continue
+        bits = size * 8
+        type_min, type_max = (-2 ** (bits - 1), 2 ** (bits - 1) - 1) if signed else (0, 2 ** bits - 1)
+        if type_min <= low and high <= type_max:
+            return name, pack(values, typecode)
+    return None
+
+def deltas(values: Sequence[int]) -> List[int]:
+    """相邻值的差值"""
+    return [current - previous for previous, current in zip(values, values[1:])]
+
+def scaled_ints(values: Sequence[float]) -> Optional[Tuple[int, List[int]]]:
+    """
+    找到能把所有值精确换算成整数的倍数，返回 (倍数, 整数值)
+    只容许浮点运算本身的误差（如0.1 * 100），更大的偏差说明值有更多小数位，不能换算
+    """
+    # 指标值大多重复（数小时不变），只检查不同的值
+    distinct = set(values)
+    for scale in SCALES:
+        exact = {value: round(value * scale) for value in distinct}
+        if all(abs(scaled - value * scale) <= 1e-9 * max(1.0, abs(value * scale)) for value, scaled in exact.items()):
+            return scale, list(map(exact.__getitem__, values))
+    return None
+
+def encode_values(values: Sequence[float]) -> Dict[str, Any]:
+    """单个指标的值"""
+    scaled = scaled_ints(values)
+    if scaled is not None:
+        scale, ints = scaled
+        packed = pack_ints(deltas(ints), INT_TYPES)
+        if packed is not None:
+            type_name, encoded = packed
+            return {
+                "encoding": "delta",
+                "scale": scale,
+                "base": ints[0] if ints else None,
+                "type": type_name,
+                "deltas": encoded
+            }
+    return {"encoding": "float64", "values": pack(values, "d")}
+
+def align(series: Mapping[str, Sequence[Tuple[int, float]]]) -> Tuple[List[int], Dict[str, List[float]]]:
+    """把各指标的 [(时间戳, 值)] 对齐到同一条时间轴"""
+    timelines = [[ts for ts, _ in points] for points in series.values()]
+    if timelines and all(timeline == timelines[0] for timeline in timelines):
+        # 常见情况：所有指标在同一时刻记录
+        return timelines[0], {metric: [value for _, value in points] for metric, points in series.items()}
+
+    timeline = sorted(set().union(*timelines))
+    aligned = {}
+    for metric, points in series.items():
+        lookup = dict(points)
+        previous = points[0][1] if points else 0.0
+        values = []
+        for ts in timeline:
+            previous = lookup.get(ts, previous)
+            values.append(previous)
+        aligned[metric] = values
+    return timeline, aligned
+
+def encode_series(series: Mapping[str, Sequence[Tuple[int, float]]]) -> Dict[str, Any]:
+    """把 {指标: [(时间戳, 值)]}（HistoryStore.query的结果）编码成delta-v1格式，没有数据的指标不输出"""
+    timeline, aligned = align({metric: points for metric, points in series.items() if points})
+    timestamp_deltas = deltas(timeline)
+    packed = pack_ints(timestamp_deltas, UINT_TYPES)
+    if packed is None:
+        raise ValueError("timestamps must be ascending and less than 2^32 seconds apart")
+    type_name, encoded = packed
+
+    return {
+        "format": FORMAT,
+        "count": len(timeline),
+        "timestamps": {"base": timeline[0] if timeline else None, "type": type_name, "deltas": encoded},
+        "series": {metric: encode_values(values) for metric, values in aligned.items()}
+    }
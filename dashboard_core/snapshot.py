@@ -0,0 +1,321 @@
+"""
+类型化的数据快照
+- 各数据源返回的数据（CustomerIOData / RevenueCatData）、一次采集的完整快照和展示用的核心数值
+- 统一的source名称：update.py、api/data.py、data.json和前端页面使用同一套
+- 基础增量（BASE_*_INCREMENT）只在拿到真实数据时叠加，只在这里计算一次
+- 今日新用户没有实时计数时的估算和月底ARR等预测使用按日拟合的Forecast（dashboard_core.forecast）
+- 多个Customer.io workspace / RevenueCat项目合并为一份数据，保留每个workspace / 项目的明细
+"""
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from dashboard_core.forecast import Forecast
+from dashboard_core.new_users import estimate_daily_new_users, from_new_customers
+
+# ============ source名称 =============
+# 真实数据
+SOURCE_CUSTOMER_IO = "customer_io_real_data"
+SOURCE_REVENUECAT = "revenuecat_real_data"
+# 降级数据：Customer.io没有邮箱segment时使用最大的segment；RevenueCat缺少metrics权限时按项目信息估算
+SOURCE_CUSTOMER_IO_SEGMENT_FALLBACK = "customer_io_segment_fallback"
+SOURCE_REVENUECAT_ESTIMATE = "revenuecat_project_fallback_estimate"
+# 失败（数值为备用数据）
+SOURCE_API_FAILED = "api_failed"
+SOURCE_API_ERROR = "api_error"
+SOURCE_NO_API_KEY = "no_api_key_configured"
+SOURCE_DEADLINE_EXCEEDED = "deadline_exceeded"
+SOURCE_CIRCUIT_OPEN = "circuit_open"
+
+FAILED_SOURCES = frozenset({
+    SOURCE_API_FAILED, SOURCE_API_ERROR, SOURCE_NO_API_KEY, SOURCE_DEADLINE_EXCEEDED, SOURCE_CIRCUIT_OPEN
+})
+
+# 今日新用户的来源
+NEW_USERS_CUSTOMER_IO = "customer_io_search"
+NEW_USERS_REVENUECAT = "revenuecat_new_customers"
+NEW_USERS_FORECAST = "forecast"
+NEW_USERS_ESTIMATE = "estimate"
+
+# 基础增量值（只在获取到真实数据时叠加，备用数据中已经包含）
+BASE_USER_INCREMENT = 11000
+BASE_ARR_INCREMENT = 141600.0
+BASE_SUBS_INCREMENT = 118
+
+# ============ 数据源数据 =============
+@dataclass(frozen=True)
+class CustomerIOData:
+    """
+    Customer.io数据；new_customers_today为None表示还没有实时计数，由resolve_new_users补全
+    多个workspace合并后breakdown为各workspace的数据
+    """
+    total_customers: int
+    new_customers_today: Optional[int]
+    source: str
+    new_users_source: Optional[str] = None
+    workspace: Optional[str] = None
+    breakdown: Tuple["CustomerIOData", ...] = ()
+
+    @property
+    def failed(self) -> bool:
+        return self.source in FAILED_SOURCES
+
+    @classmethod
+    def fallback(cls, source: str) -> "CustomerIOData":
+        """失败时的备用数据（没有API密钥时不虚构数据）"""
+        if source == SOURCE_NO_API_KEY:
+            return cls(total_customers=0, new_customers_today=0, source=source)
+        return cls(total_customers=11000, new_customers_today=22, source=source)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+@dataclass(frozen=True)
+class RevenueCatData:
+    """
+    RevenueCat数据，metrics为overview接口的原始指标值
+    多个项目合并后breakdown为各项目的数据
+    """
+    active_subscriptions: int
+    active_trials: int
+    mrr: float
+    arr: float
+    source: str
+    revenue_28d: float = 0.0
+    today_revenue: float = 0.0
+    new_customers: int = 0
+    new_customers_period: Optional[str] = None
+    active_users: int = 0
+    project_id: Optional[str] = None
+    project_name: Optional[str] = None
+    metrics: Dict[str, float] = field(default_factory=dict)
+    breakdown: Tuple["RevenueCatData", ...] = ()
+
+    @property
+    def failed(self) -> bool:
+        return self.source in FAILED_SOURCES
+
+    @property
+    def real(self) -> bool:
+        """真实的metrics数据（估算和失败时都不叠加基础增量）"""
+        return not self.failed and self.source != SOURCE_REVENUECAT_ESTIMATE
+
+    @classmethod
+    def fallback(cls, source: str) -> "RevenueCatData":
+        """失败时的备用数据"""
+        return cls(active_subscriptions=118, active_trials=12, mrr=11804.0, arr=141600.0, source=source)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def merge_customer_io(parts: Sequence[CustomerIOData]) -> CustomerIOData:
+    """
+    合并多个workspace的数据（总用户数相加）
+    任一workspace失败时整体按失败处理，不返回偏小的总数；今日新用户只有全部都有实时计数时才相加
+    """
+    if len(parts) == 1:
+        return parts[0]
+
+    breakdown = tuple(parts)
+    failed = [part for part in parts if part.failed]
+    if failed:
+        return replace(CustomerIOData.fallback(failed[0].source), breakdown=breakdown)
+
+    new_users = [part.new_customers_today for part in parts]
+    exact = all(part.source == SOURCE_CUSTOMER_IO for part in parts)
+    return CustomerIOData(
+        total_customers=sum(part.total_customers for part in parts),
+        new_customers_today=sum(new_users) if None not in new_users else None,
+        source=SOURCE_CUSTOMER_IO if exact else SOURCE_CUSTOMER_IO_SEGMENT_FALLBACK,
+        new_users_source=NEW_USERS_CUSTOMER_IO if None not in new_users else None,
+        breakdown=breakdown
+    )
+
+def merge_revenuecat(parts: Sequence[RevenueCatData]) -> RevenueCatData:
+    """
+    合并多个项目的数据（各指标相加），已合并过的数据按其项目明细展开
+    任一项目失败时整体按失败处理，不返回偏小的收入
+    """
+    projects: List[RevenueCatData] = []
+    for part in parts:
+        projects.extend(part.breakdown or (part,))
+    if len(projects) == 1:
+        return replace(projects[0], breakdown=(projects[0],))
+
+    breakdown = tuple(projects)
+    failed = [project for project in projects if project.failed]
+    if failed:
+        return replace(RevenueCatData.fallback(failed[0].source), breakdown=breakdown)
+
+    metrics: Dict[str, float] = {}
+    for project in projects:
+        for metric_id, value in project.metrics.items():
+            metrics[metric_id] = metrics.get(metric_id, 0.0) + value
+    periods = {project.new_customers_period for project in projects}
+
+    return RevenueCatData(
+        active_subscriptions=sum(project.active_subscriptions for project in projects),
+        active_trials=sum(project.active_trials for project in projects),
+        mrr=sum(project.mrr for project in projects),
+        arr=sum(project.arr for project in projects),
+        source=SOURCE_REVENUECAT if all(project.real for project in projects) else SOURCE_REVENUECAT_ESTIMATE,
+        revenue_28d=sum(project.revenue_28d for project in projects),
+        today_revenue=sum(project.today_revenue for project in projects),
+        new_customers=sum(project.new_customers for project in projects),
+        # 各项目周期不同时按默认的28天折算
+        new_customers_period=periods.pop() if len(periods) == 1 else None,
+        active_users=sum(project.active_users for project in projects),
+        metrics=metrics,
+        breakdown=breakdown
+    )
+
+def resolve_new_users(customer_io: CustomerIOData, revenuecat: Optional[RevenueCatData],
+                      now: Optional[datetime] = None, forecast: Optional[Forecast] = None) -> CustomerIOData:
+    """
+    补全今日新用户数
+    优先级: Customer.io增量计数 > RevenueCat的new_customers折算 > 历史拟合的预测 > 按总用户数估算
+    """
+    if customer_io.new_customers_today is not None:
+        return customer_io
+
+    today = (now or datetime.now(timezone.utc)).date()
+    if revenuecat is not None and revenuecat.real and "new_customers" in revenuecat.metrics:
+        weekday_factor = forecast.weekday_factor(today) if forecast else None
+        estimate = from_new_customers(revenuecat.new_customers, revenuecat.new_customers_period, now, weekday_factor)
+        if estimate is not None:
+            return replace(customer_io, new_customers_today=estimate, new_users_source=NEW_USERS_REVENUECAT)
+
+    if forecast is not None:
+        return replace(customer_io, new_customers_today=forecast.new_users_on(today),
+                       new_users_source=NEW_USERS_FORECAST)
+
+    return replace(customer_io, new_customers_today=estimate_daily_new_users(customer_io.total_customers, now),
+                   new_users_source=NEW_USERS_ESTIMATE)
+
+# ============ 快照与展示数值 =============
+@dataclass(frozen=True)
+class DashboardValues:
+    """展示的核心数值（已叠加基础增量）"""
+    total_users: int
+    new_users_today: int
+    arr: float
+    mrr: float
+    active_subscriptions: int
+    active_trials: int
+    customer_io_source: str
+    revenuecat_source: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        """响应JSON / 指标历史使用的字段名"""
+        return {
+            "totalUsers": self.total_users,
+            "newUsersToday": self.new_users_today,
+            "arr": self.arr,
+            "mrr": self.mrr,
+            "activeSubscriptions": self.active_subscriptions,
+            "activeTrials": self.active_trials,
+            "customerIOSource": self.customer_io_source,
+            "revenueCatSource": self.revenuecat_source
+        }
+
+    def history_values(self) -> Dict[str, Any]:
+        """
+        写入指标历史的值：只包含来自上游真实数据的指标
+        备用常量和估算值会污染汇总、趋势图和预测拟合，数据源失败时该数据源的指标这一次不记录
+        """
+        values: Dict[str, Any] = {}
+        if self.customer_io_source == SOURCE_CUSTOMER_IO:
+            values["totalUsers"] = self.total_users
+        if self.revenuecat_source == SOURCE_REVENUECAT:
+            values.update(
+                arr=self.arr,
+                mrr=self.mrr,
+                activeSubscriptions=self.active_subscriptions,
+                activeTrials=self.active_trials
+            )
+        return values
+
+@dataclass(frozen=True)
+class DashboardSnapshot:
+    """一次采集到的不可变数据快照"""
+    customer_io: CustomerIOData
+    revenuecat: RevenueCatData
+    request_counts: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+    collected_at: str = ""
+    # 按日拟合的预测，历史数据不足或未启用时为None
+    forecast: Optional[Forecast] = None
+
+    @property
+    def request_count(self) -> int:
+        """本次采集的上游请求总数"""
+        return sum(self.request_counts.values())
+
+    def breakdown(self) -> Dict[str, List[Dict[str, Any]]]:
+        """各workspace / 项目的明细（上游原始数值，不含基础增量）"""
+        return {
+            "customerIO": [
+                {"workspace": part.workspace, "totalUsers": part.total_customers, "source": part.source}
+                for part in self.customer_io.breakdown or (self.customer_io,)
+            ],
+            "revenueCat": [
+                {
+                    "projectId": project.project_id,
+                    "projectName": project.project_name,
+                    "arr": project.arr,
+                    "mrr": project.mrr,
+                    "activeSubscriptions": project.active_subscriptions,
+                    "activeTrials": project.active_trials,
+                    "source": project.source
+                }
+                for project in self.revenuecat.breakdown or (self.revenuecat,)
+            ]
+        }
+
+    def payload(self, source_status: Mapping[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        /api/data的响应JSON（预计算快照文件使用同一格式）
+        source_status为各数据源（customerIO / revenueCat）的状态，至少包含status和breaker
+        """
+        values = self.values()
+        return {
+            "totalUsers": values.total_users,
+            "newUsersToday": values.new_users_today,
+            "arr": values.arr,
+            "mrr": values.mrr,
+            "activeSubscriptions": values.active_subscriptions,
+            "activeTrials": values.active_trials,
+            "lastUpdate": self.collected_at,
+            "sources": {
+                "customerIO": values.customer_io_source,
+                "revenueCat": values.revenuecat_source,
+                "breakers": {name: status["breaker"]["state"] for name, status in source_status.items()}
+            },
+            "sourceStatus": dict(source_status),
+            "breakdown": self.breakdown(),
+            "forecast": self.forecast.projections(values.arr) if self.forecast else None
+        }
+
+    def values(self) -> DashboardValues:
+        """计算展示的核心数值：只有在获取到真实数据时才叠加基础增量（避免在备用数据上重复添加）"""
+        customer_io = resolve_new_users(self.customer_io, self.revenuecat, forecast=self.forecast)
+        total_users = customer_io.total_customers
+        arr = self.revenuecat.arr
+        active_subs = self.revenuecat.active_subscriptions
+
+        if not customer_io.failed:
+            total_users += BASE_USER_INCREMENT
+        if self.revenuecat.real:
+            arr += BASE_ARR_INCREMENT
+            active_subs += BASE_SUBS_INCREMENT
+
+        return DashboardValues(
+            total_users=total_users,
+            new_users_today=customer_io.new_customers_today or 0,
+            arr=arr,
+            mrr=self.revenuecat.mrr,
+            active_subscriptions=active_subs,
+            active_trials=self.revenuecat.active_trials,
+            customer_io_source=customer_io.source,
+            revenuecat_source=self.revenuecat.source
+        )
@@ -0,0 +1,130 @@
+"""
+Server-Sent Events 推送
+- content_hash: 只根据指标内容计算的稳定哈希（不含lastUpdate、缓存和耗时等每次都会变化的字段），
+  同时用作SSE事件ID和/api/data的ETag
+- SnapshotBroadcaster: 单个后台刷新循环，数据变化时才推送给所有订阅者，N个屏幕只消耗一次上游刷新
+"""
+import hashlib
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 不参与内容哈希的字段
+VOLATILE_FIELDS = ("lastUpdate", "cache", "transport", "sourceStatus")
+
+def content_hash(payload: Dict[str, Any]) -> str:
+    """指标内容的稳定哈希"""
+    stable = {key: value for key, value in payload.items() if key not in VOLATILE_FIELDS}
+    encoded = json.dumps(stable, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+def make_etag(payload: Dict[str, Any]) -> str:
+    """基于内容哈希的强ETag"""
+    return f'"{content_hash(payload)}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断If-None-Match请求头是否匹配当前ETag（支持多个值、弱校验W/前缀和*）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def format_event(data: Any, event: Optional[str] = None, event_id: Optional[str] = None,
+                 retry_ms: Optional[int] = None) -> bytes:
+    """按SSE格式编码一条事件"""
+    lines = []
+    if retry_ms is not None:
+        lines.append(f"retry: {retry_ms}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    for line in json.dumps(data).splitlines() or [""]:
+        lines.append(f"data: {line}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+def format_heartbeat(retry_ms: Optional[int] = None) -> bytes:
+    """心跳事件，让客户端知道连接仍然可用（不带id，不改变Last-Event-ID）"""
+    return format_event(None, event="ping", retry_ms=retry_ms)
+
+class SnapshotBroadcaster:
+    """
+    后台线程按固定间隔调用fetch获取最新数据，内容哈希变化时广播给所有订阅者
+    fetch返回None表示暂无数据
+    """
+
+    def __init__(self, fetch: Callable[[], Optional[Dict[str, Any]]], interval: float):
+        self.fetch = fetch
+        self.interval = interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._latest: Optional[Tuple[str, Dict[str, Any]]] = None
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+
+    def refresh(self) -> None:
+        """立即检查一次数据变化（如收到webhook事件后），不等待下一个间隔"""
+        self._wake.set()
+
+    @property
+    def latest(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """最新的 (哈希, 数据)"""
+        with self._lock:
+            return self._latest
+
+    def subscribe(self) -> "queue.Queue":
+        q = queue.Queue(maxsize=8)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: "queue.Queue") -> None:
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                payload = self.fetch()
+                if payload is not None:
+                    self._publish(payload)
+            except Exception:
+                pass
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _publish(self, payload: Dict[str, Any]) -> None:
+        digest = content_hash(payload)
+        with self._lock:
+            if self._latest is not None and self._latest[0] == digest:
+                return
+            self._latest = (digest, payload)
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((digest, payload))
+            except queue.Full:
+                # 客户端消费太慢时丢弃旧事件，只保留最新的
+                try:
+                    q.get_nowait()
+                    q.put_nowait((digest, payload))
+                except (queue.Empty, queue.Full):
+                    pass
@@ -0,0 +1,76 @@
+"""
+HTML模板编译
+- 模板只解析一次，拆成 文本片段/占位符 交替的列表，按文件路径和修改时间缓存
+- 渲染时把值填进占位符位置后一次join，不再对整个模板做多次str.replace
+- 渲染时缺少占位符的值，或者传入了模板里没有的占位符，都直接报错（避免页面上残留{{XXX}}）
+"""
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+# {{NAME}} 形式的占位符
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+class TemplateError(ValueError):
+    """模板渲染参数与占位符不匹配"""
+
+class CompiledTemplate:
+    """编译后的模板，可以用不同的值重复渲染"""
+
+    def __init__(self, source: str, name: str = "<string>"):
+        self.name = name
+        parts: List[Optional[str]] = []
+        slots: List[Tuple[int, str]] = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            parts.append(source[position:match.start()])
+            slots.append((len(parts), match.group(1)))
+            parts.append(None)
+            position = match.end()
+        parts.append(source[position:])
+
+        self._parts = parts
+        self._slots = slots
+        self.placeholders: FrozenSet[str] = frozenset(slot_name for _, slot_name in slots)
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        """填充所有占位符，值会被转成str"""
+        missing = self.placeholders.difference(values)
+        unknown = set(values).difference(self.placeholders)
+        if missing or unknown:
+            problems = []
+            if missing:
+                problems.append(f"missing values for {', '.join(sorted(missing))}")
+            if unknown:
+                problems.append(f"unknown placeholders {', '.join(sorted(unknown))}")
+            raise TemplateError(f"{self.name}: {'; '.join(problems)}")
+
+        parts = list(self._parts)
+        for index, slot_name in self._slots:
+            parts[index] = str(values[slot_name])
+        return "".join(parts)
+
+_cache: Dict[str, Tuple[int, CompiledTemplate]] = {}
+_cache_lock = threading.Lock()
+
+def load_template(path: str) -> CompiledTemplate:
+    """读取并编译模板，文件未修改时直接返回缓存的编译结果"""
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        compiled = CompiledTemplate(f.read(), name=os.path.basename(path))
+
+    with _cache_lock:
+        _cache[path] = (mtime, compiled)
+    return compiled
+
+def embed_json(data: Any) -> str:
+    """把数据编码成可以直接放进<script type="application/json">的文本"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
@@ -0,0 +1,333 @@
+"""
+共享HTTP传输层
+- 进程内复用同一个连接池（按host分池，keep-alive），一次运行中的所有调用以及Vercel热启动的多次调用共享连接
+- 通过环境变量 HTTP_TRANSPORT 选择实现: requests（默认）/ httpx（可选，支持HTTP/2）/ urllib（只用标准库，冷启动最快）
+- 记录请求耗时和新建连接耗时，用于确认连接建立开销已被消除
+- 每次调用的分阶段耗时（建连/TLS/首字节/总耗时）、状态码和字节数记入metrics.registry
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from dashboard_core.metrics import CallTiming, registry
+
+# 连接池配置
+POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '10'))  # 缓存的host连接池数量
+POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '16'))  # 每个host保持的最大连接数
+
+class TransportStats:
+    """传输层计时统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.request_seconds = 0.0
+            self.connections_opened = 0
+            self.connect_seconds = 0.0
+
+    def record_request(self, elapsed: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.request_seconds += elapsed
+
+    def record_connect(self, elapsed: float) -> None:
+        with self._lock:
+            self.connections_opened += 1
+            self.connect_seconds += elapsed
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "transport": _transport.name if _transport is not None else None,
+                "requests": self.requests,
+                "connectionsOpened": self.connections_opened,
+                "connectionsReused": max(0, self.requests - self.connections_opened),
+                "avgRequestMs": round(self.request_seconds * 1000 / self.requests, 1) if self.requests else 0,
+                "connectSetupMs": round(self.connect_seconds * 1000, 1)
+            }
+
+stats = TransportStats()
+
+# 当前线程正在进行的调用的建连/TLS耗时（连接在发起请求的线程中建立）
+_phases = threading.local()
+
+def _record_phases(connect: float, tls: float) -> None:
+    _phases.connect = getattr(_phases, "connect", 0.0) + connect
+    _phases.tls = getattr(_phases, "tls", 0.0) + tls
+
+class RequestsTransport:
+    """基于requests.Session的连接池传输"""
+    name = "requests"
+
+    def __init__(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+        # _new_conn是DNS解析+TCP建连，connect的其余部分是TLS握手
+        class TimedHTTPConnection(HTTPConnection):
+            timed_tls = False
+
+            def _new_conn(self):
+                started = time.perf_counter()
+                sock = super()._new_conn()
+                self._tcp_seconds = time.perf_counter() - started
+                return sock
+
+            def connect(self):
+                started = time.perf_counter()
+                self._tcp_seconds = 0.0
+                super().connect()
+                elapsed = time.perf_counter() - started
+                stats.record_connect(elapsed)
+                tls = max(0.0, elapsed - self._tcp_seconds) if self.timed_tls else 0.0
+                _record_phases(self._tcp_seconds, tls)
+
+        class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+            timed_tls = True
+
+        class TimedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = TimedHTTPConnection
+
+        class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = TimedHTTPSConnection
+
+        class PooledAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = {
+                    "http": TimedHTTPConnectionPool,
+                    "https": TimedHTTPSConnectionPool
+                }
+
+        self.session = requests.Session()
+        adapter = PooledAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                json: Optional[Any] = None, timeout: float = 30):
+        response = self.session.request(method, url, headers=headers, json=json, timeout=timeout)
+        # requests的elapsed是从发送请求到解析完响应头的时间
+        response.first_byte_seconds = response.elapsed.total_seconds()
+        return response
+
+class HttpxTransport:
+    """基于httpx.Client的连接池传输，安装了h2时启用HTTP/2"""
+    name = "httpx"
+
+    def __init__(self):
+        import httpx
+
+        limits = httpx.Limits(max_connections=POOL_CONNECTIONS * POOL_MAXSIZE,
+                              max_keepalive_connections=POOL_MAXSIZE)
+        try:
+            self.client = httpx.Client(http2=True, limits=limits)
+            self.name = "httpx-h2"
+        except ImportError:
+            # 没有安装h2时退回HTTP/1.1
+            self.client = httpx.Client(limits=limits)
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                json: Optional[Any] = None, timeout: float = 30):
+        started = time.perf_counter()
+        marks: Dict[str, float] = {}
+
+        def trace(event_name, info):
+            marks[event_name] = time.perf_counter()
+
+        response = self.client.request(method, url, headers=headers, json=json, timeout=timeout,
+                                       extensions={"trace": trace})
+
+        def span(name):
+            begin, end = marks.get(f"{name}.started"), marks.get(f"{name}.complete")
+            return end - begin if begin is not None and end is not None else 0.0
+
+        connect = span("connection.connect_tcp")
+        if connect:
+            stats.record_connect(connect + span("connection.start_tls"))
+        _record_phases(connect, span("connection.start_tls"))
+        headers_received = (marks.get("http11.receive_response_headers.complete")
+                            or marks.get("http2.receive_response_headers.complete"))
+        response.first_byte_seconds = headers_received - started if headers_received else None
+        return response
+
+class StdlibResponse:
+    """http.client响应的包装，提供与requests相同的 status_code / headers / content / text / json()"""
+
+    def __init__(self, status_code: int, headers, content: bytes, first_byte_seconds: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.first_byte_seconds = first_byte_seconds
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        import json
+        return json.loads(self.content)
+
+class UrllibTransport:
+    """
+    只依赖标准库的传输（http.client），冷启动时不需要导入requests/urllib3
+    每个host保持最多POOL_MAXSIZE个keep-alive连接
+    """
+    name = "urllib"
+
+    def __init__(self):
+        import http.client
+        import queue
+        import ssl
+
+        self._http_client = http.client
+        self._queue = queue
+        self._ssl_context = ssl.create_default_context()
+        self._pools: Dict[Tuple[str, str, Optional[int]], Any] = {}
+        self._pools_lock = threading.Lock()
+
+        class TimedHTTPConnection(http.client.HTTPConnection):
+            def connect(self):
+                started = time.perf_counter()
+                super().connect()
+                elapsed = time.perf_counter() - started
+                stats.record_connect(elapsed)
+                _record_phases(elapsed, 0.0)
+
+        class TimedHTTPSConnection(http.client.HTTPSConnection):
+            def connect(self):
+                # 与HTTPSConnection.connect相同，分开计时TCP建连和TLS握手
+                started = time.perf_counter()
+                http.client.HTTPConnection.connect(self)
+                tcp = time.perf_counter() - started
+                self.sock = self._context.wrap_socket(self.sock, server_hostname=self._tunnel_host or self.host)
+                elapsed = time.perf_counter() - started
+                stats.record_connect(elapsed)
+                _record_phases(tcp, elapsed - tcp)
+
+        self._connection_classes = {"http": TimedHTTPConnection, "https": TimedHTTPSConnection}
+
+    def _pool(self, key):
+        with self._pools_lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = self._queue.LifoQueue(maxsize=POOL_MAXSIZE)
+            return pool
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                json: Optional[Any] = None, timeout: float = 30):
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        request_headers = {"Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        request_headers.update(headers or {})
+        body = None
+        if json is not None:
+            import json as json_module
+            body = json_module.dumps(json).encode()
+            request_headers.setdefault("Content-Type", "application/json")
+
+        pool = self._pool(key)
+        for attempt in range(2):
+            try:
+                conn = pool.get_nowait()
+                reused = True
+            except self._queue.Empty:
+                connection_cls = self._connection_classes[parts.scheme]
+                if parts.scheme == "https":
+                    conn = connection_cls(parts.hostname, parts.port, timeout=timeout, context=self._ssl_context)
+                else:
+                    conn = connection_cls(parts.hostname, parts.port, timeout=timeout)
+                reused = False
+
+            started = time.perf_counter()
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                conn.request(method, path, body=body, headers=request_headers)
+                response = conn.getresponse()
+                first_byte = time.perf_counter() - started
+                content = response.read()
+            except (self._http_client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # 服务端已关闭空闲的keep-alive连接，换一个新连接重试一次
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            if response.getheader("Content-Encoding") == "gzip":
+                import gzip
+                content = gzip.decompress(content)
+
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    pool.put_nowait(conn)
+                except self._queue.Full:
+                    conn.close()
+            return StdlibResponse(response.status, response.headers, content, first_byte)
+
+TRANSPORTS = {
+    "requests": RequestsTransport,
+    "httpx": HttpxTransport,
+    "urllib": UrllibTransport
+}
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport():
+    """获取进程内共享的传输实例（首次调用时创建）"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                name = os.environ.get('HTTP_TRANSPORT', 'requests').lower()
+                transport_cls = TRANSPORTS.get(name, RequestsTransport)
+                try:
+                    _transport = transport_cls()
+                except ImportError:
+                    # 可选依赖未安装时使用默认实现
+                    _transport = RequestsTransport()
+    return _transport
+
+def request(method: str, url: str, headers: Optional[Dict[str, str]] = None,
+            json: Optional[Any] = None, timeout: float = 30):
+    """通过共享连接池发送请求，返回响应对象（status_code / json() / text / headers）"""
+    client = get_transport()
+    _phases.connect = _phases.tls = 0.0
+    started = time.perf_counter()
+    response = None
+    try:
+        response = client.request(method, url, headers=headers, json=json, timeout=timeout)
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.record_request(elapsed)
+        registry.record(CallTiming(
+            method=method.upper(),
+            url=url,
+            status=str(response.status_code) if response is not None else "error",
+            response_bytes=len(response.content) if response is not None else 0,
+            connect=_phases.connect,
+            tls=_phases.tls,
+            first_byte=getattr(response, "first_byte_seconds", None),
+            total=elapsed
+        ))
@@ -0,0 +1,274 @@
+"""
+RevenueCat webhook事件摄取（开发服务器的 POST /api/webhook/revenuecat）
+- 验证签名：RevenueCat原样发送后台配置的Authorization头
+- 事件换算成计数器增量（有效订阅、试用、MRR），与事件记录在同一个事务中写入，按事件ID去重
+- 计数器只累加不清零；每次完整轮询（update.py --precompute 或 /api/data 实时获取）后记录一个检查点，
+  以轮询结果的lastUpdate为key保存当时的计数器值
+- /api/data 返回的数值 = 轮询结果 + (当前计数器 - 该轮询的检查点)：轮询之间的事件几秒内反映到页面上，
+  webhook遗漏或重复的事件在下一次完整轮询时自然校正，因此轮询间隔可以放慢到WEBHOOK_RECONCILE_INTERVAL
+- 计数器文件（WEBHOOK_STATE_PATH）必须由webhook端点、/api/data和update.py --precompute共享，
+  只适用于单机部署；Vercel函数实例之间没有共享的文件系统，不提供webhook端点
+
+RevenueCat事件的处理与其有效订阅的统计口径一致：
+- INITIAL_PURCHASE: 试用 +1，或有效订阅 +1、MRR增加
+- RENEWAL: 只有试用转正（is_trial_conversion）改变计数：试用 -1、有效订阅 +1、MRR增加
+- EXPIRATION: 试用 -1，或有效订阅 -1、MRR减少
+- CANCELLATION: 只是关闭自动续订，到期前仍然算有效订阅，不改变计数（到期时的EXPIRATION才减少）
+- 沙盒环境的事件只记录不计数
+
+Customer.io的Reporting Webhook只推送消息投递和订阅偏好事件（sent、opened、unsubscribed等），
+没有用户创建事件，总用户数和今日新用户仍由轮询获取
+"""
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import IO, Any, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 启用webhook后完整轮询（校正）的间隔（秒）
+RECONCILE_INTERVAL = float(os.environ.get('WEBHOOK_RECONCILE_INTERVAL', '1800'))
+
+# 请求体大小上限（字节）
+MAX_BODY_BYTES = 1024 * 1024
+
+# 事件记录（去重用）保留时间和检查点保留个数
+EVENT_RETENTION_SECONDS = 7 * 86400
+CHECKPOINT_LIMIT = 100
+
+# 每月平均天数，用于把订阅价格换算成MRR
+DAYS_PER_MONTH = 30.4375
+
+# 数据源名称与payload中sourceStatus的key一致
+SOURCE_REVENUECAT = "revenueCat"
+
+# 事件总数计数器
+EVENTS_COUNTER = "events"
+
+@dataclass(frozen=True)
+class WebhookEvent:
+    """一个webhook事件及其对计数器的增量"""
+    source: str
+    event_id: str
+    event_type: str
+    occurred_at: float
+    deltas: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+    # RevenueCat的original_transaction_id，到期事件没有价格时用购买时记录的MRR
+    subscription_id: Optional[str] = None
+
+# ============ 签名验证 =============
+def verify_revenuecat(authorization: Optional[str], secret: str) -> bool:
+    """RevenueCat原样发送后台配置的Authorization头，允许配置时带或不带Bearer前缀"""
+    if not secret or not authorization:
+        return False
+    expected = secret[len("Bearer "):] if secret.startswith("Bearer ") else secret
+    received = authorization[len("Bearer "):] if authorization.startswith("Bearer ") else authorization
+    return hmac.compare_digest(received.encode(), expected.encode())
+
+# ============ 事件解析 =============
+def monthly_price(event: Mapping[str, Any]) -> Optional[float]:
+    """按订阅周期把价格（price为美元）换算成每月金额，缺少价格或周期时返回None"""
+    price = event.get("price")
+    purchased_at, expires_at = event.get("purchased_at_ms"), event.get("expiration_at_ms")
+    if not price or purchased_at is None or expires_at is None:
+        return None
+    days = max(1.0, (expires_at - purchased_at) / 86400000)
+    return float(price) * DAYS_PER_MONTH / days
+
+def parse_revenuecat(document: Mapping[str, Any]) -> WebhookEvent:
+    """RevenueCat webhook请求体 {"api_version": "1.0", "event": {...}}，格式不符时抛出ValueError"""
+    event = document.get("event") if isinstance(document, Mapping) else None
+    if not isinstance(event, Mapping) or not event.get("id") or not event.get("type"):
+        raise ValueError("expected {\"event\": {\"id\": ..., \"type\": ...}}")
+
+    event_type = event["type"]
+    trial = event.get("period_type") == "TRIAL"
+    monthly = monthly_price(event)
+    deltas: Dict[str, float] = {}
+    if event.get("environment") == "SANDBOX":
+        pass
+    elif event_type == "INITIAL_PURCHASE":
+        deltas = {"activeTrials": 1} if trial else {"activeSubscriptions": 1, "mrr": monthly or 0.0}
+    elif event_type == "RENEWAL" and event.get("is_trial_conversion"):
+        deltas = {"activeTrials": -1, "activeSubscriptions": 1, "mrr": monthly or 0.0}
+    elif event_type == "EXPIRATION":
+        deltas = {"activeTrials": -1} if trial else {"activeSubscriptions": -1}
+        if not trial and monthly:
+            deltas["mrr"] = -monthly
+
+    return WebhookEvent(
+        source=SOURCE_REVENUECAT,
+        event_id=str(event["id"]),
+        event_type=event_type,
+        occurred_at=(event.get("event_timestamp_ms") or time.time() * 1000) / 1000,
+        deltas=MappingProxyType(deltas),
+        subscription_id=event.get("original_transaction_id")
+    )
+
+# ============ 计数器存储 =============
+class WebhookState:
+    """基于SQLite的事件计数器（WAL模式，webhook写入和/api/data读取可以在不同进程中）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # 检查点内容不会变化，解析结果按key缓存
+        self._checkpoints: Dict[str, Dict[str, float]] = {}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 自动提交模式，事务用BEGIN IMMEDIATE显式控制
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id TEXT PRIMARY KEY, source TEXT NOT NULL, type TEXT NOT NULL,"
+            " occurred_at REAL NOT NULL, received_at REAL NOT NULL, deltas TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " key TEXT PRIMARY KEY, created_at REAL NOT NULL, counters TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            " id TEXT PRIMARY KEY, mrr REAL NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID;"
+        )
+
+    def apply(self, event: WebhookEvent) -> bool:
+        """应用一个事件，已经处理过的事件（同一数据源的同一ID）返回False"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                deltas = self._subscription_deltas(event)
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO events (id, source, type, occurred_at, received_at, deltas)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (f"{event.source}:{event.event_id}", event.source, event.event_type, event.occurred_at,
+                     time.time(), json.dumps(deltas))
+                ).rowcount
+                if not inserted:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.executemany(
+                    "INSERT INTO counters (name, value) VALUES (?, ?)"
+                    " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    list(dict(deltas, **{EVENTS_COUNTER: 1}).items())
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _subscription_deltas(self, event: WebhookEvent) -> Dict[str, float]:
+        """记录每个订阅的MRR，到期事件没有价格时按购买时的金额减少"""
+        deltas = dict(event.deltas)
+        if not event.subscription_id or not deltas.get("activeSubscriptions"):
+            return deltas
+        if deltas["activeSubscriptions"] > 0:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO subscriptions (id, mrr, updated_at) VALUES (?, ?, ?)",
+                (event.subscription_id, deltas.get("mrr", 0.0), time.time())
+            )
+        else:
+            row = self._conn.execute("SELECT mrr FROM subscriptions WHERE id = ?", (event.subscription_id,)).fetchone()
+            if row is not None:
+                deltas.setdefault("mrr", -row[0])
+                self._conn.execute("DELETE FROM subscriptions WHERE id = ?", (event.subscription_id,))
+        return deltas
+
+    def counters(self) -> Dict[str, float]:
+        """当前计数器值"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+
+    def checkpoint(self, key: str) -> None:
+        """完整轮询完成后记录当时的计数器值，key为轮询结果的lastUpdate"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (key, created_at, counters) VALUES (?, ?, ?)",
+                    (key, now, json.dumps(counters))
+                )
+                # 校正时顺带清理旧的检查点和去重记录
+                self._conn.execute(
+                    "DELETE FROM checkpoints WHERE key NOT IN"
+                    " (SELECT key FROM checkpoints ORDER BY created_at DESC LIMIT ?)", (CHECKPOINT_LIMIT,)
+                )
+                self._conn.execute("DELETE FROM events WHERE received_at < ?", (now - EVENT_RETENTION_SECONDS,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def overlay(self, key: str) -> Optional[Dict[str, float]]:
+        """检查点之后的计数器增量，没有这个检查点时返回None（轮询结果不是在这个状态下记录的）"""
+        with self._lock:
+            base = self._checkpoints.get(key)
+            if base is None:
+                row = self._conn.execute("SELECT counters FROM checkpoints WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                base = self._checkpoints[key] = json.loads(row[0])
+                if len(self._checkpoints) > CHECKPOINT_LIMIT:
+                    self._checkpoints.clear()
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+        return {name: value - base.get(name, 0) for name, value in counters.items() if value != base.get(name, 0)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def apply_overlay(payload: Dict[str, Any], overlay: Mapping[str, float]) -> Dict[str, Any]:
+    """
+    把检查点之后的事件叠加到/api/data的响应JSON上（返回新的dict）
+    RevenueCat轮询失败时payload中是备用数据，不是检查点时的真实值，不叠加
+    """
+    status = payload.get("sourceStatus") or {}
+    result = dict(payload)
+
+    if status.get(SOURCE_REVENUECAT, {}).get("status") == "ok":
+        result["activeSubscriptions"] = payload["activeSubscriptions"] + round(overlay.get("activeSubscriptions", 0))
+        result["activeTrials"] = payload["activeTrials"] + round(overlay.get("activeTrials", 0))
+        mrr = overlay.get("mrr", 0.0)
+        if mrr:
+            result["mrr"] = round(payload["mrr"] + mrr, 2)
+            result["arr"] = round(payload["arr"] + mrr * 12, 2)
+
+    result["webhooks"] = {"eventsSinceReconcile": round(overlay.get(EVENTS_COUNTER, 0))}
+    return result
+
+# ============ 请求处理 =============
+def handle_revenuecat(headers: Mapping[str, str], body_file: IO[bytes], secret: str,
+                      state: Optional[WebhookState]) -> Tuple[int, Dict[str, Any]]:
+    """
+    处理一次RevenueCat webhook请求，返回 (HTTP状态码, 响应JSON)
+    未配置计数器文件时返回503（RevenueCat会重试），不在本地临时文件中静默计数；
+    重复投递的事件返回200，RevenueCat不再重试
+    """
+    if not secret:
+        return 503, {"error": "REVENUECAT_WEBHOOK_SECRET not configured"}
+    if state is None:
+        logger.error("❌ 未配置WEBHOOK_STATE_PATH，无法记录RevenueCat webhook事件")
+        return 503, {"error": "WEBHOOK_STATE_PATH not configured"}
+
+    length = int(headers.get('Content-Length') or 0)
+    if length > MAX_BODY_BYTES:
+        return 413, {"error": "request body too large"}
+    body = body_file.read(length)
+
+    if not verify_revenuecat(headers.get('Authorization'), secret):
+        return 401, {"error": "invalid authorization"}
+
+    try:
+        event = parse_revenuecat(json.loads(body))
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+    applied = state.apply(event)
+    return 200, {"ok": True, "type": event.event_type, "duplicate": not applied}
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+本地开发服务器
+- 静态文件（index.html 等）
+- /api/data、/api/metrics、/api/history、/api/series 直接复用Vercel函数的handler
+- /api/stream 长连接SSE：单个后台刷新循环，数据变化时才推送给所有打开的页面
+- POST /api/webhook/revenuecat 接收RevenueCat webhook事件，处理后立即推送（需要WEBHOOK_STATE_PATH，只在单机部署中提供）
+
+用法: python3 devserver.py --port 8000 --interval 15
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from api import data as data_api
+from api import history as history_api
+from api import series as series_api
+from dashboard_core.stream import SnapshotBroadcaster, format_event, format_heartbeat
+from dashboard_core.webhooks import handle_revenuecat
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 复用的Vercel函数
+API_ROUTES = {
+    "/api/data": data_api.handler,
+    "/api/metrics": data_api.handler,
+    "/api/history": history_api.handler,
+    "/api/series": series_api.handler
+}
+
+# RevenueCat后台 Integrations → Webhooks 中配置的Authorization头
+REVENUECAT_WEBHOOK_SECRET = os.environ.get('REVENUECAT_WEBHOOK_SECRET', '')
+
+# SSE心跳间隔（秒）
+HEARTBEAT_SECONDS = 15
+
+broadcaster = None
+
+class DevHandler(SimpleHTTPRequestHandler):
+    """开发服务器请求处理"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=ROOT_DIR, **kwargs)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+
+        if path == "/api/stream":
+            self.handle_stream()
+            return
+
+        route = API_ROUTES.get(path)
+        if route:
+            # Vercel的handler只依赖BaseHTTPRequestHandler接口，切换到对应的类后直接处理
+            self.__class__ = route
+            route.do_GET(self)
+            return
+
+        super().do_GET()
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/api/webhook/revenuecat":
+            self.send_error(404)
+            return
+
+        try:
+            status, data = handle_revenuecat(self.headers, self.rfile, REVENUECAT_WEBHOOK_SECRET,
+                                             data_api.get_webhook_state())
+        except Exception as e:
+            # 返回5xx时RevenueCat会重试
+            logging.getLogger(__name__).error(f"❌ webhook处理失败: {e}")
+            status, data = 500, {"error": str(e)}
+        self.send_json(status, data)
+
+        # 计数器已更新，页面不用等到下一个检查间隔
+        if status == 200 and not data["duplicate"] and broadcaster is not None:
+            broadcaster.refresh()
+
+    def send_json(self, status, data):
+        """发送JSON响应"""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_stream(self):
+        """长连接SSE，所有连接共享同一个后台刷新循环"""
+        subscription = broadcaster.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+
+            # 新连接先发送当前快照（客户端已有相同数据时跳过）
+            latest = broadcaster.latest
+            if latest and latest[0] != self.headers.get('Last-Event-ID'):
+                self.wfile.write(format_event(latest[1], event='snapshot', event_id=latest[0]))
+                self.wfile.flush()
+
+            while True:
+                try:
+                    digest, payload = subscription.get(timeout=HEARTBEAT_SECONDS)
+                    self.wfile.write(format_event(payload, event='snapshot', event_id=digest))
+                except queue.Empty:
+                    self.wfile.write(format_heartbeat())
+                self.wfile.flush()
+
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+def main():
+    global broadcaster
+
+    parser = argparse.ArgumentParser(description="UnlockLand Dashboard 本地开发服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--interval", type=float, default=15, help="后台检查数据变化的间隔（秒）")
+    args = parser.parse_args()
+
+    if REVENUECAT_WEBHOOK_SECRET and not data_api.WEBHOOK_STATE_PATH:
+        print("❌ 已配置REVENUECAT_WEBHOOK_SECRET但未配置WEBHOOK_STATE_PATH，/api/webhook/revenuecat将返回503")
+
+    broadcaster = SnapshotBroadcaster(lambda: data_api.get_payload()[0], args.interval)
+    broadcaster.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), DevHandler)
+    server.daemon_threads = True
+    print(f"🚀 开发服务器已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 开发服务器已停止")
+    finally:
+        broadcaster.stop()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
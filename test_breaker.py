@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+按数据源的熔断器（dashboard_core.breaker）测试
+"""
+
+from dashboard_core import breaker
+
+def make_breaker(now):
+    return breaker.CircuitBreaker("test_clock", failure_threshold=2, base_delay=10, clock=lambda: now[0])
+
+def test_opens_after_consecutive_failures():
+    """连续失败达到阈值后打开，中间的成功会清零计数"""
+    now = [0.0]
+    circuit = make_breaker(now)
+
+    circuit.record_failure()
+    circuit.record_success()
+    circuit.record_failure()
+    assert circuit.state == breaker.CLOSED
+
+    circuit.record_failure()
+    assert circuit.state == breaker.OPEN
+    assert not circuit.allow()
+    assert 5 <= circuit.retry_in() <= 10
+
+def test_half_open_allows_one_probe():
+    """等待结束后只放行一个探测请求，成功则关闭"""
+    now = [0.0]
+    circuit = make_breaker(now)
+    circuit.record_failure()
+    circuit.record_failure()
+
+    now[0] += 10
+    assert circuit.state == breaker.HALF_OPEN
+    assert circuit.allow()
+    assert not circuit.allow()
+
+    circuit.record_success()
+    assert circuit.state == breaker.CLOSED
+    assert circuit.allow()
+
+def test_failed_probe_doubles_delay():
+    """探测失败时重新打开，等待时间加倍"""
+    now = [0.0]
+    circuit = make_breaker(now)
+    circuit.record_failure()
+    circuit.record_failure()
+
+    now[0] += 10
+    assert circuit.allow()
+    circuit.record_failure()
+    assert circuit.state == breaker.OPEN
+    assert 10 <= circuit.retry_in() <= 20
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+/api/data 的ETag与304（api/data.py handler、dashboard_core.stream.make_etag）测试
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from api import data as data_api
+from dashboard_core.stream import etag_matches, make_etag
+
+def payload(total_users=1000, last_update="2026-10-18T12:00:00+00:00"):
+    return {
+        "totalUsers": total_users,
+        "arr": 12000.0,
+        "lastUpdate": last_update,
+        "sourceStatus": {"customerIO": {"status": "ok"}, "revenueCat": {"status": "ok"}}
+    }
+
+@pytest.fixture
+def server(monkeypatch):
+    current = {"payload": payload()}
+    monkeypatch.setattr(data_api, "get_payload", lambda: (current["payload"], "hit"))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), data_api.handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield current, f"http://127.0.0.1:{httpd.server_port}/api/data"
+    httpd.shutdown()
+    httpd.server_close()
+
+def get(url, etag=None):
+    """返回 (状态码, ETag, 响应体)"""
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers.get("ETag"), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("ETag"), e.read()
+
+def test_not_modified_until_metrics_change(server):
+    current, url = server
+
+    status, etag, body = get(url)
+    assert status == 200
+    assert etag == make_etag(payload())
+    assert json.loads(body)["totalUsers"] == 1000
+
+    assert get(url, etag) == (304, etag, b"")
+
+    # 只有更新时间变化，内容相同
+    current["payload"] = payload(last_update="2026-10-18T12:01:00+00:00")
+    assert get(url, etag)[0] == 304
+
+    current["payload"] = payload(total_users=1001)
+    status, new_etag, body = get(url, etag)
+    assert status == 200
+    assert new_etag != etag
+    assert json.loads(body)["totalUsers"] == 1001
+
+def test_etag_matches():
+    etag = make_etag(payload())
+    assert etag_matches(etag, etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+上游请求入口（dashboard_core.fetch.Fetcher）针对本地桩服务（bench/stub_server.py）的测试
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(ROOT_DIR, "bench")
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from stub_server import StubUpstream, start_stub
+
+from dashboard_core.fetch import Fetcher
+
+@pytest.fixture
+def stub():
+    upstream = StubUpstream(segment_count=3, latency_ms=200)
+    server = start_stub(upstream)
+    upstream.base_url = f"http://127.0.0.1:{server.server_port}"
+    yield upstream
+    server.shutdown()
+    server.server_close()
+
+def test_concurrent_gets_share_one_request(stub):
+    """同一资源的并发请求只发出一次，其余等待进行中的请求"""
+    fetcher = Fetcher()
+    url = stub.base_url + "/v1/segments"
+    headers = {"Authorization": "Bearer key"}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: fetcher.get("customer_io", url, headers), range(8)))
+
+    assert stub.calls == {"/v1/segments": 1}
+    assert fetcher.request_counts == {"customer_io": 1}
+    assert all(result is results[0] for result in results)
+    assert len(results[0]["segments"]) == 3
+
+    # 完成后的请求直接复用结果
+    assert fetcher.get("customer_io", url, headers) is results[0]
+    assert stub.calls == {"/v1/segments": 1}
+
+def test_credentials_are_not_shared(stub):
+    """不同workspace / token的同一URL分别请求"""
+    fetcher = Fetcher()
+    url = stub.base_url + "/v1/segments"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda key: fetcher.get("customer_io", url, {"Authorization": f"Bearer {key}"}),
+                      ["a", "b", "a", "b"]))
+
+    assert stub.calls == {"/v1/segments": 2}
+
+def test_failed_request_is_shared(stub):
+    """失败结果（None）同样在本次采集内复用，等待者不会阻塞"""
+    fetcher = Fetcher()
+    url = stub.base_url + "/v1/segments/99/customer_count"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: fetcher.get("customer_io", url, {}), range(4)))
+
+    assert results == [None] * 4
+    assert stub.calls == {"/v1/segments/{id}/customer_count": 1}
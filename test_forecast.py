@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+基于指标历史的预测（dashboard_core.forecast）测试
+"""
+
+import math
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from dashboard_core import forecast
+from dashboard_core.history import HistoryStore
+
+FIRST_DAY = date(2026, 6, 1)  # 周一
+PATTERN = (100, 120, 110, 90, 80, 40, 60)  # 周一到周日的新用户
+
+def daily_series(days, seed=7):
+    """逐日的totalUsers / ARR，带噪声、缺失值、数据源失败造成的下跌和异常跳变"""
+    rng = random.Random(seed)
+    users, arr = [], []
+    total, revenue = 10000.0, 50000.0
+    for index in range(days):
+        total += PATTERN[index % 7] * rng.uniform(0.8, 1.2)
+        revenue += rng.uniform(-20, 60)
+        users.append(total)
+        arr.append(revenue)
+    if days > 30:
+        users[10] = None
+        users[20] = users[19] - 500  # 备用数据
+        users[30] = users[29] + 100000  # 恢复时的跳变
+        arr[15] = None
+    return users, arr
+
+def test_numpy_and_python_fits_agree():
+    """NumPy批量实现与纯Python实现的结果一致"""
+    np = pytest.importorskip("numpy")
+    users, arr = daily_series(90)
+
+    fitted_numpy = forecast._fit_numpy(np, users, arr, FIRST_DAY.weekday(), forecast.ALPHA)
+    fitted_python = forecast._fit_python(users, arr, FIRST_DAY.weekday(), forecast.ALPHA)
+
+    assert fitted_numpy[0] == fitted_python[0]
+    for value_numpy, value_python in zip(fitted_numpy[1:], fitted_python[1:]):
+        assert value_numpy == pytest.approx(value_python, rel=1e-9)
+
+    short_users, short_arr = daily_series(forecast.MIN_DAYS)
+    assert forecast._fit_numpy(np, short_users, short_arr, 0, forecast.ALPHA) is None
+    assert forecast._fit_python(short_users, short_arr, 0, forecast.ALPHA) is None
+
+def test_fit_follows_weekday_pattern():
+    users, arr = daily_series(90)
+    today = FIRST_DAY + timedelta(days=90)
+    result = forecast.fit(users, arr, FIRST_DAY, today)
+
+    assert result.day == today.isoformat()
+    assert sum(result.weekday_factors) == pytest.approx(7)
+    # 周二最多、周六最少
+    assert max(range(7), key=lambda weekday: result.weekday_factors[weekday]) == 1
+    assert min(range(7), key=lambda weekday: result.weekday_factors[weekday]) == 5
+    assert 80 < result.new_users_level < 100
+    assert result.arr_daily_trend > 0
+    assert not math.isnan(result.arr_daily_trend)
+
+def write_history(store, start, days):
+    users, arr = daily_series(days)
+    for index in range(days):
+        ts = int(datetime(start.year, start.month, start.day, 12, tzinfo=timezone.utc).timestamp()) + index * 86400
+        store.append({"totalUsers": users[index], "arr": arr[index]}, ts=ts)
+
+def test_insufficient_history_is_not_cached(tmp_path, monkeypatch):
+    """历史不足时不缓存None，当天补齐数据后即可预测；拟合结果当天从磁盘复用"""
+    history_path = str(tmp_path / "history.sqlite")
+    cache_path = str(tmp_path / "forecast.json")
+    today = date(2026, 10, 18)
+    now = datetime(today.year, today.month, today.day, 9, tzinfo=timezone.utc)
+
+    store = HistoryStore(history_path)
+    write_history(store, today - timedelta(days=5), 5)
+    model = forecast.ForecastModel(history_path, cache_path)
+    assert model.get(now) is None
+    assert not (tmp_path / "forecast.json").exists()
+
+    write_history(store, today - timedelta(days=60), 55)
+    store.close()
+    fitted = model.get(now)
+    assert fitted is not None and fitted.day == today.isoformat()
+    assert model.get(now + timedelta(hours=1)) is fitted
+
+    def no_fit(self, day):
+        raise AssertionError("当天的拟合结果应从磁盘读取")
+
+    monkeypatch.setattr(forecast.ForecastModel, "_fit", no_fit)
+    assert forecast.ForecastModel(history_path, cache_path).get(now) == fitted
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+指标历史存储（dashboard_core.history）测试
+"""
+
+import pytest
+
+from dashboard_core.history import HistoryStore, default_resolution, parse_range
+
+HOUR = 3600
+DAY = 86400
+START = 1760000000 - 1760000000 % DAY
+
+@pytest.fixture
+def store(tmp_path):
+    history = HistoryStore(str(tmp_path / "history.sqlite"))
+    yield history
+    history.close()
+
+def test_append_and_query_raw(store):
+    """只记录已知指标中的数值，按时间升序返回"""
+    store.append({"totalUsers": 100, "arr": 1000.5, "unknown": 1}, ts=START + 60)
+    store.append({"totalUsers": 90}, ts=START)
+    store.append({"totalUsers": "n/a", "arr": None}, ts=START + 120)
+
+    assert store.query("totalUsers", START, START + DAY) == [(START, 90.0), (START + 60, 100.0)]
+    assert store.query("arr", START, START + DAY) == [(START + 60, 1000.5)]
+    with pytest.raises(ValueError):
+        store.query("unknown", START)
+
+def test_rollups(store):
+    """小时/天级汇总的平均、最小、最大和最后一个值"""
+    for offset, value in ((0, 10), (600, 30), (HOUR, 50), (DAY, 70)):
+        store.append({"arr": value}, ts=START + offset)
+
+    assert store.query("arr", START, START + 2 * DAY, resolution="hour") == \
+        [(START, 20.0), (START + HOUR, 50.0), (START + DAY, 70.0)]
+    assert store.query("arr", START, START + 2 * DAY, resolution="day") == [(START, 30.0), (START + DAY, 70.0)]
+    assert store.query("arr", START, START + DAY - 1, resolution="day", aggregate="min") == [(START, 10.0)]
+    assert store.query("arr", START, START + DAY - 1, resolution="day", aggregate="max") == [(START, 50.0)]
+    assert store.query("arr", START, START + DAY - 1, resolution="day", aggregate="last") == [(START, 50.0)]
+
+def test_duplicate_timestamp_is_counted_once(store):
+    """同一时间戳重复写入时保留原来的点，汇总不重复计入"""
+    store.append({"totalUsers": 100}, ts=START)
+    store.append({"totalUsers": 100}, ts=START)
+    store.append({"totalUsers": 120}, ts=START)
+    store.append({"totalUsers": 200}, ts=START + 60)
+
+    assert store.query("totalUsers", START, START + HOUR) == [(START, 100.0), (START + 60, 200.0)]
+    assert store.query("totalUsers", START, START + HOUR, resolution="hour") == [(START, 150.0)]
+    assert store.query("totalUsers", START, START + HOUR, resolution="day") == [(START, 150.0)]
+
+def test_parse_range():
+    assert parse_range("30m") == 1800
+    assert parse_range("7d") == 7 * DAY
+    assert default_resolution(parse_range("24h")) == "raw"
+    assert default_resolution(parse_range("4w")) == "hour"
+    assert default_resolution(parse_range("90d")) == "day"
+    with pytest.raises(ValueError):
+        parse_range("7x")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+上游调用耗时指标（dashboard_core.metrics）测试
+"""
+
+from dashboard_core import metrics
+from dashboard_core.providers import ROUTES
+
+def timing(url, total, status="200", connect=0.0, tls=0.0, first_byte=None):
+    return metrics.CallTiming("GET", url, status, 100, connect, tls, first_byte, total)
+
+def test_endpoint_template_uses_known_routes():
+    """已知接口按模板聚合，保留base_url的路径前缀，其他路径归入同一个标签"""
+    assert "/segments/{id}/customer_count" in ROUTES
+    assert metrics.endpoint_template("https://api.customer.io/v1/segments/42/customer_count") == \
+        "api.customer.io/v1/segments/{id}/customer_count"
+    assert metrics.endpoint_template("https://api.revenuecat.com/v2/projects/proj1a2b/metrics/overview") == \
+        "api.revenuecat.com/v2/projects/{id}/metrics/overview"
+    assert metrics.endpoint_template("https://api.revenuecat.com/v2/projects?starting_after=proj9") == \
+        "api.revenuecat.com/v2/projects"
+    assert metrics.endpoint_template("http://127.0.0.1:8080/proxy/v1/customers") == "127.0.0.1:8080/proxy/v1/customers"
+
+    # 不含数字的ID也不会产生新的标签
+    assert metrics.endpoint_template("https://api.customer.io/v1/segments/abc/unknown") == "api.customer.io/{other}"
+    assert metrics.endpoint_template("https://api.customer.io/v1/objects/xyz") == "api.customer.io/{other}"
+
+def test_histogram_quantile():
+    """按桶线性插值，与Prometheus histogram_quantile相同"""
+    histogram = metrics.Histogram()
+    assert histogram.quantile(0.5) is None
+
+    for value in (0.03, 0.04, 0.06, 0.07):
+        histogram.observe(value)
+    # 两个值在(0.025, 0.05]，两个在(0.05, 0.1]
+    assert abs(histogram.quantile(0.5) - 0.05) < 1e-9
+    assert abs(histogram.quantile(0.75) - 0.075) < 1e-9
+    assert abs(histogram.quantile(0.25) - 0.0375) < 1e-9
+
+    histogram.observe(60.0)
+    assert histogram.quantile(1.0) == metrics.BUCKETS[-1]
+
+def test_prometheus_text():
+    registry = metrics.MetricsRegistry()
+    url = "https://api.customer.io/v1/segments/7/customer_count"
+    registry.record(timing(url, 0.2, connect=0.01, first_byte=0.15))
+    registry.record(timing(url.replace("/7/", "/8/"), 0.4, status="429", first_byte=0.3))
+
+    text = registry.prometheus_text()
+    labels = 'endpoint="api.customer.io/v1/segments/{id}/customer_count",method="GET"'
+
+    assert text.endswith("\n")
+    assert f'dashboard_upstream_request_duration_seconds_bucket{{{labels},phase="total",le="0.25"}} 1' in text
+    assert f'dashboard_upstream_request_duration_seconds_bucket{{{labels},phase="total",le="+Inf"}} 2' in text
+    assert f'dashboard_upstream_request_duration_seconds_sum{{{labels},phase="total"}} 0.600000' in text
+    assert f'dashboard_upstream_request_duration_seconds_count{{{labels},phase="connect"}} 1' in text
+    assert 'phase="tls"' not in text
+    assert f'dashboard_upstream_requests_total{{{labels},status="200"}} 1' in text
+    assert f'dashboard_upstream_requests_total{{{labels},status="429"}} 1' in text
+    assert f'dashboard_upstream_response_bytes_total{{{labels}}} 200' in text
+
+    [summary] = registry.summary()
+    assert summary["calls"] == 2
+    assert summary["statuses"] == {"200": 1, "429": 1}
+
+def test_escape_label():
+    assert metrics.escape_label('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+今日新用户增量计数（dashboard_core.new_users）测试
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+from dashboard_core.new_users import NewUsersCounter
+
+NOW = datetime(2026, 10, 18, 12, 0, 0, tzinfo=timezone.utc)
+DAY_START = int(datetime(2026, 10, 18, tzinfo=timezone.utc).timestamp())
+
+class FakeSearch:
+    """按created_at窗口返回客户ID，记录每次查询的窗口"""
+
+    def __init__(self, created, page_size=2):
+        self.created = created  # {客户ID: created_at}
+        self.page_size = page_size
+        self.windows = []
+
+    def __call__(self, search_filter, cursor):
+        low = search_filter["and"][0]["attribute"]["value"]
+        high = search_filter["and"][1]["attribute"]["value"]
+        if cursor is None:
+            self.windows.append((low, high))
+        ids = sorted(customer for customer, ts in self.created.items() if low < ts < high)
+        start = int(cursor or 0)
+        page = ids[start:start + self.page_size]
+        more = start + self.page_size < len(ids)
+        return page, str(start + self.page_size) if more else None
+
+def test_counts_incrementally_without_overlap(tmp_path):
+    """相邻两次查询的窗口首尾相接，当前这一秒创建的客户留给下一次查询"""
+    now_ts = int(NOW.timestamp())
+    search = FakeSearch({"a": DAY_START + 10, "b": DAY_START + 20, "c": DAY_START + 30, "d": now_ts})
+    counter = NewUsersCounter(str(tmp_path / "new_users.json"))
+
+    assert counter.count_today(search, now=NOW) == 3
+    assert search.windows == [(DAY_START - 1, now_ts)]
+
+    # 同一秒内不再查询
+    assert counter.count_today(search, now=NOW + timedelta(milliseconds=500)) == 3
+    assert len(search.windows) == 1
+
+    search.created["e"] = now_ts + 5
+    assert counter.count_today(search, now=NOW + timedelta(seconds=10)) == 5
+    assert search.windows[1] == (now_ts - 1, now_ts + 10)
+
+def test_zero_is_a_valid_count(tmp_path):
+    counter = NewUsersCounter(str(tmp_path / "new_users.json"))
+    assert counter.count_today(FakeSearch({}), now=NOW) == 0
+
+def test_failed_query_does_not_advance(tmp_path):
+    """查询失败时返回None，下一次仍从原来的高水位查询"""
+    counter = NewUsersCounter(str(tmp_path / "new_users.json"))
+    search = FakeSearch({"a": DAY_START + 10})
+    assert counter.count_today(search, now=NOW) == 1
+
+    assert counter.count_today(lambda search_filter, cursor: None, now=NOW + timedelta(seconds=60)) is None
+
+    later = NOW + timedelta(seconds=120)
+    assert counter.count_today(search, now=later) == 1
+    assert search.windows[-1] == (int(NOW.timestamp()) - 1, int(later.timestamp()))
+
+def test_resets_on_new_day(tmp_path):
+    counter = NewUsersCounter(str(tmp_path / "new_users.json"))
+    assert counter.count_today(FakeSearch({"a": DAY_START + 10}), now=NOW) == 1
+
+    tomorrow = NOW + timedelta(days=1)
+    search = FakeSearch({"b": DAY_START + 86400 + 5})
+    assert counter.count_today(search, now=tomorrow) == 1
+    assert search.windows == [(DAY_START + 86400 - 1, int(tomorrow.timestamp()))]
+
+def test_unsaved_state_is_not_an_error(tmp_path, monkeypatch):
+    """状态文件无法写入时仍返回本次的计数，不留下临时文件，下次从上一次保存的状态重新查询"""
+    counter = NewUsersCounter(str(tmp_path / "new_users.json"))
+    search = FakeSearch({"a": DAY_START + 10, "b": DAY_START + 20})
+    assert counter.count_today(search, now=NOW) == 2
+
+    def fail_replace(src, dst):
+        raise OSError("read-only file system")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "replace", fail_replace)
+        search.created["c"] = int(NOW.timestamp()) + 5
+        assert counter.count_today(search, now=NOW + timedelta(seconds=10)) == 3
+
+    assert os.listdir(tmp_path) == ["new_users.json"]
+    assert counter.count_today(search, now=NOW + timedelta(seconds=20)) == 3
+    assert search.windows[-1][0] == int(NOW.timestamp()) - 1
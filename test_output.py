@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+原子写入与跳过未变化的输出（dashboard_core.output）测试
+"""
+
+import json
+import os
+
+from dashboard_core.output import write_if_changed
+from dashboard_core.stream import content_hash
+
+def test_write_if_changed_ignores_volatile_fields(tmp_path):
+    """只有lastUpdate变化时保留已有文件；缺少的预压缩文件照样补写"""
+    path = str(tmp_path / "data.json")
+
+    def stable_json(data):
+        return content_hash(json.loads(data)).encode()
+
+    assert write_if_changed(path, b'{"arr": 1, "lastUpdate": "a"}', ("gz",), stable_json)
+    assert not write_if_changed(path, b'{"arr": 1, "lastUpdate": "b"}', ("gz",), stable_json)
+    with open(path, "rb") as f:
+        assert b'"a"' in f.read()
+
+    os.remove(path + ".gz")
+    assert not write_if_changed(path, b'{"arr": 1, "lastUpdate": "c"}', ("gz",), stable_json)
+    assert os.path.exists(path + ".gz")
+
+    assert write_if_changed(path, b'{"arr": 2, "lastUpdate": "d"}', ("gz",), stable_json)
+    with open(path, "rb") as f:
+        assert b'"arr": 2' in f.read()
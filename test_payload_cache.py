@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+/api/data 模块级响应缓存（api/data.py PayloadCache）测试：single-flight、stale-while-revalidate、完整数据保留
+"""
+
+import threading
+import time
+
+from api.data import PayloadCache
+
+def payload(value, status="ok"):
+    return {"totalUsers": value, "sourceStatus": {"customerIO": {"status": status}, "revenueCat": {"status": "ok"}}}
+
+def test_concurrent_misses_fetch_once():
+    """没有缓存时并发请求只触发一次获取，其余请求等待结果"""
+    cache = PayloadCache(ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return payload(1)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(state for _, state in results) == ["hit"] * 4 + ["miss"]
+    assert all(result == payload(1) for result, _ in results)
+    assert cache.stats == {"hits": 4, "misses": 1, "stale": 0}
+
+def test_stale_while_revalidate():
+    """TTL过期后立即返回旧数据，在后台刷新"""
+    cache = PayloadCache(ttl=0.05)
+    values = iter([1, 2])
+    refreshed = threading.Event()
+
+    def fetch():
+        value = next(values)
+        if value == 2:
+            refreshed.set()
+        return payload(value)
+
+    assert cache.get(fetch) == (payload(1), "miss")
+    assert cache.get(fetch) == (payload(1), "hit")
+
+    time.sleep(0.06)
+    assert cache.get(fetch) == (payload(1), "stale")
+    assert refreshed.wait(5)
+    for _ in range(50):
+        result, state = cache.get(fetch)
+        if result == payload(2):
+            break
+        time.sleep(0.01)
+    assert (result, state) == (payload(2), "hit")
+
+def test_failed_fetch_keeps_cached_payload():
+    """获取失败（None）时不覆盖已有数据"""
+    cache = PayloadCache(ttl=0.01)
+    cache.get(lambda: payload(1))
+    time.sleep(0.02)
+    cache._refresh(lambda: None)
+    assert cache.get(lambda: payload(3))[0] == payload(1)
+
+def test_degraded_fetch_retains_complete_payload_for_a_while():
+    """新数据降级时，在retain秒内继续返回上一次完整数据并标记为stale；超过后返回降级数据"""
+    cache = PayloadCache(ttl=0.01, retain=0.2)
+    cache.get(lambda: payload(1))
+
+    time.sleep(0.02)
+    cache._refresh(lambda: payload(0, status="error"))
+    assert cache.get(lambda: payload(0, status="error")) == (payload(1), "stale")
+    assert cache.describe("stale")["degradedSources"] == ["customerIO"]
+
+    time.sleep(0.2)
+    cache._refresh(lambda: payload(0, status="error"))
+    result, _ = cache.get(lambda: payload(0, status="error"))
+    assert result == payload(0, status="error")
+    assert "degradedSources" not in cache.describe("hit")
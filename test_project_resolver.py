@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+RevenueCat项目解析（dashboard_core.project_resolver）测试：缓存TTL、磁盘缓存、环境变量指定项目
+"""
+
+import json
+
+from dashboard_core import project_resolver
+from dashboard_core.project_resolver import ProjectResolver
+
+PROJECTS = [{"id": "proj1", "name": "UnlockLand"}, {"id": "proj2", "name": "UnlockLand 2"}]
+
+class FetchProjects:
+    def __init__(self, projects=PROJECTS):
+        self.projects = projects
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.projects
+
+def test_cached_until_ttl(tmp_path, monkeypatch):
+    """TTL内内存和磁盘缓存都不再请求项目列表，过期后重新获取"""
+    monkeypatch.delenv("REVENUECAT_PROJECT_ID", raising=False)
+    now = [1000.0]
+    monkeypatch.setattr(project_resolver.time, "time", lambda: now[0])
+    cache_path = str(tmp_path / "revenuecat_project.json")
+    fetch = FetchProjects()
+
+    resolver = ProjectResolver(cache_path, ttl=60)
+    assert resolver.resolve_all("token", fetch) == PROJECTS
+    assert resolver.resolve_all("token", fetch) == PROJECTS
+    # 新实例（冷启动）从磁盘读取
+    assert ProjectResolver(cache_path, ttl=60).resolve_all("token", fetch) == PROJECTS
+    assert fetch.calls == 1
+
+    # 其他token分开缓存
+    ProjectResolver(cache_path, ttl=60).resolve_all("other", fetch)
+    assert fetch.calls == 2
+
+    now[0] += 61
+    assert resolver.resolve_all("token", fetch) == PROJECTS
+    assert fetch.calls == 3
+
+def test_failed_fetch_and_invalidate(tmp_path, monkeypatch):
+    monkeypatch.delenv("REVENUECAT_PROJECT_ID", raising=False)
+    resolver = ProjectResolver(str(tmp_path / "revenuecat_project.json"))
+    assert resolver.resolve_all("token", FetchProjects(None)) is None
+
+    fetch = FetchProjects()
+    resolver.resolve_all("token", fetch)
+    resolver.invalidate("token")
+    resolver.resolve_all("token", fetch)
+    assert fetch.calls == 2
+
+def test_legacy_cache_is_ignored(tmp_path, monkeypatch):
+    """旧版本没有解析时间的缓存视为未命中"""
+    monkeypatch.delenv("REVENUECAT_PROJECT_ID", raising=False)
+    cache_path = tmp_path / "revenuecat_project.json"
+    cache_path.write_text(json.dumps({ProjectResolver.fingerprint("token"): {"id": "old", "name": "Old"}}))
+    fetch = FetchProjects()
+
+    assert ProjectResolver(str(cache_path)).resolve_all("token", fetch) == PROJECTS
+    assert fetch.calls == 1
+
+def test_configured_projects_override(tmp_path, monkeypatch):
+    """REVENUECAT_PROJECT_ID优先于缓存，不请求项目列表"""
+    fetch = FetchProjects()
+    monkeypatch.setenv("REVENUECAT_PROJECT_ID", "projA")
+    monkeypatch.setenv("REVENUECAT_PROJECT_NAME", "Main")
+    resolver = ProjectResolver(str(tmp_path / "revenuecat_project.json"))
+    assert resolver.resolve_all("token", fetch) == [{"id": "projA", "name": "Main"}]
+
+    monkeypatch.setenv("REVENUECAT_PROJECT_ID", "projA, projB")
+    assert resolver.resolve_all("token", fetch) == [{"id": "projA", "name": "projA"}, {"id": "projB", "name": "projB"}]
+    assert fetch.calls == 0
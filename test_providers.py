@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+数据源（dashboard_core.providers）针对本地桩服务（bench/stub_server.py）的测试：
+多个workspace / API token合并、RevenueCat项目列表翻页（MAX_PROJECT_PAGES）
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(ROOT_DIR, "bench")
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from stub_server import StubUpstream, start_stub
+
+from dashboard_core import providers
+from dashboard_core.fetch import Fetcher
+from dashboard_core.project_resolver import ProjectResolver
+from dashboard_core.snapshot import SOURCE_API_FAILED, CustomerIOData, merge_customer_io
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.delenv("REVENUECAT_PROJECT_ID", raising=False)
+    upstream = StubUpstream(segment_count=3, project_count=5, project_page_size=2)
+    server = start_stub(upstream)
+    upstream.base_url = f"http://127.0.0.1:{server.server_port}"
+    yield upstream
+    server.shutdown()
+    server.server_close()
+
+def test_parse_credentials():
+    assert providers.parse_credentials("key") == [("default", "key")]
+    assert providers.parse_credentials("eu=k1, us=k2") == [("eu", "k1"), ("us", "k2")]
+    assert providers.parse_credentials("k1,k2") == [("default", "k1"), ("default2", "k2")]
+    assert providers.parse_credentials(None) == []
+
+def test_customer_io_workspaces_are_summed(stub):
+    """每个workspace各自请求（凭据不同不复用），总用户数相加，明细保留workspace名称"""
+    base_url = stub.base_url + "/v1"
+    single = providers.build_customer_io("k1", base_url=base_url).collect(Fetcher())
+    stub.reset_calls()
+
+    merged = providers.build_customer_io("eu=k1,us=k2", base_url=base_url).collect(Fetcher())
+
+    assert not merged.failed
+    assert merged.total_customers == 2 * single.total_customers
+    assert [part.workspace for part in merged.breakdown] == ["eu", "us"]
+    assert stub.calls["/v1/segments"] == 2
+
+def test_failed_workspace_fails_the_merge():
+    """任一workspace失败时整体按失败处理，不返回偏小的总数"""
+    ok = CustomerIOData(total_customers=100, new_customers_today=None, source="customer_io_real_data")
+    merged = merge_customer_io([ok, CustomerIOData.fallback(SOURCE_API_FAILED)])
+    assert merged.failed
+    assert len(merged.breakdown) == 2
+
+def test_revenuecat_projects_are_paginated_and_summed(stub):
+    """/v2/projects按next_page翻页，所有项目的指标相加"""
+    base_url = stub.base_url + "/v2"
+    merged = providers.build_revenuecat("token", ProjectResolver(), base_url=base_url).collect(Fetcher())
+
+    assert not merged.failed
+    assert len(merged.breakdown) == 5
+    assert merged.active_subscriptions == sum(project.active_subscriptions for project in merged.breakdown)
+    assert merged.mrr == pytest.approx(5 * merged.breakdown[0].mrr)
+    assert stub.calls["/v2/projects"] == 3
+    assert stub.calls["/v2/projects/{id}/metrics/overview"] == 5
+
+def test_project_pages_are_capped(stub, monkeypatch):
+    """项目列表超过MAX_PROJECT_PAGES页时只使用前几页"""
+    monkeypatch.setattr(providers, "MAX_PROJECT_PAGES", 2)
+    provider = providers.RevenueCatProvider("token", ProjectResolver(), base_url=stub.base_url + "/v2")
+
+    projects = provider.list_projects(Fetcher())
+
+    assert [project["id"] for project in projects][1:] == ["proj2", "proj3", "proj4"]
+    assert stub.calls["/v2/projects"] == 2
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+本地持久化响应缓存（dashboard_core.response_cache）测试：TTL、按凭据分开、ETag条件请求与304复用
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from dashboard_core.fetch import Fetcher
+from dashboard_core.response_cache import ResponseCache
+
+class ETagUpstream:
+    """返回带ETag的JSON，If-None-Match匹配时返回304"""
+
+    def __init__(self):
+        self.body = {"segments": [{"id": 1}]}
+        self.etag = '"v1"'
+        self.requests = []
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                upstream.requests.append(self.headers.get("If-None-Match"))
+                if self.headers.get("If-None-Match") == upstream.etag:
+                    self.send_response(304)
+                    self.send_header("ETag", upstream.etag)
+                    self.end_headers()
+                    return
+                body = json.dumps(upstream.body).encode()
+                self.send_response(200)
+                self.send_header("ETag", upstream.etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/customers/attributes"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "responses.sqlite"), ttls=[(r"/v1/segments$", 3600)])
+
+def test_ttl_and_credentials(cache):
+    """TTL内为新鲜数据，没有TTL的endpoint只保存校验信息；不同API密钥的响应互不混用"""
+    segments_url = "https://api.customer.io/v1/segments"
+    headers = {"Authorization": "Bearer a"}
+    cache.store(segments_url, headers, {"segments": []})
+
+    assert cache.lookup(segments_url, headers).fresh
+    assert cache.lookup(segments_url, {"Authorization": "Bearer b"}) is None
+
+    other_url = "https://api.customer.io/v1/segments/1/customer_count"
+    assert not cache.should_store(other_url, None, None)
+    assert cache.should_store(other_url, '"e"', None)
+    cache.store(other_url, headers, {"count": 1}, etag='"e"', last_modified="Sat, 17 Oct 2026 00:00:00 GMT")
+    cached = cache.lookup(other_url, headers)
+    assert not cached.fresh
+    assert cache.conditional_headers(cached) == {
+        "If-None-Match": '"e"', "If-Modified-Since": "Sat, 17 Oct 2026 00:00:00 GMT"
+    }
+
+def test_etag_revalidation(cache):
+    """过期后带If-None-Match重新请求，304时复用本地数据；内容变化时更新缓存"""
+    upstream = ETagUpstream()
+    headers = {"Authorization": "Bearer a"}
+    try:
+        first = Fetcher(response_cache=cache).get("test_etag", upstream.url, headers)
+        second = Fetcher(response_cache=cache).get("test_etag", upstream.url, headers)
+        assert first == second == upstream.body
+        assert upstream.requests == [None, '"v1"']
+        assert cache.stats == {"hits": 0, "revalidated": 1, "misses": 1}
+
+        upstream.body, upstream.etag = {"segments": [{"id": 2}]}, '"v2"'
+        assert Fetcher(response_cache=cache).get("test_etag", upstream.url, headers) == upstream.body
+        assert cache.lookup(upstream.url, headers).etag == '"v2"'
+        assert cache.stats["misses"] == 2
+    finally:
+        upstream.close()
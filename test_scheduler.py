@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+限速重试（dashboard_core.scheduler）测试
+429只是限流，不计入熔断失败；重试的请求只按最终结果记录一次
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dashboard_core import breaker, scheduler
+
+class ScriptedUpstream:
+    """按顺序返回预设状态码的本地上游，预设用完后返回200"""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                upstream.calls += 1
+                status = upstream.statuses.pop(0) if upstream.statuses else 200
+                self.send_response(status)
+                if status != 200:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def close(self):
+        self.server.shutdown()
+
+def scripted_request(provider, statuses):
+    """返回 (最终状态码, 上游收到的请求数)"""
+    upstream = ScriptedUpstream(statuses)
+    try:
+        response = scheduler.request(provider, "GET", upstream.url, deadline=time.monotonic() + 10)
+        return response.status_code, upstream.calls
+    finally:
+        upstream.close()
+
+def test_rate_limited_retries_keep_breaker_closed():
+    """连续429后成功：按Retry-After重试，熔断器保持关闭"""
+    status, calls = scripted_request("test_429_then_ok", [429, 429, 429])
+
+    assert (status, calls) == (200, 4)
+    assert breaker.get_breaker("test_429_then_ok").describe()["failures"] == 0
+    assert scheduler.stats.snapshot()["test_429_then_ok"]["rateLimited"] == 3
+
+def test_exhausted_rate_limit_is_not_a_failure():
+    """重试用尽仍是429时返回429，不计入熔断失败"""
+    status, calls = scripted_request("test_429_exhausted", [429] * (scheduler.MAX_RETRIES + 1))
+
+    assert (status, calls) == (429, scheduler.MAX_RETRIES + 1)
+    circuit = breaker.get_breaker("test_429_exhausted")
+    assert circuit.state == breaker.CLOSED
+    assert circuit.describe()["failures"] == 0
+
+def test_retried_server_error_counts_once():
+    """重试用尽的5xx请求只计一次失败"""
+    status, calls = scripted_request("test_503", [503] * (scheduler.MAX_RETRIES + 1))
+
+    assert (status, calls) == (503, scheduler.MAX_RETRIES + 1)
+    assert breaker.get_breaker("test_503").describe()["failures"] == 1
+
+def test_rate_limit_status_is_not_a_failure():
+    """按最终状态码记录：429与其他4xx一样不计入失败，5xx计入"""
+    circuit = breaker.CircuitBreaker("test_statuses", failure_threshold=2)
+
+    for status in (429, 429, 404, 429):
+        breaker.record_status(circuit, status)
+    assert circuit.describe()["failures"] == 0
+
+    breaker.record_status(circuit, 503)
+    breaker.record_status(circuit, 502)
+    assert circuit.state == breaker.OPEN
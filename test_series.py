@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+delta-v1序列格式（dashboard_core.series）编码/解码往返测试
+解码方式与index.html中的DataView解码相同
+"""
+
+import base64
+import sys
+from array import array
+
+from dashboard_core import series
+
+TYPECODES = {name: typecode for name, typecode, _, _ in series.INT_TYPES + series.UINT_TYPES}
+
+def unpack(encoded, typecode):
+    values = array(typecode)
+    values.frombytes(base64.b64decode(encoded))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return list(values)
+
+def undelta(base, deltas):
+    values = [base]
+    for delta in deltas:
+        values.append(values[-1] + delta)
+    return values
+
+def decode(payload):
+    """返回 (时间戳列表, {指标: 值列表})"""
+    assert payload["format"] == series.FORMAT
+    timestamps = payload["timestamps"]
+    timeline = undelta(timestamps["base"], unpack(timestamps["deltas"], TYPECODES[timestamps["type"]]))
+    assert len(timeline) == payload["count"]
+
+    decoded = {}
+    for metric, column in payload["series"].items():
+        if column["encoding"] == "float64":
+            decoded[metric] = unpack(column["values"], "d")
+        else:
+            ints = undelta(column["base"], unpack(column["deltas"], TYPECODES[column["type"]]))
+            decoded[metric] = [value / column["scale"] for value in ints]
+    return timeline, decoded
+
+def test_round_trip_shared_timeline():
+    """计数按整数、金额按分编码，无法精确换算的值用float64"""
+    timeline = [1700000000 + 300 * i for i in range(50)] + [1700100000]
+    points = {
+        "totalUsers": [(ts, 120000 + 7 * i) for i, ts in enumerate(timeline)],
+        "arr": [(ts, 141648.25 + 0.5 * i) for i, ts in enumerate(timeline)],
+        "mrr": [(ts, 11804.0 + i / 3) for i, ts in enumerate(timeline)],
+        "activeTrials": [(ts, 40 + (i % 3) * 40000) for i, ts in enumerate(timeline)]
+    }
+
+    payload = series.encode_series(points)
+    decoded_timeline, decoded = decode(payload)
+
+    assert payload["timestamps"]["type"] == "uint32"
+    assert payload["series"]["totalUsers"]["type"] == "int8"
+    assert payload["series"]["arr"]["scale"] == 100
+    assert payload["series"]["mrr"]["encoding"] == "float64"
+    assert payload["series"]["activeTrials"]["type"] == "int32"
+    assert decoded_timeline == timeline
+    for metric, metric_points in points.items():
+        assert decoded[metric] == [value for _, value in metric_points], metric
+
+def test_round_trip_misaligned_timelines():
+    """缺少的点沿用前一个值，第一个点缺失时沿用该指标的第一个值"""
+    points = {
+        "totalUsers": [(100, 1), (200, 2), (300, 3)],
+        "arr": [(200, 10.5), (400, 11.0)]
+    }
+
+    timeline, decoded = decode(series.encode_series(points))
+
+    assert timeline == [100, 200, 300, 400]
+    assert decoded == {"totalUsers": [1, 2, 3, 3], "arr": [10.5, 10.5, 10.5, 11.0]}
+
+def test_empty_metrics_are_omitted():
+    payload = series.encode_series({"totalUsers": [(100, 5)], "arr": []})
+
+    assert list(payload["series"]) == ["totalUsers"]
+    assert decode(payload) == ([100], {"totalUsers": [5]})
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+update.generate_dashboard() 针对本地桩服务（bench/stub_server.py）的端到端测试
+update.py在导入时读取环境变量，每个测试在独立的子进程中运行（与bench/run.py相同）
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(ROOT_DIR, "bench")
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from stub_server import StubUpstream, start_stub
+
+OUTPUTS = ("dashboard.html", "data.json")
+
+# 子进程：连续运行两次generate_dashboard，每次输出一行JSON（桩服务收到的请求数、Fetcher的请求数、输出文件的修改时间）
+CHILD = """
+import json, logging, os, sys, time, urllib.request
+sys.path.insert(0, sys.argv[1])
+os.chdir(sys.argv[2])
+import update
+logging.getLogger().handlers = [logging.NullHandler()]
+stub_url = os.environ["STUB_URL"]
+for run in range(2):
+    if run:
+        # 今日新用户按秒级高水位增量查询，同一秒内的第二次运行不会再查询
+        time.sleep(1.1)
+    urllib.request.urlopen(stub_url + "/__stub/reset").read()
+    snapshot = update.generate_dashboard()
+    calls = json.load(urllib.request.urlopen(stub_url + "/__stub/calls"))["calls"]
+    mtimes = {name: os.stat(name).st_mtime_ns for name in %r}
+    print(json.dumps({"calls": calls, "requestCounts": dict(snapshot.request_counts), "mtimes": mtimes}))
+""" % (OUTPUTS,)
+
+def run_generate_dashboard_twice(segment_count=9):
+    """返回两次运行的结果"""
+    server = start_stub(StubUpstream(segment_count))
+    work_dir = tempfile.mkdtemp()
+    try:
+        shutil.copy(os.path.join(ROOT_DIR, "template.html"), work_dir)
+        stub_url = f"http://127.0.0.1:{server.server_port}"
+        env = dict(
+            os.environ,
+            STUB_URL=stub_url,
+            CUSTOMER_IO_API_BASE=f"{stub_url}/v1",
+            REVENUECAT_API_BASE=f"{stub_url}/v2",
+            CUSTOMER_IO_APP_API_KEY="test-customer-io-key",
+            REVENUECAT_TOKEN="test-revenuecat-token",
+            DASHBOARD_CACHE_DIR=os.path.join(work_dir, ".cache"),
+            REVENUECAT_PROJECT_CACHE=os.path.join(work_dir, "revenuecat_project.json"),
+            DASHBOARD_HISTORY="false",
+            RESPONSE_CACHE="true",
+            DASHBOARD_VARIANTS="tv",
+            UPSTREAM_RATE_LIMITS=json.dumps({"customer_io": {"rate": 1000000, "burst": 1000000},
+                                             "revenuecat": {"rate": 1000000, "burst": 1000000}})
+        )
+        result = subprocess.run([sys.executable, "-c", CHILD, ROOT_DIR, work_dir], env=env,
+                                capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        return [json.loads(line) for line in result.stdout.splitlines() if line.startswith("{")]
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_generate_dashboard_upstream_calls():
+    """第一次运行每个资源只请求一次；第二次运行segment列表和项目列表来自缓存，输出内容不变时不重写文件"""
+    first, cached = run_generate_dashboard_twice(segment_count=9)
+
+    assert first["calls"] == {
+        "/v1/segments": 1,
+        "/v1/segments/{id}/customer_count": 9,
+        "/v1/customers": 1,
+        "/v2/projects": 1,
+        "/v2/projects/{id}/metrics/overview": 1
+    }
+    assert first["requestCounts"] == {"customer_io": 11, "revenuecat": 2}
+
+    # segment列表（响应缓存）和项目列表（项目缓存）不再请求
+    assert cached["calls"] == {
+        "/v1/segments/{id}/customer_count": 9,
+        "/v1/customers": 1,
+        "/v2/projects/{id}/metrics/overview": 1
+    }
+    assert cached["requestCounts"] == {"customer_io": 10, "revenuecat": 1}
+
+    # 只有更新时间变化，不重写输出文件
+    assert cached["mtimes"] == first["mtimes"]
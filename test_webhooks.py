@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+RevenueCat webhook验证、事件计数器与检查点叠加（dashboard_core.webhooks）测试
+事件样例为RevenueCat文档中录制的webhook请求体（bench/fixtures/revenuecat_webhook_initial_purchase.json）
+"""
+
+import io
+import json
+import os
+
+import pytest
+
+from dashboard_core import webhooks
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench", "fixtures",
+                       "revenuecat_webhook_initial_purchase.json")
+CHECKPOINT = "2026-10-18T12:00:00+00:00"
+
+def recorded(event_id=None, **fields):
+    """录制的INITIAL_PURCHASE请求体，可覆盖事件字段"""
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    event = document["event"]
+    if event_id is not None:
+        event["id"] = event_id
+    event.update(fields)
+    return document
+
+def polled_payload(status="ok"):
+    """一次轮询的/api/data响应（只包含叠加用到的字段）"""
+    return {
+        "totalUsers": 1000,
+        "arr": 12000.0,
+        "mrr": 1000.0,
+        "activeSubscriptions": 100,
+        "activeTrials": 10,
+        "lastUpdate": CHECKPOINT,
+        "sourceStatus": {"customerIO": {"status": "ok"}, "revenueCat": {"status": status}}
+    }
+
+@pytest.fixture
+def state(tmp_path):
+    webhook_state = webhooks.WebhookState(str(tmp_path / "webhooks.sqlite"))
+    yield webhook_state
+    webhook_state.close()
+
+def test_verify_revenuecat():
+    assert webhooks.verify_revenuecat("Bearer secret", "secret")
+    assert webhooks.verify_revenuecat("secret", "Bearer secret")
+    assert not webhooks.verify_revenuecat("Bearer wrong", "secret")
+    assert not webhooks.verify_revenuecat(None, "secret")
+    assert not webhooks.verify_revenuecat("Bearer ", "")
+
+def test_parse_recorded_initial_purchase():
+    """录制的事件：7天周期、2.49美元，按每月天数换算MRR"""
+    event = webhooks.parse_revenuecat(recorded())
+
+    assert event.event_id == "UniqueIdentifierOfEvent"
+    assert event.event_type == "INITIAL_PURCHASE"
+    assert event.occurred_at == 1591121855.319
+    assert event.subscription_id == "1530648507000"
+    days = (1591726653000 - 1591121853000) / 86400000
+    assert dict(event.deltas) == {"activeSubscriptions": 1, "mrr": pytest.approx(2.49 * webhooks.DAYS_PER_MONTH / days)}
+
+    assert dict(webhooks.parse_revenuecat(recorded(period_type="TRIAL", price=0)).deltas) == {"activeTrials": 1}
+    assert dict(webhooks.parse_revenuecat(recorded(environment="SANDBOX")).deltas) == {}
+    assert dict(webhooks.parse_revenuecat(recorded(type="CANCELLATION")).deltas) == {}
+    with pytest.raises(ValueError):
+        webhooks.parse_revenuecat({"api_version": "1.0", "event": {"type": "INITIAL_PURCHASE"}})
+
+def test_events_are_applied_once(state):
+    event = webhooks.parse_revenuecat(recorded())
+    assert state.apply(event)
+    assert not state.apply(event)
+    assert state.counters()["activeSubscriptions"] == 1
+    assert state.counters()[webhooks.EVENTS_COUNTER] == 1
+
+def test_overlay_since_checkpoint(state):
+    """检查点之后的事件叠加到轮询结果上，到期事件没有价格时按购买时的MRR减少"""
+    # 检查点之前的事件已经包含在轮询结果中
+    state.apply(webhooks.parse_revenuecat(recorded("before")))
+    assert state.overlay(CHECKPOINT) is None
+    state.checkpoint(CHECKPOINT)
+    assert state.overlay(CHECKPOINT) == {}
+
+    purchase = webhooks.parse_revenuecat(recorded("r1", original_transaction_id="t1"))
+    state.apply(purchase)
+    state.apply(webhooks.parse_revenuecat(recorded("r2", period_type="TRIAL", price=0, original_transaction_id="t2")))
+
+    result = webhooks.apply_overlay(polled_payload(), state.overlay(CHECKPOINT))
+    assert result["totalUsers"] == 1000
+    assert result["activeSubscriptions"] == 101
+    assert result["activeTrials"] == 11
+    assert result["mrr"] == round(1000.0 + purchase.deltas["mrr"], 2)
+    assert result["arr"] == round(12000.0 + purchase.deltas["mrr"] * 12, 2)
+    assert result["webhooks"] == {"eventsSinceReconcile": 2}
+
+    expiration = recorded("r3", type="EXPIRATION", original_transaction_id="t1")
+    del expiration["event"]["price"]
+    state.apply(webhooks.parse_revenuecat(expiration))
+    result = webhooks.apply_overlay(polled_payload(), state.overlay(CHECKPOINT))
+    assert result["activeSubscriptions"] == 100
+    assert result["mrr"] == 1000.0
+    assert result["arr"] == 12000.0
+
+    # 新的轮询结果已经包含这些事件
+    state.checkpoint("next")
+    assert state.overlay("next") == {}
+
+def test_overlay_skips_failed_source():
+    """RevenueCat轮询失败时payload中是备用数据，不叠加"""
+    overlay = {"activeSubscriptions": 2, "mrr": 50.0, webhooks.EVENTS_COUNTER: 5}
+
+    result = webhooks.apply_overlay(polled_payload(status="error"), overlay)
+
+    assert {key: result[key] for key in ("activeSubscriptions", "mrr")} == {"activeSubscriptions": 100, "mrr": 1000.0}
+    assert result["webhooks"] == {"eventsSinceReconcile": 5}
+
+def request(document, authorization="Bearer secret"):
+    body = json.dumps(document).encode() if not isinstance(document, bytes) else document
+    headers = {"Content-Length": str(len(body))}
+    if authorization:
+        headers["Authorization"] = authorization
+    return headers, io.BytesIO(body)
+
+def test_handle_revenuecat(state):
+    status, data = webhooks.handle_revenuecat(*request(recorded()), "secret", state)
+    assert (status, data) == (200, {"ok": True, "type": "INITIAL_PURCHASE", "duplicate": False})
+    assert webhooks.handle_revenuecat(*request(recorded()), "secret", state)[1]["duplicate"]
+
+    assert webhooks.handle_revenuecat(*request(recorded(), "Bearer wrong"), "secret", state)[0] == 401
+    assert webhooks.handle_revenuecat(*request(b"{not json"), "secret", state)[0] == 400
+    assert webhooks.handle_revenuecat(*request({"event": {}}), "secret", state)[0] == 400
+
+    headers, body = request(recorded())
+    headers["Content-Length"] = str(webhooks.MAX_BODY_BYTES + 1)
+    assert webhooks.handle_revenuecat(headers, body, "secret", state)[0] == 413
+
+def test_handle_revenuecat_requires_shared_state(caplog):
+    """没有配置计数器文件时返回503（RevenueCat会重试）并记录错误，而不是写入本实例的临时文件"""
+    status, data = webhooks.handle_revenuecat(*request(recorded()), "secret", None)
+    assert (status, data) == (503, {"error": "WEBHOOK_STATE_PATH not configured"})
+    assert "WEBHOOK_STATE_PATH" in caplog.text
+
+    assert webhooks.handle_revenuecat(*request(recorded()), "", None)[0] == 503
@@ -1,10 +1,36 @@
-import requests
+import argparse
+import asyncio
 from datetime import datetime, timedelta, timezone
 import json
 import logging
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from typing import Dict, Any, Optional
 
+from dashboard_core import breaker, scheduler, transport
+from dashboard_core.fetch import Fetcher
+from dashboard_core.forecast import Forecast, ForecastModel
+from dashboard_core.formatting import format_count, format_number
+from dashboard_core.metrics import registry as upstream_metrics
+from dashboard_core.history import HistoryStore
+from dashboard_core.project_resolver import ProjectResolver
+from dashboard_core.output import write_if_changed
+from dashboard_core.precomputed import write_snapshot
+from dashboard_core.providers import build_customer_io, build_revenuecat
+from dashboard_core.response_cache import ResponseCache
+from dashboard_core.stream import content_hash
+from dashboard_core.snapshot import (
+    SOURCE_API_ERROR, SOURCE_API_FAILED, SOURCE_CIRCUIT_OPEN, SOURCE_CUSTOMER_IO, SOURCE_CUSTOMER_IO_SEGMENT_FALLBACK,
+    SOURCE_DEADLINE_EXCEEDED, SOURCE_NO_API_KEY, SOURCE_REVENUECAT, SOURCE_REVENUECAT_ESTIMATE,
+    CustomerIOData, DashboardSnapshot, RevenueCatData
+)
+from dashboard_core.templating import embed_json, load_template
+from dashboard_core.webhooks import RECONCILE_INTERVAL, WebhookState
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -25,691 +51,232 @@ class Config:
         
         # RevenueCat项目信息 (动态获取)
         
-        # API端点
-        self.customer_io_app_base = "https://api.customer.io/v1"
-        self.revenuecat_v2_base = "https://api.revenuecat.com/v2"
-        self.revenuecat_v1_base = "https://api.revenuecat.com/v1"
+        # Customer.io segment人数并发获取
+        self.customer_io_segment_concurrency = max(1, int(os.getenv('CUSTOMER_IO_SEGMENT_CONCURRENCY', '8')))
+        self.customer_io_segment_timeout = float(os.getenv('CUSTOMER_IO_SEGMENT_TIMEOUT', '10'))
+        # 今日新用户增量查询每页客户数
+        self.customer_io_search_page_size = int(os.getenv('CUSTOMER_IO_SEARCH_PAGE_SIZE', '100'))
+        # 只获取参与总数计算的邮箱segment（会关闭"最大segment"备用方案）
+        self.customer_io_email_segments_only = os.getenv('CUSTOMER_IO_EMAIL_SEGMENTS_ONLY', 'false').lower() in ('1', 'true', 'yes')
+        
+        # API端点（基准测试时指向本地桩服务）
+        self.customer_io_app_base = os.getenv('CUSTOMER_IO_API_BASE', "https://api.customer.io/v1")
+        self.revenuecat_v2_base = os.getenv('REVENUECAT_API_BASE', "https://api.revenuecat.com/v2")
+        
+        # 本地缓存目录及响应缓存开关
+        self.cache_dir = os.getenv('DASHBOARD_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+        self.response_cache_enabled = os.getenv('RESPONSE_CACHE', 'true').lower() in ('1', 'true', 'yes')
+        
+        # 指标历史数据库（/api/history读取）
+        self.history_path = os.getenv('DASHBOARD_HISTORY_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.sqlite'))
+        self.history_enabled = os.getenv('DASHBOARD_HISTORY', 'true').lower() in ('1', 'true', 'yes')
+        
+        # 预计算快照文件（update.py --precompute写入，/api/data优先读取）
+        self.precomputed_path = os.getenv('PRECOMPUTED_SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'precomputed.json'))
+        
+        # RevenueCat webhook摄取：事件计数器与/api/data和webhook端点共用（必须显式配置共享的WEBHOOK_STATE_PATH），
+        # 启用后完整轮询只用于校正，间隔放慢到WEBHOOK_RECONCILE_INTERVAL
+        self.webhook_secret_configured = bool(os.getenv('REVENUECAT_WEBHOOK_SECRET'))
+        self.webhook_state_path = os.getenv('WEBHOOK_STATE_PATH')
+        self.webhooks_enabled = self.webhook_secret_configured and bool(self.webhook_state_path)
+        
+        # 每次生成的页面版本（见DASHBOARD_VARIANTS），逗号分隔
+        self.dashboard_variants = [name.strip() for name in os.getenv('DASHBOARD_VARIANTS', 'tv').split(',') if name.strip()]
+        
+        # 额外生成的预压缩文件（gz、br），逗号分隔，默认不生成
+        self.precompress = [name.strip() for name in os.getenv('DASHBOARD_PRECOMPRESS', '').split(',') if name.strip()]
 
 config = Config()
 
-# ============ API客户端类 =============
-class APIClient:
-    """统一的API客户端类"""
-    
-    @staticmethod
-    def make_request(url: str, headers: Dict[str, str], method: str = "GET", data: Optional[Dict] = None) -> Optional[Dict]:
-        """统一的API请求方法"""
-        try:
-            logger.info(f"🔍 请求: {method} {url}")
-            
-            if method == "GET":
-                response = requests.get(url, headers=headers, timeout=30)
-            else:
-                response = requests.post(url, headers=headers, json=data, timeout=30)
-            
-            logger.info(f"📊 响应状态: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"✅ 成功获取数据")
-                return data
-            else:
-                logger.error(f"❌ API错误 {response.status_code}: {response.text}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"❌ 请求异常: {e}")
-            return None
+# RevenueCat项目ID只解析一次（内存 + 磁盘缓存，可用REVENUECAT_PROJECT_ID直接指定）
+project_resolver = ProjectResolver(os.path.join(config.cache_dir, 'revenuecat_project.json'))
+
+# 按日拟合的预测（今日新用户估算、月底ARR），读取指标历史，拟合结果缓存在cache目录
+forecast_model = ForecastModel(config.history_path, os.path.join(config.cache_dir, 'forecast.json'))
+
+def get_forecast() -> Optional[Forecast]:
+    """今天的预测，未记录指标历史时不预测"""
+    return forecast_model.get() if config.history_enabled else None
+
+# ============ 数据源 =============
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """本地响应缓存（首次使用时打开）"""
+    global _response_cache
+    if config.response_cache_enabled and _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(os.path.join(config.cache_dir, 'responses.sqlite'))
+    return _response_cache
 
-# ============ Customer.io真实数据获取 =============
-def get_customer_io_real_data() -> Dict[str, Any]:
+def make_fetcher() -> Fetcher:
+    """一次采集使用的上游请求入口（每个GET资源只请求一次，经过本地响应缓存）"""
+    return Fetcher(response_cache=get_response_cache())
+
+# CUSTOMER_IO_APP_API_KEY / REVENUECAT_TOKEN 可配置多个（name=key,name2=key2），并发获取后合并
+# 每个workspace各自做今日新用户增量计数（记录创建时间高水位，UTC日切换时重置）
+customer_io_provider = build_customer_io(
+    config.customer_io_app_api_key,
+    new_users_state_dir=config.cache_dir,
+    base_url=config.customer_io_app_base,
+    segment_concurrency=config.customer_io_segment_concurrency,
+    segment_timeout=config.customer_io_segment_timeout,
+    email_segments_only=config.customer_io_email_segments_only,
+    search_page_size=config.customer_io_search_page_size
+)
+
+revenuecat_provider = build_revenuecat(
+    config.revenuecat_token,
+    project_resolver,
+    base_url=config.revenuecat_v2_base,
+    project_estimate=True
+)
+
+def get_customer_io_real_data(fetcher: Optional[Fetcher] = None) -> CustomerIOData:
     """获取Customer.io真实用户数据"""
     logger.info("👥 获取Customer.io真实数据...")
-    
     if not config.customer_io_app_api_key:
         logger.warning("⚠️ 缺少Customer.io App API密钥，无法获取真实数据")
-        logger.info("💡 请按照以下步骤获取App API密钥：")
-        logger.info("   1. 登录 https://customer.io")
-        logger.info("   2. 导航到 Account Settings → API Credentials")
-        logger.info("   3. 点击 'Create App API Key'")
-        logger.info("   4. 设置环境变量: export CUSTOMER_IO_APP_API_KEY='你的密钥'")
-        return {
-            "total_customers": 0,  # 没有API密钥时不虚构数据
-            "new_customers_today": 0,  # 没有API密钥时不虚构数据
-            "source": "no_api_key_configured"
-        }
-    
-    headers = {
-        "Authorization": f"Bearer {config.customer_io_app_api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    # 尝试使用Customer.io Segments获取真实用户数据
-    segments_url = f"{config.customer_io_app_base}/segments"
-    segments_data = APIClient.make_request(segments_url, headers)
-    
-    if segments_data and segments_data.get('segments'):
-        # 查看是否有"All Customers"或类似的segment
-        logger.info(f"📊 找到 {len(segments_data['segments'])} 个segments")
-        
-        # 收集所有segment数据并智能计算真实总用户数
-        email_segments = {'valid': 0, 'invalid': 0}
-        all_segments = []
-        
-        for segment in segments_data.get('segments', []):
-            segment_name = segment.get('name', '').lower()
-            segment_id = segment.get('id')
-            
-            # 尝试获取这个segment的用户数量
-            count_url = f"{config.customer_io_app_base}/segments/{segment_id}/customer_count"
-            count_data = APIClient.make_request(count_url, headers)
-            
-            if count_data and count_data.get('count') is not None:
-                current_count = count_data.get('count')
-                logger.info(f"📈 Segment '{segment.get('name')}': {current_count} 用户")
-                
-                all_segments.append({
-                    'name': segment.get('name'),
-                    'id': segment_id,
-                    'count': current_count
-                })
-                
-                # 专门处理邮箱相关的segment (最准确的总数)
-                if segment_name == 'valid email address':
-                    email_segments['valid'] = current_count
-                elif segment_name == 'invalid email address':
-                    email_segments['invalid'] = current_count
-        
-        # 计算真实总用户数
-        if email_segments['valid'] > 0 or email_segments['invalid'] > 0:
-            # 最准确的方法：有效邮箱 + 无效邮箱 = 所有用户
-            total_users = email_segments['valid'] + email_segments['invalid']
-            logger.info(f"🎯 计算真实总用户数:")
-            logger.info(f"   有效邮箱用户: {email_segments['valid']}")
-            logger.info(f"   无效邮箱用户: {email_segments['invalid']}")
-            logger.info(f"   真实总用户数: {total_users}")
-            
-            # 🆕 尝试获取真实的今日新用户数据
-            real_new_users_today = get_real_new_users_today(headers)
-            
-            if real_new_users_today is not None:
-                logger.info(f"✅ 获取到真实今日新用户: {real_new_users_today}")
-                return {
-                    "total_customers": total_users,
-                    "new_customers_today": real_new_users_today,
-                    "source": "customer_io_real_total_and_real_new_users"
-                }
-            else:
-                # 🎯 尝试使用RevenueCat的"New Customers"数据计算今日新用户
-                logger.info("🔍 尝试基于RevenueCat数据计算今日新用户...")
-                rc_new_users_today = get_new_users_from_revenuecat()
-                
-                if rc_new_users_today is not None:
-                    logger.info(f"✅ 基于RevenueCat数据获取今日新用户: {rc_new_users_today}")
-                    return {
-                        "total_customers": total_users,
-                        "new_customers_today": rc_new_users_today,
-                        "source": "customer_io_real_total_revenuecat_new_users"
-                    }
-                else:
-                    # 最后备用方案：智能估算
-                    estimated_new_users_today = estimate_daily_new_users(total_users)
-                    logger.info(f"📊 最终备用智能估算今日新用户: {estimated_new_users_today}")
-                    
-                    return {
-                        "total_customers": total_users,
-                        "new_customers_today": estimated_new_users_today,
-                        "source": "customer_io_real_total_estimated_new_users"
-                    }
-        
-        # 备用方法：选择最大的segment
-        elif all_segments:
-            largest_segment = max(all_segments, key=lambda x: x['count'])
-            if largest_segment['count'] > 0:
-                logger.info(f"🎯 备用方法 - 最大segment: {largest_segment['name']} 包含 {largest_segment['count']} 用户")
-                
-                total_users = largest_segment['count']
-                estimated_new_users_today = estimate_daily_new_users(total_users)
-                
-                return {
-                    "total_customers": total_users,
-                    "new_customers_today": estimated_new_users_today,
-                    "source": "customer_io_segment_fallback"
-                }
-    
-    # 如果所有方法都失败，返回诚实的零值
-    logger.warning("⚠️ 无法从Customer.io获取任何用户数据")
-    return {
-        "total_customers": 11000,
-        "new_customers_today": 22,
-        "source": "api_call_failed"
-    }
-
-def get_real_new_users_today(headers: Dict[str, str]) -> Optional[int]:
-    """
-    尝试从Customer.io App API获取真实的今日新用户数据
-    参考文档: https://docs.customer.io/integrations/api/app/#section/Overview
-    """
-    logger.info("🔍 尝试获取真实的今日新用户数据...")
-    
-    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    today_start_ts = int(today_start.timestamp())
-    today_end_ts = int(datetime.now(timezone.utc).timestamp())
-    
-    logger.info(f"📅 查询时间范围: {today_start.isoformat()} 到现在")
-    logger.info(f"📅 时间戳范围: {today_start_ts} - {today_end_ts}")
-    
-    # 方法1: 使用简化的客户搜索 (不带过滤器)
-    logger.info("🔍 方法1: 尝试获取最近客户列表...")
-    customers_url = f"{config.customer_io_app_base}/customers/attributes"
-    
-    # 使用更简单的payload，不使用复杂过滤器
-    simple_payload = {
-        "limit": 50  # 获取最近50个客户
-    }
-    
-    try:
-        simple_result = APIClient.make_request(customers_url, headers, method='POST', data=simple_payload)
-        if simple_result and 'customers' in simple_result:
-            logger.info(f"📊 获取到 {len(simple_result['customers'])} 个最近客户")
-            
-            # 查看客户数据结构
-            if len(simple_result['customers']) > 0:
-                sample_customer = simple_result['customers'][0]
-                logger.info(f"🔍 客户数据样本: {sample_customer}")
-                
-                # 尝试找到今日注册的客户
-                today_customers = 0
-                for customer in simple_result['customers']:
-                    # 检查各种可能的时间字段
-                    for time_field in ['created_at', 'created', 'signup_date', 'registered_at', 'cio_created_at']:
-                        if time_field in customer.get('attributes', {}):
-                            created_at = customer['attributes'][time_field]
-                            try:
-                                if isinstance(created_at, (int, float)):
-                                    created_time = datetime.fromtimestamp(created_at, tz=timezone.utc)
-                                elif isinstance(created_at, str):
-                                    created_time = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                                else:
-                                    continue
-                                    
-                                if created_time.date() == datetime.now(timezone.utc).date():
-                                    today_customers += 1
-                                    logger.info(f"✅ 找到今日新用户: {customer.get('id')} (注册时间: {created_time})")
-                                    break
-                            except Exception as parse_error:
-                                logger.debug(f"解析{time_field}失败: {parse_error}")
-                                continue
-                
-                if today_customers > 0:
-                    logger.info(f"✅ 方法1成功: 找到 {today_customers} 个今日新用户")
-                    return today_customers
-                    
-        logger.warning("⚠️ 方法1: 未找到今日新用户")
-    except Exception as e:
-        logger.warning(f"⚠️ 方法1失败: {str(e)}")
-    
-    # 方法2: 尝试按邮箱搜索 (用于测试API格式)
-    logger.info("🔍 方法2: 测试按邮箱搜索API格式...")
-    email_search_url = f"{config.customer_io_app_base}/customers"
-    
-    # 尝试使用最简单的搜索格式
-    try:
-        # 不带任何过滤器的基本请求
-        basic_result = APIClient.make_request(email_search_url, headers, method='POST', data={})
-        if basic_result:
-            logger.info(f"📊 基本搜索成功: {basic_result}")
-            
-            # 如果有customers字段，检查是否包含时间信息
-            if 'customers' in basic_result and len(basic_result['customers']) > 0:
-                for customer in basic_result['customers'][:5]:  # 只检查前5个
-                    logger.info(f"🔍 客户样本: {customer}")
-                    
-    except Exception as e:
-        logger.warning(f"⚠️ 方法2测试失败: {str(e)}")
-    
-    # 方法3: 尝试通过不同的时间格式搜索
-    logger.info("🔍 方法3: 尝试不同的时间格式搜索...")
-    
-    # 尝试使用ISO日期格式
-    today_iso = today_start.isoformat()
-    search_payload_iso = {
-        "filter": {
-            "attribute": {
-                "field": "created_at",
-                "operator": "gte",
-                "value": today_iso
-            }
-        },
-        "limit": 100
-    }
-    
-    try:
-        iso_result = APIClient.make_request(customers_url, headers, method='POST', data=search_payload_iso)
-        if iso_result and 'customers' in iso_result:
-            logger.info(f"✅ 方法3 ISO格式成功: 找到 {len(iso_result['customers'])} 个客户")
-            if len(iso_result['customers']) > 0:
-                return len(iso_result['customers'])
-                
-    except Exception as e:
-        logger.warning(f"⚠️ 方法3失败: {str(e)}")
-    
-    # 所有方法都失败了
-    logger.warning("❌ 所有获取真实今日新用户的方法都失败了")
-    logger.info("💡 可能的原因:")
-    logger.info("   1. Customer.io中客户没有标准的created_at字段")
-    logger.info("   2. API权限不足，无法访问详细客户数据")
-    logger.info("   3. 今天确实没有新用户注册")
-    logger.info("   4. 需要使用不同的API端点或方法")
-    logger.info("💡 建议: 查看Customer.io控制台中客户的具体属性字段名称")
-    
-    return None
-
-def get_new_users_from_revenuecat() -> Optional[int]:
-    """
-    基于RevenueCat的真实"New Customers"数据计算今日新用户
-    RevenueCat的New Customers指标提供了真实的新客户数据
-    """
-    logger.info("📊 分析RevenueCat的New Customers数据...")
-    
-    headers = {
-        "Authorization": f"Bearer {config.revenuecat_token}",
-        "Content-Type": "application/json"
-    }
-    
-    # 获取项目信息
-    projects_url = f"{config.revenuecat_v2_base}/projects"
-    projects_data = APIClient.make_request(projects_url, headers)
-    
-    if projects_data and projects_data.get('items'):
-        project = projects_data['items'][0]
-        project_id = project.get('id')
-        
-        # 获取RevenueCat的Metrics数据
-        metrics_url = f"{config.revenuecat_v2_base}/projects/{project_id}/metrics/overview"
-        metrics_data = APIClient.make_request(metrics_url, headers)
-        
-        if metrics_data and metrics_data.get('metrics'):
-            # 查找New Customers指标
-            new_customers_metric = None
-            for metric in metrics_data['metrics']:
-                if metric.get('id') == 'new_customers':
-                    new_customers_metric = metric
-                    break
-            
-            if new_customers_metric:
-                new_customers_total = int(new_customers_metric.get('value', 0))
-                period = new_customers_metric.get('period', 'P28D')  # 默认28天
-                
-                logger.info(f"📈 RevenueCat新客户数据:")
-                logger.info(f"   总新客户: {new_customers_total}")
-                logger.info(f"   时间周期: {period}")
-                
-                # 解析周期并计算今日新用户
-                if period == 'P28D':  # 28天周期
-                    daily_avg = new_customers_total / 28
-                    logger.info(f"   28天平均每日新客户: {daily_avg:.2f}")
-                    
-                    # 基于星期几调整（周末较少）
-                    today = datetime.now(timezone.utc)
-                    weekday = today.weekday()  # 0=Monday, 6=Sunday
-                    
-                    if weekday in [5, 6]:  # 周末
-                        weekend_multiplier = 0.7
-                        today_estimate = int(daily_avg * weekend_multiplier)
-                        logger.info(f"   周末调整系数: {weekend_multiplier}")
-                    else:
-                        today_estimate = int(daily_avg)
-                    
-                    # 确保至少为1（如果有新客户数据）
-                    if new_customers_total > 0 and today_estimate == 0:
-                        today_estimate = 1
-                    
-                    logger.info(f"✅ 基于RevenueCat真实数据估算今日新用户: {today_estimate}")
-                    return today_estimate
-                    
-                elif period == 'P0D':  # 实时数据
-                    logger.info("🎉 RevenueCat提供实时新客户数据！")
-                    return new_customers_total
-                    
-                else:
-                    logger.warning(f"⚠️ 未知的时间周期格式: {period}")
-                    # 尝试解析为天数
-                    import re
-                    match = re.search(r'P(\d+)D', period)
-                    if match:
-                        days = int(match.group(1))
-                        daily_avg = new_customers_total / days
-                        today_estimate = max(1, int(daily_avg))
-                        logger.info(f"✅ 基于{days}天数据估算今日新用户: {today_estimate}")
-                        return today_estimate
-            
-            logger.warning("⚠️ 未找到RevenueCat的new_customers指标")
-        else:
-            logger.warning("⚠️ 无法获取RevenueCat metrics数据")
-    else:
-        logger.warning("⚠️ 无法获取RevenueCat项目信息")
-    
-    return None
-
-def estimate_daily_new_users(total_users: int) -> int:
-    """
-    基于总用户数和多种因素智能估算今日新用户数
-    考虑工作日vs周末、应用生命周期等因素
-    """
-    if total_users == 0:
-        return 0
-    
-    import calendar
-    from datetime import datetime, timezone
-    
-    now = datetime.now(timezone.utc)
-    
-    # 基础增长率估算（基于354个真实用户的基数）
-    base_daily_rate = 0.002  # 0.2% 非常保守的日增长率
-    
-    # 工作日 vs 周末调整
-    weekday = now.weekday()  # 0=Monday, 6=Sunday
-    if weekday in [5, 6]:  # 周末
-        weekday_multiplier = 0.6  # 周末用户增长减少40%
-    else:
-        weekday_multiplier = 1.0
-    
-    # 月份季节性调整
-    month = now.month
-    if month in [1, 2]:  # 1-2月，新年期间活跃度较低
-        seasonal_multiplier = 0.7
-    elif month in [9, 10, 11]:  # 9-11月，返校和年末较活跃
-        seasonal_multiplier = 1.3
-    elif month in [12]:  # 12月，年末较活跃但假期影响
-        seasonal_multiplier = 1.1
-    else:
-        seasonal_multiplier = 1.0
-    
-    # 用户基数规模调整（较小的应用增长率通常更不稳定）
-    if total_users < 100:
-        scale_multiplier = 0.5  # 极小规模，增长不稳定
-    elif total_users < 500:
-        scale_multiplier = 0.8  # 小规模
-    elif total_users < 1000:
-        scale_multiplier = 1.0  # 中等规模
-    else:
-        scale_multiplier = 1.2  # 大规模，相对稳定增长
-    
-    # 计算最终估算
-    estimated_new = total_users * base_daily_rate * weekday_multiplier * seasonal_multiplier * scale_multiplier
-    
-    # 确保至少为0，最多不超过合理上限
-    estimated_new = max(0, min(estimated_new, total_users * 0.05))  # 最多不超过总用户的5%
-    
-    # 四舍五入到整数
-    estimated_new = round(estimated_new)
-    
-    # 为极小的应用提供最小值保证
-    if total_users > 50 and estimated_new == 0:
-        estimated_new = 1
-    
-    logger.info(f"📊 估算详情:")
-    logger.info(f"   总用户: {total_users}")
-    logger.info(f"   基础日增长率: {base_daily_rate:.1%}")
-    logger.info(f"   工作日调整: {weekday_multiplier:.1f}")
-    logger.info(f"   季节性调整: {seasonal_multiplier:.1f}")
-    logger.info(f"   规模调整: {scale_multiplier:.1f}")
-    logger.info(f"   最终估算: {estimated_new}")
-    
-    return estimated_new
+    return customer_io_provider.collect(fetcher or make_fetcher())
 
-# ============ RevenueCat真实数据获取 =============
-def get_revenuecat_real_data(user_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def get_revenuecat_real_data(fetcher: Optional[Fetcher] = None) -> RevenueCatData:
     """获取RevenueCat真实数据"""
     logger.info("💰 获取RevenueCat真实数据...")
-    
-    headers = {
-        "Authorization": f"Bearer {config.revenuecat_token}",
-        "Content-Type": "application/json"
-    }
-    
-    # 首先获取项目列表以确认项目存在
-    projects_url = f"{config.revenuecat_v2_base}/projects"
-    projects_data = APIClient.make_request(projects_url, headers)
-    
-    if projects_data and projects_data.get('items'):
-        project = projects_data['items'][0]  # 第一个项目应该是UNLOCKLAND
-        project_id = project.get('id')
-        project_name = project.get('name')
-        
-        logger.info(f"✅ 找到项目: {project_name} (ID: {project_id})")
-        
-        # 🎯 尝试获取真实的Overview Metrics数据（新增！）
-        metrics_url = f"{config.revenuecat_v2_base}/projects/{project_id}/metrics/overview"
-        logger.info(f"📊 尝试获取真实metrics数据...")
-        
-        metrics_data = APIClient.make_request(metrics_url, headers)
-        
-        if metrics_data and metrics_data.get('metrics'):
-            logger.info("🎉 成功获取RevenueCat真实metrics数据！")
-            
-            # 解析真实的metrics数据
-            metrics = {}
-            for metric in metrics_data['metrics']:
-                metric_id = metric.get('id')
-                metric_value = metric.get('value', 0)
-                metric_unit = metric.get('unit', '')
-                metric_name = metric.get('name', '')
-                
-                logger.info(f"📈 {metric_name} ({metric_id}): {metric_value} {metric_unit}")
-                metrics[metric_id] = {
-                    'value': metric_value,
-                    'unit': metric_unit,
-                    'name': metric_name
-                }
-            
-            # 从真实metrics中提取关键数据
-            active_subscriptions = int(metrics.get('active_subscriptions', {}).get('value', 0))
-            active_trials = int(metrics.get('active_trials', {}).get('value', 0))
-            mrr = float(metrics.get('mrr', {}).get('value', 0))
-            arr = float(metrics.get('arr', {}).get('value', mrr * 12))  # 如果没有ARR，用MRR计算
-            revenue_28d = float(metrics.get('revenue_28d', {}).get('value', 0))
-            today_revenue = float(metrics.get('today_revenue', {}).get('value', arr / 365))
-            
-            logger.info(f"🎯 解析的真实数据:")
-            logger.info(f"   活跃订阅: {active_subscriptions}")
-            logger.info(f"   活跃试用: {active_trials}")
-            logger.info(f"   MRR: ${mrr:,.2f}")
-            logger.info(f"   ARR: ${arr:,.2f}")
-            logger.info(f"   今日收入: ${today_revenue:,.2f}")
-            
-            return {
-                "active_subscriptions": active_subscriptions,
-                "active_trials": active_trials,
-                "mrr": mrr,
-                "arr": arr,
-                "revenue_28d": revenue_28d,
-                "today_revenue": today_revenue,
-                "project_name": project_name,
-                "project_id": project_id,
-                "source": "revenuecat_metrics_api_real_data",
-                "available_metrics": list(metrics.keys())
-            }
-        
-        else:
-            logger.warning("⚠️ 无法获取RevenueCat Metrics数据")
-            logger.info("💡 可能原因:")
-            logger.info("   1. API密钥缺少 'charts_metrics:overview:read' 权限")
-            logger.info("   2. 项目中暂无metrics数据")
-            logger.info("   3. 需要v2 API密钥而不是v1")
-            
-            # 备用方案：使用项目基本信息进行估算
-            apps_url = f"{config.revenuecat_v2_base}/projects/{project_id}/apps"
-            apps_data = APIClient.make_request(apps_url, headers)
-            
-            if apps_data:
-                apps = apps_data.get('items', [])
-                logger.info(f"📱 项目中有 {len(apps)} 个应用")
-                
-                # 基于项目基本信息进行保守估算
-                created_at = project.get('created_at', 0)
-                if created_at:
-                    days_since_creation = (datetime.now().timestamp() * 1000 - created_at) / (1000 * 60 * 60 * 24)
-                    logger.info(f"📅 项目运行天数: {int(days_since_creation)}")
-                    
-                    # 基于项目数据进行估算
-                    estimated_subscribers = max(7, int(len(apps) * 2.5))
-                    estimated_arr = estimated_subscribers * 89.99
-                    estimated_mrr = estimated_arr / 12
-                    estimated_daily = estimated_arr / 365
-                    estimated_trials = max(2, int(estimated_subscribers * 0.25))
-                    
-                    logger.info(f"📊 基于项目数据的保守估算 (需要真实metrics权限):")
-                    logger.info(f"   付费订阅: {estimated_subscribers}")
-                    logger.info(f"   试用用户: {estimated_trials}")
-                    logger.info(f"   ARR: ${estimated_arr:,.2f}")
-                    logger.info(f"   MRR: ${estimated_mrr:,.2f}")
-                    
-                    return {
-                        "active_subscriptions": estimated_subscribers,
-                        "active_trials": estimated_trials,
-                        "mrr": estimated_mrr,
-                        "arr": estimated_arr,
-                        "revenue_28d": estimated_daily * 28,
-                        "today_revenue": estimated_daily,
-                        "project_name": project_name,
-                        "project_id": project_id,
-                        "apps_count": len(apps),
-                        "project_age_days": int(days_since_creation),
-                        "source": "revenuecat_project_fallback_estimate"
-                    }
-    
-    # 如果无法获取项目数据，返回零值
-    logger.warning("⚠️ 无法获取任何RevenueCat数据")
+    return revenuecat_provider.collect(fetcher or make_fetcher())
+
+def breaker_states() -> Dict[str, str]:
+    """各数据源的熔断器状态，键与/api/data的sources一致（customerIO / revenueCat）"""
     return {
-        "active_subscriptions": 118,
-        "active_trials": 12,
-        "mrr": 11804.0,
-        "arr": 141600.0,
-        "revenue_28d": 0,
-        "today_revenue": 0,
-        "source": "no_revenuecat_data"
+        "customerIO": breaker.get_breaker(customer_io_provider.name).state,
+        "revenueCat": breaker.get_breaker(revenuecat_provider.name).state
     }
 
 # ============ 主数据获取函数 =============
-def get_total_users() -> int:
+def collect_snapshot() -> DashboardSnapshot:
+    """采集一次完整的数据快照：两个数据源并发获取，共享同一个Fetcher（每个上游资源只请求一次）"""
+    fetcher = make_fetcher()
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        cio_future = executor.submit(get_customer_io_real_data, fetcher)
+        rc_data = get_revenuecat_real_data(fetcher)
+        cio_data = cio_future.result()
+    
+    return DashboardSnapshot(
+        customer_io=cio_data,
+        revenuecat=rc_data,
+        request_counts=MappingProxyType(dict(fetcher.request_counts)),
+        collected_at=datetime.now(timezone.utc).isoformat(),
+        forecast=get_forecast()
+    )
+
+def get_total_users(snapshot: Optional[DashboardSnapshot] = None) -> int:
     """获取总用户数"""
-    cio_data = get_customer_io_real_data()
-    return cio_data["total_customers"]
+    snapshot = snapshot or collect_snapshot()
+    return snapshot.customer_io.total_customers
 
-def get_new_users_today() -> int:
+def get_new_users_today(snapshot: Optional[DashboardSnapshot] = None) -> int:
     """获取今日新用户数"""
-    cio_data = get_customer_io_real_data()
-    return cio_data["new_customers_today"]
+    snapshot = snapshot or collect_snapshot()
+    return snapshot.values().new_users_today
 
-def get_arr(user_data: Optional[Dict[str, Any]] = None) -> float:
+def get_arr(snapshot: Optional[DashboardSnapshot] = None) -> float:
     """获取年度经常性收入"""
-    rc_data = get_revenuecat_real_data(user_data)
-    return rc_data.get("arr", 0)
+    snapshot = snapshot or collect_snapshot()
+    return snapshot.revenuecat.arr
 
-def get_revenue_today(user_data: Optional[Dict[str, Any]] = None) -> float:
+def get_revenue_today(snapshot: Optional[DashboardSnapshot] = None) -> float:
     """获取今日收入"""
-    rc_data = get_revenuecat_real_data(user_data)
-    return rc_data.get("today_revenue", 0)
+    snapshot = snapshot or collect_snapshot()
+    return snapshot.revenuecat.today_revenue
 
-def get_active_subscriptions(user_data: Optional[Dict[str, Any]] = None) -> int:
+def get_active_subscriptions(snapshot: Optional[DashboardSnapshot] = None) -> int:
     """获取活跃订阅数"""
-    rc_data = get_revenuecat_real_data(user_data)
-    return rc_data.get("active_subscriptions", 0)
-
-# ============ 数字格式化函数 =============
-def format_number(num):
-    """
-    将大数字格式化为K/M形式
-    例如: 144048 -> $144K, 1200000 -> $1.2M
-    """
-    if isinstance(num, str):
-        return num
-    
-    if num >= 1000000:
-        return f"${num/1000000:.1f}M"
-    elif num >= 1000:
-        return f"${num/1000:.0f}K"
-    else:
-        return f"${num:,.0f}"
+    snapshot = snapshot or collect_snapshot()
+    return snapshot.revenuecat.active_subscriptions
 
-def format_count(num):
-    """
-    将数量格式化为K/M形式（不带$符号）
-    例如: 12400 -> 12.4K, 1200000 -> 1.2M
-    """
-    if isinstance(num, str):
-        return num
-    
-    if num >= 1000000:
-        return f"{num/1000000:.1f}M"
-    elif num >= 1000:
-        return f"{num/1000:.1f}K"
-    else:
-        return f"{num:,}"
 
 # ============ 仪表板生成 =============
-def generate_dashboard():
-    """生成仪表板HTML"""
+def record_history(values: Dict[str, Any]) -> None:
+    """把本次的指标值（DashboardValues.history_values，只含真实数据）追加到历史数据库"""
+    if not config.history_enabled:
+        return
+    if not values:
+        logger.warning("⚠️ 没有来自真实数据的指标，本次不记录指标历史")
+        return
+    try:
+        store = HistoryStore(config.history_path)
+        try:
+            store.append(values)
+        finally:
+            store.close()
+        logger.info(f"📈 指标历史已记录: {config.history_path} ({', '.join(values)})")
+    except Exception as e:
+        logger.error(f"❌ 记录指标历史失败: {e}")
+
+# 页面版本：输出文件、布局（template.html中body的layout-*样式）、是否内嵌data.json的内容
+DASHBOARD_VARIANTS = {
+    "tv": {"output": "dashboard.html", "layout": "tv", "embed_data": False},
+    "compact": {"output": "dashboard-compact.html", "layout": "compact", "embed_data": False},
+    "embedded": {"output": "dashboard-embedded.html", "layout": "compact", "embed_data": True}
+}
+
+# 页面中每次运行都会变化的部分（更新时间、内嵌data.json的lastUpdate），不参与"内容是否变化"的比较
+VOLATILE_HTML = re.compile(rb'Updated \d{2}:\d{2}|"lastUpdate":"[^"]*"')
+
+def stable_html(data: bytes) -> bytes:
+    """页面去掉更新时间后的内容"""
+    return VOLATILE_HTML.sub(b"", data)
+
+def stable_json(data: bytes) -> bytes:
+    """data.json去掉lastUpdate等字段后的内容哈希（与/api/stream判断数据变化的方式一致）"""
+    return content_hash(json.loads(data)).encode()
+
+def generate_dashboard(snapshot: Optional[DashboardSnapshot] = None) -> DashboardSnapshot:
+    """生成仪表板HTML，未传入快照时先采集一次"""
     logger.info("📊 开始生成真实数据仪表板...")
     
-    # 先获取用户数据，避免重复调用
-    cio_data = get_customer_io_real_data()
-    
-    # 获取核心数据
-    total_users = cio_data["total_customers"]
-    arr = get_arr(cio_data)
-    active_subs = get_active_subscriptions(cio_data)
-    
-    # 获取RevenueCat数据源信息
-    rc_data = get_revenuecat_real_data(cio_data)
+    # 一次性采集所有上游数据，后续只读取快照
+    snapshot = snapshot or collect_snapshot()
     
-    # 基础增量值
-    BASE_USER_INCREMENT = 11000
-    BASE_ARR_INCREMENT = 141600.0
-    BASE_SUBS_INCREMENT = 118
+    values = snapshot.values()
+    total_users = values.total_users
+    arr = values.arr
+    active_subs = values.active_subscriptions
+    cio_source = values.customer_io_source
+    rc_source = values.revenuecat_source
     
-    # 如果获取到真实数据，添加基础增量
-    cio_source = cio_data.get("source", "unknown")
-    rc_source = rc_data.get("source", "unknown")
-    
-    # 只有在获取到真实数据时才添加增量
-    if cio_source not in ["api_call_failed", "no_api_key_configured"]:
-        total_users += BASE_USER_INCREMENT
-        
-    if rc_source not in ["no_revenuecat_data", "revenuecat_project_fallback_estimate"]:
-        arr += BASE_ARR_INCREMENT
-        active_subs += BASE_SUBS_INCREMENT
+    # 编译后的模板（按修改时间缓存，守护进程模式下不会每次重新解析）
+    template = load_template("template.html")
     
-    # 读取模板
-    with open("template.html", "r", encoding="utf-8") as f:
-        template = f.read()
-    
-    # Handle data display
-    if cio_data['source'] == 'no_api_key_configured':
-        total_users_display = "API Key Required"
-    elif cio_data['source'] == 'api_call_failed':
-        total_users_display = "API Call Failed"
-    else:
-        total_users_display = total_users  # 保存数值，稍后格式化
+    # Handle data display（没有真实用户数时显示的文字，数值稍后格式化）
+    users_unavailable = {
+        SOURCE_NO_API_KEY: "API Key Required",
+        SOURCE_API_FAILED: "API Call Failed",
+        SOURCE_API_ERROR: "API Call Failed"
+    }
+    total_users_display = users_unavailable.get(cio_source, total_users)
     
     # Simplified status information (TV display friendly)
     cio_status_map = {
-        'no_api_key_configured': 'Customer.io not configured',
-        'api_call_failed': 'Customer.io failed',
-        'customer_io_real_total_and_real_new_users': 'Customer.io real data',
-        'customer_io_real_total_revenuecat_new_users': 'Customer.io real data',
-        'customer_io_real_total_estimated_new_users': 'Customer.io real total',
-        'customer_io_email_segments_real_total': 'Customer.io real data',
-        'customer_io_segment_fallback': 'Customer.io estimated'
+        SOURCE_CUSTOMER_IO: 'Customer.io real data',
+        SOURCE_CUSTOMER_IO_SEGMENT_FALLBACK: 'Customer.io estimated',
+        SOURCE_NO_API_KEY: 'Customer.io not configured',
+        SOURCE_API_FAILED: 'Customer.io failed',
+        SOURCE_API_ERROR: 'Customer.io error',
+        SOURCE_DEADLINE_EXCEEDED: 'Customer.io timed out',
+        SOURCE_CIRCUIT_OPEN: 'Customer.io unavailable'
     }
     
     rc_status_map = {
-        'revenuecat_metrics_api_real_data': 'RevenueCat real data',
-        'revenuecat_project_fallback_estimate': 'RevenueCat needs permission',
-        'no_revenuecat_data': 'RevenueCat no data',
-        'unknown': 'RevenueCat unknown'
+        SOURCE_REVENUECAT: 'RevenueCat real data',
+        SOURCE_REVENUECAT_ESTIMATE: 'RevenueCat needs permission',
+        SOURCE_NO_API_KEY: 'RevenueCat not configured',
+        SOURCE_API_FAILED: 'RevenueCat no data',
+        SOURCE_API_ERROR: 'RevenueCat error',
+        SOURCE_DEADLINE_EXCEEDED: 'RevenueCat timed out',
+        SOURCE_CIRCUIT_OPEN: 'RevenueCat unavailable'
     }
     
     # 替换模板占位符 - 使用格式化函数
@@ -721,22 +288,6 @@ def generate_dashboard():
     formatted_arr = format_number(arr)
     formatted_subs = format_count(active_subs)
     
-    html = template.replace("{{TOTAL_USERS}}", formatted_users)
-    html = html.replace("{{ARR}}", formatted_arr)
-    html = html.replace("{{ACTIVE_SUBSCRIPTIONS}}", formatted_subs)
-    
-    # Replace status information
-    current_time = datetime.now().strftime('%H:%M')
-    html = html.replace("{{CIO_STATUS}}", cio_status_map.get(cio_data['source'], 'Unknown'))
-    html = html.replace("{{RC_STATUS}}", rc_status_map.get(rc_data.get('source', 'unknown'), 'Unknown'))
-    html = html.replace("{{UPDATE_TIME}}", f'Updated {current_time}')
-    
-    # 保存文件
-    with open("dashboard.html", "w", encoding="utf-8") as f:
-        f.write(html)
-    
-    logger.info("✅ Dashboard generated successfully: dashboard.html")
-    
     # 🆕 生成JSON数据文件供auto-dashboard使用
     data_json = {
         "totalUsers": total_users,  # 使用已经加了增量的值
@@ -744,29 +295,221 @@ def generate_dashboard():
         "activeSubscriptions": active_subs,  # 使用已经加了增量的值
         "lastUpdate": datetime.now(timezone.utc).isoformat(),
         "sources": {
-            "customerIO": cio_status_map.get(cio_data['source'], cio_data['source']),
-            "revenueCat": rc_status_map.get(rc_data.get('source', 'unknown'), 'unknown')
-        }
+            "customerIO": cio_status_map.get(cio_source, cio_source),
+            "revenueCat": rc_status_map.get(rc_source, 'unknown'),
+            "breakers": breaker_states()
+        },
+        "breakdown": snapshot.breakdown(),  # 各workspace / 项目的原始数值（不含基础增量）
+        "forecast": snapshot.forecast.projections(arr) if snapshot.forecast else None  # 历史不足时为null
     }
     
+    # 渲染各个页面版本，共用同一份编译结果
+    current_time = datetime.now().strftime('%H:%M')
+    template_values = {
+        "TOTAL_USERS": formatted_users,
+        "ARR": formatted_arr,
+        "ACTIVE_SUBSCRIPTIONS": formatted_subs,
+        "CIO_STATUS": cio_status_map.get(cio_source, 'Unknown'),
+        "RC_STATUS": rc_status_map.get(rc_source, 'Unknown'),
+        "UPDATE_TIME": f'Updated {current_time}',
+        # 页面收到推送的快照（/api/data格式，数据源为代码）时按同样的文字显示
+        "STATUS_LABELS": embed_json({
+            "customerIO": cio_status_map,
+            "revenueCat": rc_status_map,
+            "totalUsers": users_unavailable
+        })
+    }
+    
+    for variant_name in config.dashboard_variants:
+        variant = DASHBOARD_VARIANTS.get(variant_name)
+        if variant is None:
+            logger.warning(f"⚠️ Unknown dashboard variant: {variant_name}")
+            continue
+        html = template.render({
+            **template_values,
+            "LAYOUT": variant["layout"],
+            "DATA_JSON": embed_json(data_json) if variant["embed_data"] else "null"
+        })
+        if write_if_changed(variant["output"], html.encode("utf-8"), config.precompress, stable_html):
+            logger.info(f"✅ Dashboard generated successfully: {variant['output']}")
+        else:
+            logger.info(f"⏭️ Dashboard unchanged, skipped: {variant['output']}")
+    
     json_file = 'data.json'
     try:
-        with open(json_file, 'w', encoding='utf-8') as f:
-            import json
-            json.dump(data_json, f, indent=2, ensure_ascii=False)
-        logger.info(f"✅ Data JSON generated successfully: {json_file}")
+        encoded = json.dumps(data_json, indent=2, ensure_ascii=False).encode("utf-8")
+        if write_if_changed(json_file, encoded, config.precompress, stable_json):
+            logger.info(f"✅ Data JSON generated successfully: {json_file}")
+        else:
+            logger.info(f"⏭️ Data JSON unchanged, skipped: {json_file}")
     except Exception as e:
         logger.error(f"❌ Failed to generate JSON file: {e}")
     
+    # 追加到指标历史
+    record_history(values.history_values())
+    
     # Display data status summary
     logger.info("")
     logger.info("📊 Data Status Summary:")
-    logger.info(f"   Customer.io: {cio_status_map.get(cio_data['source'], cio_data['source'])}")
-    logger.info(f"   RevenueCat: {rc_status_map.get(rc_data.get('source', 'unknown'), 'unknown')}")
+    logger.info(f"   Customer.io: {cio_status_map.get(cio_source, cio_source)}")
+    logger.info(f"   RevenueCat: {rc_status_map.get(rc_source, 'unknown')}")
+    breakdown = data_json["breakdown"]
+    if len(breakdown["customerIO"]) > 1:
+        for part in breakdown["customerIO"]:
+            logger.info(f"     workspace {part['workspace']}: {part['totalUsers']} users ({part['source']})")
+    if len(breakdown["revenueCat"]) > 1:
+        for project in breakdown["revenueCat"]:
+            logger.info(f"     project {project['projectName'] or project['projectId']}: "
+                        f"ARR {format_number(project['arr'])}, {project['activeSubscriptions']} subscriptions "
+                        f"({project['source']})")
+    logger.info(f"   Upstream requests: {snapshot.request_count} "
+                f"(Customer.io {snapshot.request_counts.get('customer_io', 0)}, "
+                f"RevenueCat {snapshot.request_counts.get('revenuecat', 0)})")
+    if data_json["forecast"]:
+        logger.info(f"   Forecast: ARR end of month {format_number(data_json['forecast']['arrEndOfMonth'])} "
+                    f"({data_json['forecast']['arrDailyTrend']:+.2f}/day), "
+                    f"new users today {data_json['forecast']['newUsersToday']} "
+                    f"({data_json['forecast']['historyDays']} days of history)")
+    response_cache = get_response_cache()
+    if response_cache:
+        logger.info(f"   Response cache: {response_cache.stats['hits']} hits, "
+                    f"{response_cache.stats['revalidated']} revalidated (304), "
+                    f"{response_cache.stats['misses']} misses")
+    open_breakers = {name: state for name, state in breaker.states().items() if state != breaker.CLOSED}
+    if open_breakers:
+        logger.info(f"   Circuit breakers: {', '.join(f'{name} {state}' for name, state in open_breakers.items())}")
+    for provider, provider_stats in scheduler.stats.snapshot().items():
+        logger.info(f"   Scheduling {provider}: queued {provider_stats['queuedMs']}ms, "
+                    f"{provider_stats['retries']} retries, {provider_stats['rateLimited']} rate limited (429)")
+    transport_stats = transport.stats.snapshot()
+    logger.info(f"   Connections: {transport_stats['connectionsOpened']} opened, "
+                f"{transport_stats['connectionsReused']} reused "
+                f"(setup {transport_stats['connectSetupMs']}ms, avg request {transport_stats['avgRequestMs']}ms)")
+    call_summary = upstream_metrics.summary()
+    for endpoint in call_summary:
+        logger.info(f"   {endpoint['method']} {endpoint['endpoint']}: {endpoint['calls']} calls, "
+                    f"p50 {endpoint['p50Ms']}ms, p99 {endpoint['p99Ms']}ms, {endpoint['bytes']} bytes")
+    logger.info("")
+    logger.info(f"📈 Upstream call summary: {json.dumps(call_summary, ensure_ascii=False)}")
     logger.info("")
+    
+    return snapshot
+
+# ============ 守护进程模式 =============
+async def run_daemon(customer_io_interval: float, revenuecat_interval: float) -> None:
+    """
+    常驻刷新模式：各数据源按各自的间隔刷新，进程内连接池保持热连接
+    只有展示的数值变化时才重写dashboard.html和data.json
+    """
+    logger.info(f"🔁 守护进程模式启动: Customer.io每{customer_io_interval:.0f}秒, RevenueCat每{revenuecat_interval:.0f}秒")
+    
+    latest: Dict[str, Any] = {}
+    last_values = None
+    write_lock = asyncio.Lock()
+    
+    async def publish() -> None:
+        nonlocal last_values
+        if "customer_io" not in latest or "revenuecat" not in latest:
+            return
+        snapshot = DashboardSnapshot(
+            customer_io=latest["customer_io"],
+            revenuecat=latest["revenuecat"],
+            collected_at=datetime.now(timezone.utc).isoformat(),
+            forecast=await asyncio.to_thread(get_forecast)
+        )
+        values = snapshot.values()
+        if values == last_values:
+            logger.info("💤 数据未变化，跳过写入")
+            await asyncio.to_thread(record_history, values.history_values())
+            return
+        await asyncio.to_thread(generate_dashboard, snapshot)
+        last_values = values
+    
+    async def refresh_loop(name: str, fetch, interval: float) -> None:
+        while True:
+            try:
+                data = await asyncio.to_thread(fetch, make_fetcher())
+                async with write_lock:
+                    latest[name] = data
+                    await publish()
+            except Exception as e:
+                logger.error(f"❌ {name} 刷新失败: {e}")
+            await asyncio.sleep(interval)
+    
+    await asyncio.gather(
+        refresh_loop("customer_io", get_customer_io_real_data, customer_io_interval),
+        refresh_loop("revenuecat", get_revenuecat_real_data, revenuecat_interval)
+    )
+
+# ============ 预计算模式 =============
+def write_precomputed(snapshot: DashboardSnapshot) -> None:
+    """把快照按/api/data的响应格式写入预计算快照文件"""
+    source_status = {
+        name: {
+            "status": "error" if data.failed else "ok",
+            "breaker": breaker.get_breaker(provider.name).describe()
+        }
+        for name, data, provider in (
+            ("customerIO", snapshot.customer_io, customer_io_provider),
+            ("revenueCat", snapshot.revenuecat, revenuecat_provider)
+        )
+    }
+    # 快照的时效从数据采集完成时算起
+    generated_at = datetime.fromisoformat(snapshot.collected_at).timestamp()
+    payload = snapshot.payload(source_status)
+    if config.webhooks_enabled:
+        # 先记录检查点再写快照，/api/data读到新快照时总能找到对应的检查点
+        reconcile_webhooks(payload)
+    write_snapshot(config.precomputed_path, payload, generated_at)
+    logger.info(f"✅ 预计算快照已写入: {config.precomputed_path} "
+                f"(Customer.io {source_status['customerIO']['status']}, RevenueCat {source_status['revenueCat']['status']})")
+
+def reconcile_webhooks(payload: Dict[str, Any]) -> None:
+    """完整轮询即校正：记录webhook计数器检查点，之后的事件叠加在这次的结果上"""
+    try:
+        state = WebhookState(config.webhook_state_path)
+        try:
+            state.checkpoint(payload["lastUpdate"])
+        finally:
+            state.close()
+    except Exception as e:
+        # 计数器不可用时快照照常写入，只是不叠加事件
+        logger.warning(f"⚠️ 无法记录webhook检查点: {e}")
+        return
+    logger.info(f"🔗 Webhook计数器已校正: {config.webhook_state_path}")
+
+def run_precompute(interval: float) -> None:
+    """
+    cron式预计算：每interval秒采集一次并写入快照文件，interval为0时只运行一次（由系统cron调度）
+    只写快照文件，不渲染HTML；间隔从每次开始时算起，采集耗时不会累积
+    """
+    logger.info(f"🧮 预计算模式启动: {'运行一次' if interval <= 0 else f'每{interval:.0f}秒'} → {config.precomputed_path}")
+    while True:
+        started = time.monotonic()
+        try:
+            write_precomputed(collect_snapshot())
+        except Exception as e:
+            logger.error(f"❌ 预计算失败: {e}")
+        if interval <= 0:
+            return
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
 
 # ============ 主程序 =============
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UnlockLand真实数据仪表板生成器")
+    parser.add_argument("--daemon", action="store_true", help="常驻进程，按间隔持续刷新")
+    parser.add_argument("--customer-io-interval", type=float,
+                        default=float(os.getenv('DAEMON_CUSTOMER_IO_INTERVAL', '600')),
+                        help="守护模式下Customer.io刷新间隔（秒）")
+    parser.add_argument("--revenuecat-interval", type=float,
+                        default=float(os.getenv('DAEMON_REVENUECAT_INTERVAL', '120')),
+                        help="守护模式下RevenueCat刷新间隔（秒）")
+    parser.add_argument("--precompute", action="store_true", help="只采集数据并写入/api/data的预计算快照文件")
+    parser.add_argument("--precompute-interval", type=float,
+                        default=float(os.getenv('PRECOMPUTE_INTERVAL', RECONCILE_INTERVAL if config.webhooks_enabled else 60)),
+                        help="预计算间隔（秒），0为只运行一次；启用webhook时默认为WEBHOOK_RECONCILE_INTERVAL")
+    args = parser.parse_args()
+    
     logger.info("🚀 启动真实数据仪表板生成器...")
     
     # 检查API配置
@@ -775,7 +518,23 @@ if __name__ == "__main__":
     logger.info(f"   Customer.io Track API: {'✅ 已配置' if config.customer_io_track_api_key else '❌ 未配置'}")
     logger.info(f"   Customer.io App API: {'✅ 已配置' if config.customer_io_app_api_key else '❌ 未配置 (需要获取)'}")
     logger.info(f"   RevenueCat API: {'✅ 已配置' if config.revenuecat_token else '❌ 未配置'}")
-    logger.info(f"   RevenueCat项目: 动态获取")
+    logger.info(f"   RevenueCat项目: {os.getenv('REVENUECAT_PROJECT_ID') or '动态获取（所有项目）'}")
+    if config.webhook_secret_configured and not config.webhooks_enabled:
+        logger.error("❌ 已配置REVENUECAT_WEBHOOK_SECRET但未配置WEBHOOK_STATE_PATH，webhook事件不会被记录，按普通间隔轮询")
+    
+    if args.precompute:
+        try:
+            run_precompute(args.precompute_interval)
+        except KeyboardInterrupt:
+            logger.info("👋 预计算已停止")
+        raise SystemExit(0)
+    
+    if args.daemon:
+        try:
+            asyncio.run(run_daemon(args.customer_io_interval, args.revenuecat_interval))
+        except KeyboardInterrupt:
+            logger.info("👋 守护进程已停止")
+        raise SystemExit(0)
     
     try:
         # 生成仪表板